@@ -0,0 +1,56 @@
+from fastapi import APIRouter, Depends, HTTPException, Request
+from ..auth.firebase import verify_firebase_token, get_auth_stats
+from ..auth.user_context import get_profile_cache_stats
+from ..services.vertex_client import VertexClient, get_vertex_client
+from ..services.storage_client import get_async_storage_client
+from ..services.insights import get_market_insights_store
+from ..services.jobs import get_job_manager
+from typing import Dict, Any
+import logging
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+async def require_admin(user: Dict[str, Any] = Depends(verify_firebase_token)) -> Dict[str, Any]:
+    """
+    Allow only users whose Firebase token carries the admin custom claim.
+    """
+    if not user.get("admin"):
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return user
+
+@router.get("/ai-usage")
+async def get_ai_usage(
+    request: Request,
+    user: Dict[str, Any] = Depends(require_admin),
+    vertex_client: VertexClient = Depends(get_vertex_client)
+):
+    """
+    AI usage per endpoint and model (calls, tokens, latency, estimated cost, budget spend)
+    alongside cache, concurrency, auth and storage signing statistics.
+    """
+    try:
+        signing = get_async_storage_client().storage_client.get_signing_stats()
+    except Exception as e:
+        logger.warning(f"Storage stats unavailable: {str(e)}")
+        signing = None
+
+    scheduler = getattr(request.app.state, "market_insights_scheduler", None)
+    return {
+        **vertex_client.get_usage_stats(),
+        "cache": vertex_client.get_cache_stats(),
+        "semantic_cache": vertex_client.get_semantic_cache_stats(),
+        "limiters": vertex_client.get_limiter_stats(),
+        "single_flight": vertex_client.get_single_flight_stats(),
+        "circuits": vertex_client.get_circuit_stats(),
+        "speech": vertex_client.get_speech_stats(),
+        "image_ingest": vertex_client.get_image_ingest_stats(),
+        "signing": signing,
+        "auth": get_auth_stats(),
+        "user_profiles": get_profile_cache_stats(),
+        "jobs": get_job_manager().stats(),
+        "market_insights": {
+            "store": get_market_insights_store().stats(),
+            "scheduler": scheduler.stats() if scheduler is not None else None
+        }
+    }
@@ -1,23 +1,57 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query, Request
+from fastapi.responses import StreamingResponse
 from ..auth.firebase import verify_firebase_token
-from ..services.vertex_client import VertexClient
-from typing import Dict, Any, Optional
+from .sse import event_stream, sse_event
+from ..services.vertex_client import UPSTREAM_UNAVAILABLE_ERRORS, VertexClient, get_vertex_client
+from ..services.concurrency import CircuitOpenError
+from ..services.usage import BudgetExceededError
+from ..services.audio import normalize_audio
+from ..services.insights import MarketInsightsStore, get_market_insights_store
+from ..services.storage_client import TRANSCRIPTION_UPLOAD_PREFIX, get_async_storage_client
+from ..services.jobs import JOB_PRIORITIES, JobManager, JobQueueFullError, get_job_manager, public_job_state
+from ..services.cache import make_cache_key
+from typing import Dict, Any, Optional, AsyncIterator
 import logging
 import json
+from datetime import datetime, timezone
+import uuid
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+def _sse_response(chunks: AsyncIterator[str], metadata: Dict[str, Any]) -> StreamingResponse:
+    """
+    Stream text chunks as Server-Sent Events, followed by a final "done" event carrying metadata.
+    A stream that fails part way ends with an "error" event instead, so a truncated answer
+    isn't mistaken for a complete one.
+    """
+    async def events():
+        try:
+            async for chunk in chunks:
+                yield sse_event({"text": chunk})
+        except Exception as e:
+            logger.error(f"Error streaming response: {str(e)}")
+            yield sse_event({"detail": "AI service temporarily unavailable"}, "error")
+            return
+        yield sse_event(metadata, "done")
+
+    return event_stream(events())
+
+async def _single_chunk(text: str) -> AsyncIterator[str]:
+    yield text
+
 @router.post("/generate-story")
 async def generate_story(
     audio_transcription: str = Form(...),
     language: str = Form("en"),
     artisan_id: Optional[str] = Form(None),
     cultural_context: str = Form("{}"),
-    vertex_client: VertexClient = Depends()
+    stream: bool = Form(False),
+    vertex_client: VertexClient = Depends(get_vertex_client)
 ):
     """
     Generate a culturally-aware story from audio transcription.
+    With stream=true the story is sent as Server-Sent Events as it is generated.
     """
     try:
         # Parse cultural context
@@ -26,6 +60,16 @@ async def generate_story(
         except json.JSONDecodeError:
             context_dict = {}
 
+        if stream:
+            return _sse_response(
+                vertex_client.stream_story_from_transcription(
+                    transcription=audio_transcription,
+                    language=language,
+                    cultural_context=context_dict
+                ),
+                {"cultural_context": context_dict, "language": language}
+            )
+
         # Generate story using VertexAI
         story = await vertex_client.generate_story_from_transcription(
             transcription=audio_transcription,
@@ -39,6 +83,8 @@ async def generate_story(
             "language": language
         }
 
+    except BudgetExceededError:
+        raise
     except Exception as e:
         logger.error(f"Error generating story: {str(e)}")
         # Return mock response if AI fails
@@ -62,26 +108,34 @@ async def transcribe_audio(
     file: UploadFile = File(...),
     language: str = Form("en"),
     user: Dict[str, Any] = Depends(verify_firebase_token),
-    vertex_client: VertexClient = Depends()
+    vertex_client: VertexClient = Depends(get_vertex_client)
 ):
     """
     Transcribe audio file to text.
     """
     try:
-        # Save uploaded file temporarily
-        import tempfile
-        import os
+        if not vertex_client.is_available("speech"):
+            # Don't convert and upload audio that can't be transcribed right now
+            raise CircuitOpenError("speech model is unavailable (circuit open)")
+
+        # Created here rather than as a dependency so unavailable storage gets the fallback below
+        storage = get_async_storage_client()
 
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as temp_file:
-            content = await file.read()
-            temp_file.write(content)
-            temp_file_path = temp_file.name
+        # Normalise to a format Speech accepts (converting only when needed) and stream the
+        # result straight to GCS in fixed-size chunks; Speech-to-Text reads it from the bucket.
+        audio = await normalize_audio(file)
+        blob_name = f"{TRANSCRIPTION_UPLOAD_PREFIX}{user['uid']}/{uuid.uuid4().hex}{audio.extension}"
+        upload = await storage.upload_stream(audio.chunks, blob_name, content_type=audio.content_type)
 
         try:
             # Transcribe using VertexAI
             transcription = await vertex_client.transcribe_audio(
-                audio_path=temp_file_path,
-                language=language
+                audio_path=upload["gcs_uri"],
+                language=language,
+                duration_seconds=audio.estimate_duration(upload["size"]),
+                encoding=audio.encoding,
+                sample_rate_hertz=audio.sample_rate_hertz,
+                channels=audio.channels
             )
 
             return {
@@ -90,9 +144,11 @@ async def transcribe_audio(
             }
 
         finally:
-            # Clean up temp file
-            os.unlink(temp_file_path)
+            # Clean up uploaded audio
+            await storage.delete_file(blob_name)
 
+    except BudgetExceededError:
+        raise
     except Exception as e:
         logger.error(f"Error transcribing audio: {str(e)}")
         # Return mock transcription if AI fails
@@ -109,13 +165,46 @@ async def transcribe_audio(
             "note": "AI transcription service temporarily unavailable, showing sample transcription"
         }
 
+@router.post("/transcribe-audio-stream")
+async def transcribe_audio_stream(
+    request: Request,
+    language: str = Query("en"),
+    user: Dict[str, Any] = Depends(verify_firebase_token),
+    vertex_client: VertexClient = Depends(get_vertex_client)
+):
+    """
+    Transcribe audio sent as the raw request body (WAV, FLAC, Ogg/WebM Opus, or anything ffmpeg can convert).
+    Partial transcripts are sent as Server-Sent Events while the audio is still uploading.
+    """
+    async def events():
+        final_parts = []
+        try:
+            audio = await normalize_audio(request.stream())
+            async for result in vertex_client.transcribe_audio_stream(
+                audio.chunks,
+                language,
+                encoding=audio.encoding,
+                sample_rate_hertz=audio.sample_rate_hertz,
+                channels=audio.channels
+            ):
+                if result["is_final"]:
+                    final_parts.append(result["transcript"])
+                yield sse_event(result)
+        except Exception as e:
+            logger.error(f"Error streaming transcription: {str(e)}")
+            yield sse_event({"detail": "AI transcription service temporarily unavailable"}, "error")
+            return
+        yield sse_event({"transcription": " ".join(final_parts).strip(), "language": language}, "done")
+
+    return event_stream(events())
+
 @router.post("/process-image")
 async def process_image(
     image_url: str = Form(...),
     operation: str = Form(...),
     artisan_id: Optional[str] = Form(None),
     user: Dict[str, Any] = Depends(verify_firebase_token),
-    vertex_client: VertexClient = Depends()
+    vertex_client: VertexClient = Depends(get_vertex_client)
 ):
     """
     Process images for digital studio operations: remove_bg, enhance, generate_mockup.
@@ -133,17 +222,13 @@ async def process_image(
             "artisan_id": artisan_id
         }
 
+    except (HTTPException, BudgetExceededError):
+        raise
     except Exception as e:
         logger.error(f"Error processing image: {str(e)}")
 
-        # Check if it's a connectivity/unreachability issue
-        error_message = str(e).lower()
-        is_unreachable = any(keyword in error_message for keyword in [
-            'connection', 'timeout', 'unreachable', 'network', 'dns', 'resolve',
-            'vertex', 'google', 'api', 'service unavailable', '502', '503', '504'
-        ])
-
-        if is_unreachable:
+        # Open circuits, full queues, timeouts and 503s mean the AI service is unreachable
+        if isinstance(e, UPSTREAM_UNAVAILABLE_ERRORS):
             logger.warning("AI service appears unreachable, returning offline simulation")
             mock_result = vertex_client._get_mock_image_response(image_url, operation)
             return {
@@ -164,16 +249,101 @@ async def process_image(
                 "status": "service_error"
             }
 
+@router.post("/process-image-jobs", status_code=202)
+async def submit_process_image_job(
+    image_url: str = Form(...),
+    operation: str = Form(...),
+    artisan_id: Optional[str] = Form(None),
+    priority: str = Form("interactive"),
+    user: Dict[str, Any] = Depends(verify_firebase_token),
+    jobs: JobManager = Depends(get_job_manager)
+):
+    """
+    Queue an image operation and return its job id immediately.
+    Poll /jobs/{job_id} or subscribe to /jobs/{job_id}/events for the result.
+    Resubmitting the same image and operation attaches to the existing job.
+    """
+    if operation not in ['remove_bg', 'enhance', 'generate_mockup']:
+        raise HTTPException(status_code=400, detail=f"Unsupported operation: {operation}")
+    if priority not in JOB_PRIORITIES:
+        raise HTTPException(status_code=400, detail=f"Invalid priority. Must be one of: {', '.join(JOB_PRIORITIES)}")
+
+    try:
+        job, deduplicated = await jobs.submit(
+            "process_image",
+            {"image_url": image_url, "operation": operation, "artisan_id": artisan_id},
+            key=make_cache_key("job", "process_image", image_url, {"operation": operation}),
+            priority=priority,
+            owner=user["uid"]
+        )
+    except JobQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "deduplicated": deduplicated
+    }
+
+async def run_process_image_job(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Job handler for /process-image-jobs. process_image falls back to a mock response when
+    the model is unavailable; that is raised as a failure so the job can be resubmitted
+    instead of later submissions attaching to the mock for the job's result TTL.
+    """
+    result = await get_vertex_client().process_image(payload["image_url"], payload["operation"])
+    if "processing_method" not in result:
+        raise RuntimeError(result.get("note") or result.get("error") or "Image processing unavailable")
+    return result
+
+async def _get_job_for_user(job_id: str, user: Dict[str, Any], jobs: JobManager) -> Dict[str, Any]:
+    job = await jobs.get(job_id)
+    if job is None or user["uid"] not in job.get("owners", []):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.get("/jobs/{job_id}")
+async def get_job(
+    job_id: str,
+    user: Dict[str, Any] = Depends(verify_firebase_token),
+    jobs: JobManager = Depends(get_job_manager)
+):
+    """
+    Get the status of a background job, including its result once it has finished.
+    """
+    return public_job_state(await _get_job_for_user(job_id, user, jobs))
+
+@router.get("/jobs/{job_id}/events")
+async def stream_job_events(
+    job_id: str,
+    user: Dict[str, Any] = Depends(verify_firebase_token),
+    jobs: JobManager = Depends(get_job_manager)
+):
+    """
+    Push job status changes as Server-Sent Events until the job finishes.
+    """
+    await _get_job_for_user(job_id, user, jobs)
+
+    async def events():
+        async for state in jobs.watch(job_id):
+            yield sse_event(public_job_state(state), "status")
+
+    return event_stream(events())
+
 @router.post("/generate-market-insights")
 async def generate_market_insights(
     category: str = Form(...),
     region: str = Form("india"),
     artisan_context: str = Form("{}"),
+    stream: bool = Form(False),
     user: Dict[str, Any] = Depends(verify_firebase_token),
-    vertex_client: VertexClient = Depends()
+    vertex_client: VertexClient = Depends(get_vertex_client),
+    insights_store: MarketInsightsStore = Depends(get_market_insights_store)
 ):
     """
     Generate market insights for artisan crafts.
+    Requests without artisan context are served from precomputed insights when available.
+    With stream=true the insights are sent as Server-Sent Events as they are generated.
     """
     try:
         # Parse artisan context
@@ -182,6 +352,29 @@ async def generate_market_insights(
         except json.JSONDecodeError:
             context_dict = {}
 
+        # Only custom artisan context needs a live generation
+        precomputed = None if context_dict else insights_store.get(category, region)
+        if precomputed:
+            metadata = {
+                "category": category,
+                "region": region,
+                "precomputed": True,
+                "generated_at": datetime.fromtimestamp(precomputed["generated_at"], timezone.utc).isoformat()
+            }
+            if stream:
+                return _sse_response(_single_chunk(precomputed["insights"]), metadata)
+            return {"insights": precomputed["insights"], **metadata}
+
+        if stream:
+            return _sse_response(
+                vertex_client.stream_market_insights(
+                    category=category,
+                    region=region,
+                    artisan_context=context_dict
+                ),
+                {"category": category, "region": region}
+            )
+
         # Generate insights using VertexAI
         insights = await vertex_client.generate_market_insights(
             category=category,
@@ -195,6 +388,8 @@ async def generate_market_insights(
             "region": region
         }
 
+    except BudgetExceededError:
+        raise
     except Exception as e:
         logger.error(f"Error generating market insights: {str(e)}")
         # Return mock insights if AI fails
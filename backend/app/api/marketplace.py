@@ -1,21 +1,107 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from ..auth.firebase import verify_firebase_token
+from ..auth.user_context import (
+    ARTISANS_COLLECTION, BUYERS_COLLECTION, UserContext, get_user_context, invalidate_user_profile
+)
 from ..services.firestore_client import FirestoreClient
-from ..services.vertex_client import VertexClient
+from ..services.vertex_client import TEXT_MODEL_NAME, VertexClient, get_vertex_client
+from ..services.cache import make_cache_key
+from ..services.usage import BudgetExceededError
+from ..services.concurrency import CircuitOpenError
+from ..services.jobs import JobManager, JobQueueFullError, get_job_manager
 from ..schemas.marketplace import (
-    Product, ProductCreateRequest, ProductUpdateRequest,
+    Product, ProductCreateRequest, ProductUpdateRequest, Profile, ProfileRole, ProfileUpdateRequest,
     Conversation, Message, MessageCreateRequest,
     PurchaseRequest, PurchaseResponse,
-    SEOOptimizeRequest, SEOOptimizeResponse,
-    EmailCampaignRequest, EmailCampaignResponse
+    SEOOptimizeRequest, SEOOptimizeResponse, SEOBulkOptimizeRequest, SEOBulkOptimizeResponse,
+    EmailCampaignRequest, EmailCampaignResponse, EmailCampaignBatchRequest
 )
+from .sse import event_stream, sse_event
 from typing import List, Optional, Dict, Any
+import asyncio
 import logging
+import os
 from datetime import datetime
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+SEO_PLATFORMS = ["google", "facebook", "instagram", "amazon"]
+
+# Products optimised at once by a bulk SEO job
+SEO_BULK_CONCURRENCY = int(os.getenv("SEO_BULK_CONCURRENCY", "8"))
+
+# JSON schema the model's output is constrained to; mirrors SEOOptimizeResponse
+SEO_RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "score": {"type": "integer"},
+        "keywords": {"type": "array", "items": {"type": "string"}},
+        "metaTitle": {"type": "string"},
+        "metaDescription": {"type": "string"},
+        "improvedDescription": {"type": "string"}
+    },
+    "required": ["score", "keywords", "metaTitle", "metaDescription", "improvedDescription"]
+}
+
+CAMPAIGN_TYPES = ["seasonal", "new_arrival", "promotion", "newsletter"]
+
+# Variants generated at once by a batch email campaign request, and the most one request may ask for
+EMAIL_BATCH_CONCURRENCY = int(os.getenv("EMAIL_BATCH_CONCURRENCY", "6"))
+EMAIL_BATCH_MAX_VARIANTS = int(os.getenv("EMAIL_BATCH_MAX_VARIANTS", "40"))
+
+# Shared instructions come first and only the final lines vary per campaign type and audience
+EMAIL_CAMPAIGN_INSTRUCTIONS = """
+Write a marketing email campaign for Indian artisans selling handicrafts on KalaConnect.
+
+Provide:
+1. subjectSuggestions: 3 compelling subject line suggestions
+2. emailBody: complete email body content suitable for Indian artisans selling handicrafts
+
+Make it culturally appropriate and engaging for Indian customers.
+"""
+
+EMAIL_CAMPAIGN_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "subjectSuggestions": {"type": "array", "items": {"type": "string"}},
+        "emailBody": {"type": "string"}
+    },
+    "required": ["subjectSuggestions", "emailBody"]
+}
+
+MOCK_EMAIL_CAMPAIGN = {
+    "subjectSuggestions": [
+        "Discover Authentic Indian Handicrafts - Made with Love",
+        "Traditional Artistry Meets Modern Style",
+        "Your Story, Our Craft: Unique Handmade Treasures"
+    ],
+    "emailBody": """Dear Valued Customer,
+
+Welcome to our world of authentic Indian handicrafts!
+
+Each piece in our collection tells a story of tradition, craftsmanship, and cultural heritage. Our skilled artisans pour their heart and soul into creating unique pieces that bring the beauty of Indian art to your home.
+
+Featured Collection:
+- Handwoven silk sarees with traditional motifs
+- Intricate silver jewelry with kundan work
+- Blue pottery inspired by royal heritage
+
+Visit our marketplace today and discover the perfect piece that resonates with your soul.
+
+Warm regards,
+The Artisan Community"""
+}
+
+# Served when the AI service is unavailable
+MOCK_SEO_RESPONSE = {
+    "score": 85,
+    "keywords": ["handcrafted", "traditional", "artisan", "authentic", "indian handicraft"],
+    "metaTitle": "Handcrafted Traditional Indian Art - Authentic Artisan Products",
+    "metaDescription": "Discover authentic handcrafted traditional Indian art by skilled artisans. Unique cultural heritage products with stories.",
+    "improvedDescription": "Experience the rich heritage of Indian craftsmanship with this authentic handcrafted traditional art piece, created by skilled artisans using age-old techniques passed down through generations."
+}
+
 # Mock data for demonstration
 MOCK_PRODUCTS = [
     {
@@ -291,7 +377,7 @@ async def get_products(
 @router.post("/products", response_model=Dict[str, str])
 async def create_product(
     request: ProductCreateRequest,
-    user: Dict[str, Any] = Depends(verify_firebase_token),
+    user: UserContext = Depends(get_user_context),
     firestore: FirestoreClient = Depends()
 ):
     """
@@ -304,7 +390,7 @@ async def create_product(
             "price": request.price,
             "category": request.category,
             "artisan_id": user["uid"],
-            "artisan_name": "Artisan Name",  # Would get from artisan profile
+            "artisan_name": await user.display_name(),
             "images": request.images,
             "tags": request.tags,
             "cultural_context": request.cultural_context,
@@ -323,6 +409,55 @@ async def create_product(
         logger.error(f"Error creating product: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to create product")
 
+@router.get("/profile", response_model=Profile)
+async def get_profile(
+    user: UserContext = Depends(get_user_context)
+):
+    """
+    Get the current user's artisan or buyer profile.
+    """
+    profile = await user.profile()
+    data = profile["data"] or {}
+    return Profile(
+        uid=user.uid,
+        role=profile["role"],
+        display_name=await user.display_name(),
+        bio=data.get("bio"),
+        region=data.get("region")
+    )
+
+@router.put("/profile", response_model=Profile)
+async def update_profile(
+    request: ProfileUpdateRequest,
+    user: UserContext = Depends(get_user_context),
+    firestore: FirestoreClient = Depends()
+):
+    """
+    Create or update the current user's profile in the artisans or buyers collection,
+    removing any profile in the other one. Names shown on products and messages come from here.
+    """
+    display_name = request.display_name.strip()
+    if not display_name:
+        raise HTTPException(status_code=422, detail="Display name cannot be empty")
+
+    try:
+        collection = ARTISANS_COLLECTION if request.role == ProfileRole.ARTISAN else BUYERS_COLLECTION
+        # Switching roles removes the profile in the other collection in the same write
+        await firestore.upsert_document_exclusive(collection, user.uid, {
+            "display_name": display_name,
+            "bio": request.bio,
+            "region": request.region,
+            "updated_at": firestore.get_timestamp()
+        }, exclusive_with=[ARTISANS_COLLECTION, BUYERS_COLLECTION])
+        invalidate_user_profile(user.uid)
+
+        return Profile(uid=user.uid, role=request.role, display_name=display_name,
+                       bio=request.bio, region=request.region)
+
+    except Exception as e:
+        logger.error(f"Error updating profile: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to update profile")
+
 @router.get("/conversations", response_model=List[Conversation])
 async def get_conversations(
     user: Dict[str, Any] = Depends(verify_firebase_token)
@@ -358,7 +493,7 @@ async def get_messages(
 @router.post("/send-message")
 async def send_message(
     request: MessageCreateRequest,
-    user: Dict[str, Any] = Depends(verify_firebase_token),
+    user: UserContext = Depends(get_user_context),
     firestore: FirestoreClient = Depends()
 ):
     """
@@ -368,7 +503,8 @@ async def send_message(
         message_doc = {
             "conversation_id": request.conversation_id,
             "sender_id": user["uid"],
-            "sender_name": "User Name",  # Would get from user profile
+            "sender_name": await user.display_name(),
+            "sender_role": await user.role(),
             "content": request.content,
             "timestamp": firestore.get_timestamp(),
             "is_read": False
@@ -376,12 +512,15 @@ async def send_message(
 
         message_id = await firestore.create_document("messages", message_doc)
 
-        # Update conversation's last message
-        await firestore.update_document("conversations", request.conversation_id, {
-            "last_message": request.content,
-            "last_message_time": firestore.get_timestamp(),
-            "updated_at": firestore.get_timestamp()
-        })
+        # Update conversation's last message; the message itself is already stored
+        try:
+            await firestore.update_document("conversations", request.conversation_id, {
+                "last_message": request.content,
+                "last_message_time": firestore.get_timestamp(),
+                "updated_at": firestore.get_timestamp()
+            })
+        except Exception as e:
+            logger.warning(f"Failed to update conversation {request.conversation_id}: {str(e)}")
 
         return {"message_id": message_id, "message": "Message sent successfully"}
 
@@ -436,7 +575,7 @@ async def initiate_purchase(
 async def optimize_seo(
     request: SEOOptimizeRequest,
     user: Dict[str, Any] = Depends(verify_firebase_token),
-    vertex_client: VertexClient = Depends()
+    vertex_client: VertexClient = Depends(get_vertex_client)
 ):
     """
     Optimize product description for SEO.
@@ -445,101 +584,215 @@ async def optimize_seo(
         # Validate request data
         if not request.description or len(request.description.strip()) == 0:
             raise HTTPException(status_code=422, detail="Description cannot be empty")
-        if not request.platform or request.platform not in ["google", "facebook", "instagram", "amazon"]:
+        if not request.platform or request.platform not in SEO_PLATFORMS:
             raise HTTPException(status_code=422, detail="Invalid platform. Must be one of: google, facebook, instagram, amazon")
 
-        prompt = f"""
-        Analyze this product description for SEO optimization on {request.platform}:
+        return await _optimize_seo(vertex_client, request.description, request.platform)
 
-        "{request.description}"
+    except (HTTPException, BudgetExceededError):
+        raise
+    except Exception as e:
+        logger.error(f"Error optimizing SEO: {str(e)}")
+        # Return sample optimization if AI fails
+        return SEOOptimizeResponse(**MOCK_SEO_RESPONSE)
 
-        Provide:
-        1. SEO score out of 100
-        2. Top 5 relevant keywords for Indian e-commerce
-        3. Optimized meta title (under 60 characters)
-        4. Optimized meta description (under 160 characters)
-        5. Improved product description with better SEO
+async def _optimize_seo(vertex_client: VertexClient, description: str, platform: str) -> SEOOptimizeResponse:
+    """
+    Structured SEO analysis of one description, cached by description hash and platform.
+    """
+    description = description.strip()
+    prompt = f"""
+    Analyze this product description for SEO optimization on {platform}:
+
+    "{description}"
 
-        Focus on Indian market keywords and search intent.
-        """
+    Provide:
+    1. score: SEO score out of 100
+    2. keywords: top 5 relevant keywords for Indian e-commerce
+    3. metaTitle: optimized meta title (under 60 characters)
+    4. metaDescription: optimized meta description (under 160 characters)
+    5. improvedDescription: improved product description with better SEO
+
+    Focus on Indian market keywords and search intent.
+    """
 
-        analysis = await vertex_client.generate_text(prompt)
+    result = await vertex_client.generate_json(
+        prompt,
+        SEO_RESPONSE_SCHEMA,
+        cache_key=make_cache_key("seo", TEXT_MODEL_NAME, description, {"platform": platform}),
+        operation="optimize_seo"
+    )
+    # The result is the cached object itself; adjust a copy
+    result = dict(result)
+    result["score"] = max(0, min(100, int(result["score"])))
+    return SEOOptimizeResponse(**result)
+
+@router.post("/seo-optimize/bulk", response_model=SEOBulkOptimizeResponse, status_code=202)
+async def optimize_seo_bulk(
+    request: SEOBulkOptimizeRequest,
+    user: Dict[str, Any] = Depends(verify_firebase_token),
+    jobs: JobManager = Depends(get_job_manager)
+):
+    """
+    Optimize SEO for all of the artisan's products (or the given product IDs) in one background job.
+    Poll /api/v1/ai/jobs/{jobId} for per-product results; each product's result is also saved on it.
+    """
+    if request.platform not in SEO_PLATFORMS:
+        raise HTTPException(status_code=422, detail="Invalid platform. Must be one of: google, facebook, instagram, amazon")
 
-        # Mock response for demonstration
-        return SEOOptimizeResponse(
-            score=85,
-            keywords=["handcrafted", "traditional", "artisan", "authentic", "indian handicraft"],
-            metaTitle="Handcrafted Traditional Indian Art - Authentic Artisan Products",
-            metaDescription="Discover authentic handcrafted traditional Indian art by skilled artisans. Unique cultural heritage products with stories.",
-            improvedDescription="Experience the rich heritage of Indian craftsmanship with this authentic handcrafted traditional art piece, created by skilled artisans using age-old techniques passed down through generations."
+    product_ids = sorted(request.productIds) if request.productIds else None
+    try:
+        job, deduplicated = await jobs.submit(
+            "seo_bulk",
+            {"artisan_id": user["uid"], "platform": request.platform, "product_ids": product_ids},
+            key=make_cache_key("job", "seo_bulk", user["uid"], {"platform": request.platform, "products": product_ids}),
+            priority="bulk",
+            owner=user["uid"],
+            # Descriptions may have changed since a finished run; only join one still in progress
+            reuse_finished=False
         )
+    except JobQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
 
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Error optimizing SEO: {str(e)}")
-        raise HTTPException(status_code=500, detail="Failed to optimize SEO")
+    return SEOBulkOptimizeResponse(jobId=job.id, status=job.status, deduplicated=deduplicated)
+
+async def run_seo_bulk_job(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Job handler for /seo-optimize/bulk: optimises the artisan's products with bounded concurrency
+    and saves each result on its product under seo.<platform>.
+    """
+    firestore = FirestoreClient()
+    vertex_client = get_vertex_client()
+    platform = payload["platform"]
+
+    products = await firestore.query_documents("products", "artisan_id", "==", payload["artisan_id"])
+    if payload.get("product_ids"):
+        wanted = set(payload["product_ids"])
+        products = [product for product in products if product["id"] in wanted]
+
+    semaphore = asyncio.Semaphore(SEO_BULK_CONCURRENCY)
+
+    async def optimize(product: Dict[str, Any]) -> Dict[str, Any]:
+        async with semaphore:
+            try:
+                seo = await _optimize_seo(vertex_client, product.get("description", ""), platform)
+                await firestore.upsert_document("products", product["id"], {"seo": {platform: seo.model_dump()}})
+                return {"product_id": product["id"], "status": "success", "seo": seo.model_dump()}
+            except Exception as e:
+                logger.warning(f"SEO optimization failed for product {product['id']}: {str(e)}")
+                return {"product_id": product["id"], "status": "failed", "error": str(e)}
+
+    results = await asyncio.gather(*(optimize(product) for product in products if product.get("description")))
+    return {
+        "platform": platform,
+        "total": len(results),
+        "succeeded": sum(1 for result in results if result["status"] == "success"),
+        "results": results
+    }
 
 @router.post("/generate-email-campaign", response_model=EmailCampaignResponse)
 async def generate_email_campaign(
     request: EmailCampaignRequest,
     user: Dict[str, Any] = Depends(verify_firebase_token),
-    vertex_client: VertexClient = Depends()
+    vertex_client: VertexClient = Depends(get_vertex_client)
 ):
     """
     Generate email campaign content.
     """
     try:
         # Validate request data
-        if not request.campaignType or request.campaignType not in ["seasonal", "new_arrival", "promotion", "newsletter"]:
+        if not request.campaignType or request.campaignType not in CAMPAIGN_TYPES:
             raise HTTPException(status_code=422, detail="Invalid campaign type. Must be one of: seasonal, new_arrival, promotion, newsletter")
         if not request.targetAudience or len(request.targetAudience.strip()) == 0:
             raise HTTPException(status_code=422, detail="Target audience cannot be empty")
 
-        prompt = f"""
-        Generate an email campaign for {request.campaignType} targeting {request.targetAudience}.
-
-        Provide:
-        1. 3 compelling subject line suggestions
-        2. Complete email body content suitable for Indian artisans selling handicrafts
+        return await _generate_email_campaign(vertex_client, request.campaignType, request.targetAudience)
 
-        Make it culturally appropriate and engaging for Indian customers.
-        """
-
-        content = await vertex_client.generate_text(prompt)
-
-        # Mock response for demonstration
-        subject_suggestions = [
-            "Discover Authentic Indian Handicrafts - Made with Love",
-            "Traditional Artistry Meets Modern Style",
-            "Your Story, Our Craft: Unique Handmade Treasures"
-        ]
-
-        email_body = """
-        Dear Valued Customer,
-
-        Welcome to our world of authentic Indian handicrafts!
-
-        Each piece in our collection tells a story of tradition, craftsmanship, and cultural heritage. Our skilled artisans pour their heart and soul into creating unique pieces that bring the beauty of Indian art to your home.
-
-        Featured Collection:
-        - Handwoven silk sarees with traditional motifs
-        - Intricate silver jewelry with kundan work
-        - Blue pottery inspired by royal heritage
-
-        Visit our marketplace today and discover the perfect piece that resonates with your soul.
-
-        Warm regards,
-        The Artisan Community
-        """
-
-        return EmailCampaignResponse(
-            subjectSuggestions=subject_suggestions,
-            emailBody=email_body.strip()
-        )
-
-    except HTTPException:
+    except (HTTPException, BudgetExceededError):
         raise
     except Exception as e:
         logger.error(f"Error generating email campaign: {str(e)}")
-        raise HTTPException(status_code=500, detail="Failed to generate email campaign")
+        # Return sample campaign if AI fails
+        return EmailCampaignResponse(**MOCK_EMAIL_CAMPAIGN)
+
+async def _generate_email_campaign(vertex_client: VertexClient, campaign_type: str,
+                                   target_audience: str) -> EmailCampaignResponse:
+    """
+    Structured campaign for one type and audience, cached per (type, audience).
+    """
+    target_audience = target_audience.strip()
+    prompt = f"{EMAIL_CAMPAIGN_INSTRUCTIONS}\nCampaign type: {campaign_type}\nTarget audience: {target_audience}\n"
+    result = await vertex_client.generate_json(
+        prompt,
+        EMAIL_CAMPAIGN_SCHEMA,
+        max_tokens=1500,
+        cache_key=make_cache_key("email_campaign", TEXT_MODEL_NAME, target_audience.lower(),
+                                 {"campaign_type": campaign_type}),
+        operation="email_campaign"
+    )
+    return EmailCampaignResponse(**result)
+
+@router.post("/generate-email-campaigns/batch")
+async def generate_email_campaigns_batch(
+    request: EmailCampaignBatchRequest,
+    user: Dict[str, Any] = Depends(verify_firebase_token),
+    vertex_client: VertexClient = Depends(get_vertex_client)
+):
+    """
+    Generate campaigns for every combination of campaign type and target audience.
+    Variants are generated concurrently and streamed as Server-Sent Events ("variant")
+    in the order they complete, followed by a "done" event.
+    """
+    campaign_types = request.campaignTypes or CAMPAIGN_TYPES
+    invalid = [campaign_type for campaign_type in campaign_types if campaign_type not in CAMPAIGN_TYPES]
+    if invalid:
+        raise HTTPException(status_code=422, detail="Invalid campaign type. Must be one of: seasonal, new_arrival, promotion, newsletter")
+
+    # Audiences differing only in case or surrounding whitespace are generated once
+    audiences = list({audience.strip().lower(): audience.strip() for audience in request.targetAudiences
+                      if audience.strip()}.values())
+    if not audiences:
+        raise HTTPException(status_code=422, detail="Target audiences cannot be empty")
+
+    variants = [(campaign_type, audience) for campaign_type in dict.fromkeys(campaign_types) for audience in audiences]
+    if len(variants) > EMAIL_BATCH_MAX_VARIANTS:
+        raise HTTPException(status_code=422, detail=f"Too many variants ({len(variants)}); the limit is {EMAIL_BATCH_MAX_VARIANTS}")
+
+    # Reject over-budget requests with 429 before the stream starts and the status is sent
+    vertex_client.check_budget()
+
+    semaphore = asyncio.Semaphore(EMAIL_BATCH_CONCURRENCY)
+
+    async def generate(campaign_type: str, audience: str) -> Dict[str, Any]:
+        variant = {"campaignType": campaign_type, "targetAudience": audience}
+        async with semaphore:
+            try:
+                campaign = await _generate_email_campaign(vertex_client, campaign_type, audience)
+                variant.update(campaign.model_dump(), status="success")
+            except (BudgetExceededError, CircuitOpenError):
+                raise
+            except Exception as e:
+                logger.warning(f"Email campaign failed for {campaign_type}/{audience}: {str(e)}")
+                variant.update(MOCK_EMAIL_CAMPAIGN, status="fallback")
+        return variant
+
+    async def events():
+        tasks = [asyncio.ensure_future(generate(campaign_type, audience)) for campaign_type, audience in variants]
+        succeeded = 0
+        try:
+            for next_variant in asyncio.as_completed(tasks):
+                variant = await next_variant
+                succeeded += variant["status"] == "success"
+                yield sse_event(variant, "variant")
+            yield sse_event({"total": len(variants), "succeeded": succeeded}, "done")
+        except BudgetExceededError as e:
+            # The budget ran out mid-batch; stop rather than stream mocks for the remaining variants
+            yield sse_event({"detail": str(e), "succeeded": succeeded}, "error")
+        except CircuitOpenError:
+            yield sse_event({"detail": "AI service temporarily unavailable", "succeeded": succeeded}, "error")
+        finally:
+            # Stop outstanding generations if the client disconnects
+            for task in tasks:
+                task.cancel()
+
+    return event_stream(events())
@@ -0,0 +1,81 @@
+from fastapi import APIRouter, Depends, HTTPException
+from ..auth.firebase import verify_firebase_token
+from ..services.storage_client import AsyncStorageClient, get_async_storage_client
+from ..schemas.media import SignedUploadRequest, SignedUploadResponse
+from typing import Dict, Any
+import logging
+import os
+import uuid
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# Accepted upload types and the extension used for the object name; the processing
+# function detects media type from the extension, so it must always be present.
+ALLOWED_UPLOAD_TYPES = {
+    "image/jpeg": ".jpg",
+    "image/png": ".png",
+    "image/webp": ".webp",
+    "video/mp4": ".mp4",
+    "video/webm": ".webm",
+    "video/quicktime": ".mov",
+    "audio/wav": ".wav",
+    "audio/x-wav": ".wav",
+    "audio/webm": ".weba",
+    "audio/ogg": ".ogg",
+    "audio/mpeg": ".mp3",
+    "audio/flac": ".flac"
+}
+
+MAX_UPLOAD_BYTES = {
+    "image": int(os.getenv("MAX_IMAGE_UPLOAD_BYTES", str(20 * 1024 * 1024))),
+    "video": int(os.getenv("MAX_VIDEO_UPLOAD_BYTES", str(500 * 1024 * 1024))),
+    "audio": int(os.getenv("MAX_AUDIO_UPLOAD_BYTES", str(100 * 1024 * 1024)))
+}
+
+SIGNED_UPLOAD_EXPIRATION = int(os.getenv("SIGNED_UPLOAD_EXPIRATION_SECONDS", "900"))
+
+@router.post("/upload-url", response_model=SignedUploadResponse)
+async def create_upload_url(
+    request: SignedUploadRequest,
+    user: Dict[str, Any] = Depends(verify_firebase_token),
+    storage: AsyncStorageClient = Depends(get_async_storage_client)
+):
+    """
+    Issue a V4 signed URL so the client uploads media directly to the bucket.
+    The GCS finalize trigger picks up processing once the upload completes.
+    """
+    try:
+        extension = ALLOWED_UPLOAD_TYPES.get(request.content_type)
+        if not extension:
+            raise HTTPException(status_code=422, detail=f"Unsupported content type: {request.content_type}")
+
+        max_size = MAX_UPLOAD_BYTES[request.content_type.split("/")[0]]
+        if request.size_bytes <= 0 or request.size_bytes > max_size:
+            raise HTTPException(status_code=413, detail=f"File size must be between 1 and {max_size} bytes")
+
+        blob_name = f"uploads/{user['uid']}/{uuid.uuid4().hex}{extension}"
+        signed = await storage.get_signed_upload_url(
+            blob_name,
+            content_type=request.content_type,
+            max_size=max_size,
+            expiration=SIGNED_UPLOAD_EXPIRATION,
+            resumable=request.resumable
+        )
+
+        logger.info(f"Issued signed upload URL for {blob_name}")
+        return SignedUploadResponse(
+            upload_url=signed["url"],
+            method=signed["method"],
+            blob_name=blob_name,
+            gcs_uri=f"gs://{storage.bucket_name}/{blob_name}",
+            headers=signed["headers"],
+            max_size_bytes=max_size,
+            expires_in=SIGNED_UPLOAD_EXPIRATION
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error creating signed upload URL: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to create upload URL")
@@ -0,0 +1,20 @@
+from fastapi.responses import StreamingResponse
+from typing import Any, AsyncIterator, Dict, Optional
+import json
+
+def sse_event(data: Dict[str, Any], event: Optional[str] = None) -> str:
+    """
+    Format one Server-Sent Event with a JSON payload.
+    """
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def event_stream(events: AsyncIterator[str]) -> StreamingResponse:
+    """
+    Stream pre-formatted events without proxy buffering, so each one reaches the client as it is sent.
+    """
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,8 +1,15 @@
 from fastapi import HTTPException, Request
 from firebase_admin import auth, credentials, initialize_app
+from google.auth import jwt
 import os
+import re
+import time
+import asyncio
+import hashlib
 import logging
-from typing import Dict, Any
+import httpx
+from typing import Dict, Any, Optional
+from ..services.cache import ResponseCache
 
 logger = logging.getLogger(__name__)
 
@@ -16,10 +23,96 @@ if not os.getenv("TESTING"):  # Skip initialization during tests
         # Use Application Default Credentials (ADC) for GCP environments
         initialize_app()
 
+EXPECTED_ISSUER = os.getenv("FIREBASE_AUTH_ISSUER", "https://securetoken.google.com/genai-9bcd4")
+# ID tokens are issued for the Firebase project, which is also the issuer's last path segment
+FIREBASE_PROJECT_ID = os.getenv("FIREBASE_PROJECT_ID") or EXPECTED_ISSUER.rstrip("/").rsplit("/", 1)[-1]
+
+# Verify signatures locally against Google's published certs instead of through the Admin SDK
+FIREBASE_LOCAL_VERIFY = os.getenv("FIREBASE_LOCAL_VERIFY", "true").lower() == "true"
+FIREBASE_CERTS_URL = "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com"
+CLOCK_SKEW_SECONDS = 10
+
+# Verified tokens are reused until they expire, capped at this many seconds
+TOKEN_CACHE_MAX_TTL = float(os.getenv("AUTH_TOKEN_CACHE_MAX_TTL_SECONDS", "3600"))
+
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+class TokenExpiredError(ValueError):
+    """Raised when an ID token's exp is in the past."""
+
+class _PublicKeyCache:
+    """
+    Google's token-signing certificates, fetched without blocking the event loop and
+    refreshed when the response's Cache-Control max-age runs out. If a refresh fails,
+    the previous certs keep being used for a minute before trying again.
+    """
+    def __init__(self, url: str):
+        self.url = url
+        self._certs: Optional[Dict[str, str]] = None
+        self._expires_at = 0.0
+        self._lock = asyncio.Lock()
+        self._client: Optional[httpx.AsyncClient] = None
+
+    async def get(self) -> Dict[str, str]:
+        if self._certs is not None and time.time() < self._expires_at:
+            return self._certs
+        async with self._lock:
+            # Another request may have refreshed them while this one waited
+            if self._certs is not None and time.time() < self._expires_at:
+                return self._certs
+            try:
+                if self._client is None:
+                    self._client = httpx.AsyncClient(timeout=httpx.Timeout(5.0))
+                response = await self._client.get(self.url)
+                response.raise_for_status()
+                match = _MAX_AGE.search(response.headers.get("Cache-Control", ""))
+                self._certs = response.json()
+                self._expires_at = time.time() + (int(match.group(1)) if match else 3600)
+                _auth_stats["cert_fetches"] += 1
+            except Exception as e:
+                if self._certs is None:
+                    raise
+                logger.warning(f"Refreshing Firebase certs failed, using cached certs: {str(e)}")
+                self._expires_at = time.time() + 60
+            return self._certs
+
+_public_keys = _PublicKeyCache(FIREBASE_CERTS_URL)
+_token_cache = ResponseCache(
+    max_entries=int(os.getenv("AUTH_TOKEN_CACHE_MAX_ENTRIES", "10000")),
+    max_bytes=int(os.getenv("AUTH_TOKEN_CACHE_MAX_BYTES", str(16 * 1024 * 1024))),
+    ttl=TOKEN_CACHE_MAX_TTL
+)
+_auth_stats = {"requests": 0, "cache_hits": 0, "verified": 0, "failures": 0, "cert_fetches": 0,
+               "total_ms": 0.0, "total_verify_ms": 0.0}
+
+async def _verify_id_token(token: str) -> Dict[str, Any]:
+    """
+    Verify signature, audience and expiry of a Firebase ID token. The RSA check runs off
+    the event loop; the Admin SDK is used when local verification is disabled.
+    """
+    loop = asyncio.get_event_loop()
+    if not FIREBASE_LOCAL_VERIFY:
+        return await loop.run_in_executor(None, auth.verify_id_token, token)
+
+    certs = await _public_keys.get()
+    claims = jwt.decode(token, verify=False)
+    if claims.get("exp", 0) + CLOCK_SKEW_SECONDS < time.time():
+        raise TokenExpiredError("Token expired")
+    decoded = await loop.run_in_executor(
+        None, lambda: jwt.decode(token, certs=certs, audience=FIREBASE_PROJECT_ID,
+                                 clock_skew_in_seconds=CLOCK_SKEW_SECONDS)
+    )
+    subject = decoded.get("sub")
+    if not isinstance(subject, str) or not subject or len(subject) > 128:
+        raise ValueError("Token has an invalid subject")
+    # Match the Admin SDK, which exposes the subject as uid
+    decoded["uid"] = subject
+    return decoded
+
 async def verify_firebase_token(request: Request) -> Dict[str, Any]:
     """
     Verify Firebase JWT token from Authorization header.
-    Returns decoded token payload if valid.
+    Returns decoded token payload if valid. Verified tokens are cached by hash until they expire.
     """
     # Skip authentication in testing mode
     if os.getenv("TESTING"):
@@ -29,24 +122,58 @@ async def verify_firebase_token(request: Request) -> Dict[str, Any]:
     if not authorization:
         raise HTTPException(status_code=401, detail="Authorization header missing")
 
+    start = time.perf_counter()
+    _auth_stats["requests"] += 1
     try:
         # Extract token from "Bearer <token>"
         token = authorization.split(" ")[1] if " " in authorization else authorization
 
+        cache_key = hashlib.sha256(token.encode("utf-8")).hexdigest()
+        cached = _token_cache.get(cache_key)
+        if cached is not None and cached.get("exp", 0) > time.time():
+            _auth_stats["cache_hits"] += 1
+            return dict(cached)
+
         # Verify the token
-        decoded_token = auth.verify_id_token(token)
+        verify_start = time.perf_counter()
+        decoded_token = await _verify_id_token(token)
+        _auth_stats["verified"] += 1
+        _auth_stats["total_verify_ms"] += (time.perf_counter() - verify_start) * 1000
 
         # Optional: Check issuer
-        expected_issuer = os.getenv("FIREBASE_AUTH_ISSUER", "https://securetoken.google.com/genai-9bcd4")
-        if decoded_token.get("iss") != expected_issuer:
+        if decoded_token.get("iss") != EXPECTED_ISSUER:
             raise HTTPException(status_code=401, detail="Invalid token issuer")
 
+        ttl = min(TOKEN_CACHE_MAX_TTL, decoded_token.get("exp", 0) - time.time())
+        if ttl > 0:
+            _token_cache.set(cache_key, dict(decoded_token), ttl=ttl)
         return decoded_token
 
-    except auth.InvalidIdTokenError:
-        raise HTTPException(status_code=401, detail="Invalid token")
-    except auth.ExpiredIdTokenError:
+    except HTTPException:
+        _auth_stats["failures"] += 1
+        raise
+    except (auth.ExpiredIdTokenError, TokenExpiredError):
+        _auth_stats["failures"] += 1
         raise HTTPException(status_code=401, detail="Token expired")
+    except (auth.InvalidIdTokenError, ValueError):
+        _auth_stats["failures"] += 1
+        raise HTTPException(status_code=401, detail="Invalid token")
     except Exception as e:
+        _auth_stats["failures"] += 1
         logger.error(f"Token verification error: {str(e)}")
         raise HTTPException(status_code=401, detail="Token verification failed")
+    finally:
+        _auth_stats["total_ms"] += (time.perf_counter() - start) * 1000
+
+def get_auth_stats() -> Dict[str, Any]:
+    """
+    Token cache hit rate and auth overhead per request, overall and for full verifications.
+    """
+    stats = dict(_auth_stats)
+    stats.update({
+        "avg_ms_per_request": stats["total_ms"] / stats["requests"] if stats["requests"] else 0.0,
+        "avg_verify_ms": stats["total_verify_ms"] / stats["verified"] if stats["verified"] else 0.0,
+        "local_verification": FIREBASE_LOCAL_VERIFY,
+        "cache": _token_cache.stats()
+    })
+    return stats
@@ -0,0 +1,122 @@
+from fastapi import Depends
+from .firebase import verify_firebase_token
+from ..services.firestore_client import FirestoreClient
+from ..services.cache import ResponseCache
+import os
+import asyncio
+import logging
+from typing import Dict, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Profiles are keyed by uid and written by PUT /api/v1/marketplace/profile,
+# which keeps each uid in only one of the two collections
+ARTISANS_COLLECTION = "artisans"
+BUYERS_COLLECTION = "buyers"
+PROFILE_ROLES = ("artisan", "buyer")
+
+# Short so profile edits show up quickly on other instances
+USER_PROFILE_CACHE_TTL_SECONDS = float(os.getenv("USER_PROFILE_CACHE_TTL_SECONDS", "60"))
+
+_profile_cache = ResponseCache(
+    max_entries=int(os.getenv("USER_PROFILE_CACHE_MAX_ENTRIES", "5000")),
+    max_bytes=int(os.getenv("USER_PROFILE_CACHE_MAX_BYTES", str(8 * 1024 * 1024))),
+    ttl=USER_PROFILE_CACHE_TTL_SECONDS
+)
+
+class UserContext:
+    """
+    The authenticated user for one request: the verified token claims plus the artisan or
+    buyer profile, loaded from Firestore on first use and at most once per request.
+    Supports user["uid"] and user.get(...) on the token claims like the plain decoded token.
+    """
+    def __init__(self, claims: Dict[str, Any], firestore: FirestoreClient):
+        self.claims = claims
+        self.firestore = firestore
+        self._profile: Optional[Dict[str, Any]] = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def uid(self) -> str:
+        return self.claims["uid"]
+
+    def __getitem__(self, key: str) -> Any:
+        return self.claims[key]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.claims.get(key, default)
+
+    async def profile(self) -> Dict[str, Any]:
+        """
+        {"role": "artisan" | "buyer", "data": profile document or None}.
+        """
+        if self._profile is not None:
+            return self._profile
+        async with self._lock:
+            if self._profile is None:
+                self._profile = _profile_cache.get(self.uid)
+                if self._profile is None:
+                    self._profile, complete = await self._load_profile()
+                    # A fallback after a failed read is used for this request only
+                    if complete:
+                        _profile_cache.set(self.uid, self._profile)
+        return self._profile
+
+    async def _load_profile(self) -> Tuple[Dict[str, Any], bool]:
+        """
+        Returns the profile and whether both lookups succeeded.
+        """
+        # Both lookups go out together so a buyer costs no extra round trip
+        artisan, buyer = await asyncio.gather(
+            self.firestore.get_document(ARTISANS_COLLECTION, self.uid),
+            self.firestore.get_document(BUYERS_COLLECTION, self.uid),
+            return_exceptions=True
+        )
+        complete = True
+        for document in (artisan, buyer):
+            if isinstance(document, Exception):
+                logger.warning(f"Failed to load profile for {self.uid}: {str(document)}")
+                complete = False
+        if isinstance(artisan, dict):
+            return {"role": "artisan", "data": artisan}, True
+        if isinstance(buyer, dict):
+            return {"role": "buyer", "data": buyer}, complete
+        # Custom claims may carry other roles (e.g. admin); profiles only know these two
+        role = self.claims.get("role")
+        return {"role": role if role in PROFILE_ROLES else "buyer", "data": None}, complete
+
+    async def role(self) -> str:
+        return (await self.profile())["role"]
+
+    async def display_name(self) -> str:
+        """
+        Profile name, else the token's name or email, else a generic label for the role.
+        """
+        profile = await self.profile()
+        data = profile["data"] or {}
+        name = data.get("display_name") or data.get("name") or self.claims.get("name")
+        if name:
+            return name
+        email = self.claims.get("email")
+        if email:
+            return email.split("@")[0]
+        return profile["role"].capitalize()
+
+async def get_user_context(
+    claims: Dict[str, Any] = Depends(verify_firebase_token),
+    firestore: FirestoreClient = Depends()
+) -> UserContext:
+    """
+    FastAPI dependency returning the UserContext for the current request.
+    """
+    return UserContext(claims, firestore)
+
+def invalidate_user_profile(uid: str):
+    """
+    Drop a cached profile after it is updated. Other instances see the change once
+    their copy expires.
+    """
+    _profile_cache.delete(uid)
+
+def get_profile_cache_stats() -> Dict[str, Any]:
+    return _profile_cache.stats()
@@ -1,14 +1,52 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from .api.marketplace import router as marketplace_router
-from .api.ai import router as ai_router
+from .api.marketplace import router as marketplace_router, run_seo_bulk_job
+from .api.ai import router as ai_router, run_process_image_job
+from .api.media import router as media_router
+from .api.admin import router as admin_router
+from .services.vertex_client import get_vertex_client
+from .services.usage import BudgetExceededError, EndpointContextMiddleware
+from .services.jobs import get_job_manager
+from .services.insights import MARKET_INSIGHTS_PRECOMPUTE, MarketInsightsScheduler, get_market_insights_store
+from contextlib import asynccontextmanager
+import logging
 import os
 from dotenv import load_dotenv
 
 # Load environment variables from .env file in backend directory, overriding system env
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(os.path.dirname(__file__)), '.env'), override=True)
 
-app = FastAPI(title="KalaConnect Backend", version="1.0.0")
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Create the shared Vertex client up front; optionally load models before serving traffic
+    vertex_client = get_vertex_client()
+    if os.getenv("VERTEX_PREWARM", "false").lower() == "true":
+        try:
+            await vertex_client.warm_up()
+        except Exception as e:
+            logger.warning(f"Vertex AI warm-up failed: {str(e)}")
+
+    # Background workers for queued image operations and bulk SEO
+    jobs = get_job_manager()
+    jobs.register("process_image", run_process_image_job)
+    jobs.register("seo_bulk", run_seo_bulk_job)
+    jobs.start()
+
+    # Keep market insights for every category/region precomputed in the background
+    app.state.market_insights_scheduler = None
+    if MARKET_INSIGHTS_PRECOMPUTE:
+        app.state.market_insights_scheduler = MarketInsightsScheduler(get_market_insights_store(), vertex_client)
+        app.state.market_insights_scheduler.start()
+    yield
+    await jobs.stop()
+    if app.state.market_insights_scheduler is not None:
+        await app.state.market_insights_scheduler.stop()
+    await vertex_client.close()
+
+app = FastAPI(title="KalaConnect Backend", version="1.0.0", lifespan=lifespan)
 
 # CORS middleware for Flutter web app
 app.add_middleware(
@@ -19,8 +57,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Attribute AI usage and budgets to the endpoint that triggered each call
+app.add_middleware(EndpointContextMiddleware)
+
+@app.exception_handler(BudgetExceededError)
+async def budget_exceeded_handler(request: Request, exc: BudgetExceededError):
+    return JSONResponse(status_code=429, content={"detail": str(exc)})
+
 app.include_router(marketplace_router, prefix="/api/v1/marketplace")
 app.include_router(ai_router, prefix="/api/v1/ai")
+app.include_router(media_router, prefix="/api/v1/media")
+app.include_router(admin_router, prefix="/api/v1/admin")
 
 @app.get("/")
 async def root():
@@ -79,6 +79,23 @@ class Message(BaseModel):
     timestamp: datetime
     is_read: bool = False
 
+class ProfileRole(str, Enum):
+    ARTISAN = "artisan"
+    BUYER = "buyer"
+
+class ProfileUpdateRequest(BaseModel):
+    role: ProfileRole
+    display_name: str
+    bio: Optional[str] = None
+    region: Optional[str] = None
+
+class Profile(BaseModel):
+    uid: str
+    role: ProfileRole
+    display_name: str
+    bio: Optional[str] = None
+    region: Optional[str] = None
+
 class MessageCreateRequest(BaseModel):
     conversation_id: str
     content: str
@@ -107,6 +124,15 @@ class SEOOptimizeResponse(BaseModel):
     metaDescription: str
     improvedDescription: str
 
+class SEOBulkOptimizeRequest(BaseModel):
+    platform: str
+    productIds: Optional[List[str]] = None  # Defaults to all of the artisan's products
+
+class SEOBulkOptimizeResponse(BaseModel):
+    jobId: str
+    status: str
+    deduplicated: bool
+
 class EmailCampaignRequest(BaseModel):
     campaignType: str
     targetAudience: str
@@ -114,3 +140,7 @@ class EmailCampaignRequest(BaseModel):
 class EmailCampaignResponse(BaseModel):
     subjectSuggestions: List[str]
     emailBody: str
+
+class EmailCampaignBatchRequest(BaseModel):
+    campaignTypes: Optional[List[str]] = None  # Defaults to every campaign type
+    targetAudiences: List[str]
@@ -0,0 +1,17 @@
+from pydantic import BaseModel
+from typing import Dict, Optional
+
+class SignedUploadRequest(BaseModel):
+    filename: Optional[str] = None
+    content_type: str
+    size_bytes: int
+    resumable: bool = False
+
+class SignedUploadResponse(BaseModel):
+    upload_url: str
+    method: str
+    blob_name: str
+    gcs_uri: str
+    headers: Dict[str, str]
+    max_size_bytes: int
+    expires_in: int
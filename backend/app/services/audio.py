@@ -0,0 +1,186 @@
+import asyncio
+import logging
+import os
+import shutil
+import struct
+from typing import Any, AsyncIterator, Optional, Union
+from .storage_client import iter_async_chunks
+
+logger = logging.getLogger(__name__)
+
+# Bytes read from the start of an upload to identify its format
+PROBE_SIZE = 4096
+CHUNK_SIZE = 64 * 1024
+
+TARGET_SAMPLE_RATE = 16000
+
+# Sample rates Speech-to-Text accepts for Opus audio
+OPUS_SAMPLE_RATES = {8000, 12000, 16000, 24000, 48000}
+
+FFMPEG_PATH = os.getenv("FFMPEG_PATH") or shutil.which("ffmpeg")
+
+class AudioNormalizationError(Exception):
+    """Raised when an upload can't be converted into a format Speech-to-Text accepts."""
+
+class AudioFormat:
+    """
+    Format detected from the header of an audio upload.
+    """
+    def __init__(self, container: str, codec: Optional[str] = None, sample_rate: Optional[int] = None,
+                 channels: Optional[int] = None, bits_per_sample: Optional[int] = None):
+        self.container = container
+        self.codec = codec
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.bits_per_sample = bits_per_sample
+
+    def __repr__(self) -> str:
+        return (f"AudioFormat({self.container}, codec={self.codec}, rate={self.sample_rate}, "
+                f"channels={self.channels}, bits={self.bits_per_sample})")
+
+class NormalizedAudio:
+    """
+    Audio stream ready for Speech-to-Text along with the recognition settings it needs.
+    """
+    def __init__(self, chunks: AsyncIterator[bytes], encoding: str, sample_rate_hertz: Optional[int],
+                 channels: int, content_type: str, extension: str, source_format: AudioFormat):
+        self.chunks = chunks
+        self.encoding = encoding
+        self.sample_rate_hertz = sample_rate_hertz
+        self.channels = channels
+        self.content_type = content_type
+        self.extension = extension
+        self.source_format = source_format
+
+    @property
+    def bytes_per_second(self) -> Optional[int]:
+        """Exact data rate for PCM output; None for compressed codecs."""
+        if self.encoding == "LINEAR16" and self.sample_rate_hertz:
+            return self.sample_rate_hertz * 2 * self.channels
+        return None
+
+    def estimate_duration(self, size: int) -> Optional[float]:
+        """Duration in seconds for PCM output of the given size; None when it can't be known from size."""
+        rate = self.bytes_per_second
+        return size / rate if rate else None
+
+def probe_audio(header: bytes) -> AudioFormat:
+    """
+    Identify container, codec, sample rate and channels from the first bytes of a file.
+    """
+    if header[:4] == b"RIFF" and header[8:12] == b"WAVE":
+        return _probe_wav(header)
+    if header[:4] == b"fLaC" and len(header) >= 22:
+        sample_rate = (header[18] << 12) | (header[19] << 4) | (header[20] >> 4)
+        channels = ((header[20] >> 1) & 0x07) + 1
+        return AudioFormat("flac", "flac", sample_rate, channels)
+    if header[:4] == b"OggS":
+        index = header.find(b"OpusHead")
+        if index >= 0 and len(header) >= index + 16:
+            channels = header[index + 9]
+            sample_rate = struct.unpack_from("<I", header, index + 12)[0]
+            return AudioFormat("ogg", "opus", sample_rate, channels)
+        return AudioFormat("ogg", "vorbis" if b"vorbis" in header else None)
+    if header[:4] == b"\x1a\x45\xdf\xa3":
+        return AudioFormat("webm", "opus" if b"A_OPUS" in header else None)
+    if header[:3] == b"ID3" or (len(header) > 1 and header[0] == 0xFF and header[1] & 0xE0 == 0xE0):
+        return AudioFormat("mp3", "mp3")
+    return AudioFormat("unknown")
+
+def _probe_wav(header: bytes) -> AudioFormat:
+    offset = 12
+    while offset + 8 <= len(header):
+        chunk_id = header[offset:offset + 4]
+        chunk_size = struct.unpack_from("<I", header, offset + 4)[0]
+        if chunk_id == b"fmt " and offset + 24 <= len(header):
+            audio_format, channels, sample_rate = struct.unpack_from("<HHI", header, offset + 8)
+            bits_per_sample = struct.unpack_from("<H", header, offset + 22)[0]
+            # 1 = PCM, 0xFFFE = WAVE_FORMAT_EXTENSIBLE (PCM in practice)
+            codec = "pcm" if audio_format in (1, 0xFFFE) else f"wav_{audio_format}"
+            return AudioFormat("wav", codec, sample_rate, channels, bits_per_sample)
+        offset += 8 + chunk_size + (chunk_size & 1)
+    return AudioFormat("wav")
+
+async def normalize_audio(source: Union[Any, AsyncIterator[bytes]]) -> NormalizedAudio:
+    """
+    Probe an UploadFile or async byte iterator and return a stream Speech-to-Text accepts.
+    16 kHz mono PCM WAV, FLAC and Opus (Ogg/WebM) pass through unchanged; anything else is
+    resampled and downmixed to 16 kHz mono LINEAR16 by an ffmpeg pipe, chunk by chunk.
+    """
+    chunks = iter_async_chunks(source, CHUNK_SIZE)
+    head = b""
+    async for chunk in chunks:
+        head += chunk
+        if len(head) >= PROBE_SIZE:
+            break
+
+    audio_format = probe_audio(head)
+    logger.info(f"Probed audio upload: {audio_format}")
+
+    if audio_format.container == "wav" and audio_format.codec == "pcm" and audio_format.bits_per_sample == 16 \
+            and audio_format.sample_rate == TARGET_SAMPLE_RATE and audio_format.channels == 1:
+        return NormalizedAudio(_prepend(head, chunks), "LINEAR16", TARGET_SAMPLE_RATE, 1,
+                               "audio/wav", ".wav", audio_format)
+    if audio_format.codec == "flac":
+        return NormalizedAudio(_prepend(head, chunks), "FLAC", audio_format.sample_rate,
+                               audio_format.channels or 1, "audio/flac", ".flac", audio_format)
+    if audio_format.codec == "opus":
+        sample_rate = audio_format.sample_rate if audio_format.sample_rate in OPUS_SAMPLE_RATES else 48000
+        if audio_format.container == "ogg":
+            return NormalizedAudio(_prepend(head, chunks), "OGG_OPUS", sample_rate,
+                                   audio_format.channels or 1, "audio/ogg", ".ogg", audio_format)
+        return NormalizedAudio(_prepend(head, chunks), "WEBM_OPUS", sample_rate,
+                               audio_format.channels or 1, "audio/webm", ".weba", audio_format)
+
+    if not FFMPEG_PATH:
+        raise AudioNormalizationError(f"Cannot convert {audio_format.container} audio: ffmpeg is not installed")
+    return NormalizedAudio(_ffmpeg_to_pcm(_prepend(head, chunks)), "LINEAR16", TARGET_SAMPLE_RATE, 1,
+                           "audio/l16", ".pcm", audio_format)
+
+async def _prepend(head: bytes, chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    if head:
+        yield head
+    async for chunk in chunks:
+        yield chunk
+
+async def _ffmpeg_to_pcm(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """
+    Convert any audio ffmpeg understands to raw 16 kHz mono 16-bit PCM, streaming through pipes
+    so only a few chunks are in memory at once.
+    """
+    process = await asyncio.create_subprocess_exec(
+        FFMPEG_PATH, "-hide_banner", "-loglevel", "error",
+        "-i", "pipe:0",
+        "-ac", "1", "-ar", str(TARGET_SAMPLE_RATE), "-f", "s16le", "pipe:1",
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+
+    async def feed():
+        try:
+            async for chunk in chunks:
+                process.stdin.write(chunk)
+                await process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            # ffmpeg exited early; its exit code and stderr explain why
+            pass
+        finally:
+            process.stdin.close()
+
+    feeder = asyncio.ensure_future(feed())
+    try:
+        while True:
+            data = await process.stdout.read(CHUNK_SIZE)
+            if not data:
+                break
+            yield data
+        await feeder
+        stderr = await process.stderr.read()
+        if await process.wait() != 0:
+            raise AudioNormalizationError(f"ffmpeg failed: {stderr.decode(errors='replace').strip()}")
+    finally:
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+        feeder.cancel()
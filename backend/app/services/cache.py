@@ -0,0 +1,300 @@
+import os
+import json
+import hashlib
+import threading
+import time
+import logging
+import sqlite3
+import zlib
+import asyncio
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+# Serialized values at least this large are zlib-compressed before going to a shared backend
+COMPRESS_THRESHOLD = int(os.getenv("AI_CACHE_COMPRESS_THRESHOLD", "1024"))
+
+logger = logging.getLogger(__name__)
+
+def make_cache_key(namespace: str, model: str, prompt: Any, config: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Build a stable cache key: SHA-256 over the namespace, model name, prompt and generation config.
+    Unlike hash(), the result is identical across processes and restarts.
+    """
+    payload = json.dumps([namespace, model, prompt, config or {}], sort_keys=True, default=str, ensure_ascii=False)
+    return f"{namespace}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+def estimate_size(value: Any) -> int:
+    """
+    Approximate memory footprint of a cached value in bytes.
+    """
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, str):
+        return len(value.encode("utf-8")) + 49
+    if isinstance(value, (list, tuple)):
+        if all(isinstance(v, (int, float)) for v in value):
+            # Embedding vectors: pointer plus boxed float per element
+            return 56 + 32 * len(value)
+        return 56 + sum(estimate_size(v) for v in value)
+    if value is None:
+        return 16
+    try:
+        return len(json.dumps(value, default=str).encode("utf-8")) + 64
+    except (TypeError, ValueError):
+        return 1024
+
+class ResponseCache:
+    """
+    Thread-safe in-process LRU cache with per-entry TTL and a memory budget.
+    Evicts least recently used entries once either max_entries or max_bytes is exceeded.
+    """
+    def __init__(self, max_entries: Optional[int] = None, max_bytes: Optional[int] = None,
+                 ttl: Optional[float] = None):
+        self.max_entries = max_entries or int(os.getenv("AI_CACHE_MAX_ENTRIES", "2048"))
+        self.max_bytes = max_bytes or int(os.getenv("AI_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+        self.ttl = ttl or float(os.getenv("AI_CACHE_TTL_SECONDS", "3600"))
+        # key -> (value, expires_at, size)
+        self._entries: "OrderedDict[str, Tuple[Any, float, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Return the cached value, or None if missing or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            value, expires_at, size = entry
+            if time.time() >= expires_at:
+                self._remove(key)
+                self._stats["expirations"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        """
+        Store a value, evicting least recently used entries to stay within bounds.
+        """
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            logger.debug(f"Value for {key} exceeds cache budget, not caching")
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, time.time() + (ttl or self.ttl), size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._stats["evictions"] += 1
+
+    def delete(self, key: str):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remove(self, key: str):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get hit/miss/eviction counters and current memory usage.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._bytes
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def encode_value(value: Any) -> bytes:
+    """
+    Serialize a cache value to JSON, compressing large payloads. The first byte marks the format.
+    """
+    data = json.dumps(value, default=str, ensure_ascii=False).encode("utf-8")
+    if len(data) >= COMPRESS_THRESHOLD:
+        return b"z" + zlib.compress(data, 6)
+    return b"j" + data
+
+def decode_value(data: bytes) -> Any:
+    if data[:1] == b"z":
+        return json.loads(zlib.decompress(data[1:]).decode("utf-8"))
+    return json.loads(data[1:].decode("utf-8"))
+
+class CacheBackend(ABC):
+    """
+    Shared second-tier cache store. Implementations are blocking and are called off the event loop.
+    """
+    @abstractmethod
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        """
+        The value and its remaining TTL in seconds, or None on a miss.
+        """
+
+    @abstractmethod
+    def set(self, key: str, value: Any, ttl: float):
+        ...
+
+    @abstractmethod
+    def delete(self, key: str):
+        ...
+
+class SQLiteCacheBackend(CacheBackend):
+    """
+    Disk-backed cache for a single host, shared by every worker process on it.
+    """
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("AI_CACHE_SQLITE_PATH", "/tmp/kalaconnect_ai_cache.db")
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS ai_cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ai_cache_expires ON ai_cache (expires_at)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires_at FROM ai_cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        remaining = row[1] - time.time()
+        if remaining <= 0:
+            self.delete(key)
+            return None
+        return decode_value(row[0]), remaining
+
+    def set(self, key: str, value: Any, ttl: float):
+        data = encode_value(value)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO ai_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, data, time.time() + ttl)
+            )
+            self._writes += 1
+            # Purge expired rows now and then so the file doesn't grow without bound
+            if self._writes % 500 == 0:
+                self._conn.execute("DELETE FROM ai_cache WHERE expires_at <= ?", (time.time(),))
+            self._conn.commit()
+
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM ai_cache WHERE key = ?", (key,))
+            self._conn.commit()
+
+class RedisCacheBackend(CacheBackend):
+    """
+    Cache shared across instances through any Redis-protocol server (Memorystore, Redis, or a local stand-in).
+    TTLs are enforced by the server.
+    """
+    def __init__(self, url: Optional[str] = None, prefix: str = "kalaconnect:ai:"):
+        import redis
+
+        self.url = url or os.getenv("REDIS_URL", "redis://localhost:6379/0")
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(self.url, socket_timeout=1.0, socket_connect_timeout=1.0)
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        pipeline = self._client.pipeline()
+        pipeline.get(self.prefix + key)
+        pipeline.pttl(self.prefix + key)
+        data, remaining_ms = pipeline.execute()
+        # PTTL is negative for a key without expiry or one that expired between the two commands
+        if data is None or remaining_ms <= 0:
+            return None
+        return decode_value(data), remaining_ms / 1000
+
+    def set(self, key: str, value: Any, ttl: float):
+        self._client.set(self.prefix + key, encode_value(value), ex=max(1, int(ttl)))
+
+    def delete(self, key: str):
+        self._client.delete(self.prefix + key)
+
+def create_cache_backend() -> Optional[CacheBackend]:
+    """
+    Create the shared backend selected by AI_CACHE_BACKEND (none, sqlite or redis).
+    """
+    backend = os.getenv("AI_CACHE_BACKEND", "none").lower()
+    try:
+        if backend == "sqlite":
+            return SQLiteCacheBackend()
+        if backend == "redis":
+            return RedisCacheBackend()
+    except Exception as e:
+        logger.warning(f"Failed to initialize {backend} cache backend: {str(e)}. Using in-process cache only.")
+    return None
+
+class TieredCache:
+    """
+    In-process ResponseCache in front of an optional shared CacheBackend.
+    Backend failures are logged and treated as misses so they never fail a request.
+    """
+    def __init__(self, memory: Optional[ResponseCache] = None, backend: Optional[CacheBackend] = None):
+        self.memory = memory or ResponseCache()
+        self.backend = backend
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="ai-cache") if backend else None
+        self._stats = {"backend_hits": 0, "backend_misses": 0, "backend_errors": 0}
+
+    async def get(self, key: str) -> Optional[Any]:
+        value = self.memory.get(key)
+        if value is not None or self.backend is None:
+            return value
+        try:
+            entry = await asyncio.get_event_loop().run_in_executor(self._executor, self.backend.get, key)
+        except Exception as e:
+            logger.warning(f"Cache backend get failed: {str(e)}")
+            self._stats["backend_errors"] += 1
+            return None
+        if entry is None:
+            self._stats["backend_misses"] += 1
+            return None
+        self._stats["backend_hits"] += 1
+        value, remaining = entry
+        # Keep the shared entry's expiry so the local copy can't outlive it
+        self.memory.set(key, value, remaining)
+        return value
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        self.memory.set(key, value, ttl)
+        if self.backend is None:
+            return
+        try:
+            await asyncio.get_event_loop().run_in_executor(
+                self._executor, self.backend.set, key, value, ttl or self.memory.ttl
+            )
+        except Exception as e:
+            logger.warning(f"Cache backend set failed: {str(e)}")
+            self._stats["backend_errors"] += 1
+
+    def clear(self):
+        """Clear the in-process tier; shared entries expire by TTL."""
+        self.memory.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.memory.stats()
+        stats.update(self._stats)
+        stats["backend"] = type(self.backend).__name__ if self.backend else None
+        return stats
@@ -0,0 +1,382 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Optional, Tuple, Type, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key onto one in-flight task.
+    The task is shielded, so a caller that disconnects doesn't cancel the work for everyone else.
+    """
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._stats = {"calls": 0, "executions": 0, "coalesced": 0}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        self._stats["calls"] += 1
+        task = self._inflight.get(key)
+        if task is None:
+            self._stats["executions"] += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self._stats["coalesced"] += 1
+            logger.debug(f"Coalesced request onto in-flight call {key}")
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        stats["in_flight"] = len(self._inflight)
+        return stats
+
+
+class QueueTimeoutError(Exception):
+    """Raised when a call waits too long for a model slot, or the queue is already full."""
+
+class SlotLease:
+    """
+    A held ModelLimiter slot. An executor call registered with hold_until keeps the slot
+    taken until the call finishes, even if the caller stops waiting first.
+    """
+    def __init__(self):
+        self.future: Optional[asyncio.Future] = None
+
+    def hold_until(self, future: asyncio.Future):
+        self.future = future
+
+class ModelLimiter:
+    """
+    Per-model concurrency limit with its own thread pool, so slow calls to one model
+    (e.g. Imagen) cannot starve another (e.g. Gemini text) or the default executor.
+    Callers beyond the limit queue for at most queue_timeout seconds; once max_queue
+    callers are waiting, new ones are rejected immediately.
+    """
+    def __init__(self, name: str, max_concurrency: int, queue_timeout: float, max_queue: int):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+        self.max_queue = max_queue
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix=f"vertex-{name}")
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._waiting = 0
+        self._active = 0
+        self._stats = {"completed": 0, "failed": 0, "rejected": 0, "timed_out": 0,
+                       "max_queue_depth": 0, "total_wait_ms": 0.0}
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[SlotLease]:
+        """
+        Hold one of the model's concurrency slots. Blocking calls made inside it should go
+        through execute() so a cancelled caller can't free the slot while its thread still runs.
+        """
+        if not self._semaphore.locked():
+            # Free slot: acquire() returns without suspending
+            await self._semaphore.acquire()
+        else:
+            if self._waiting >= self.max_queue:
+                self._stats["rejected"] += 1
+                raise QueueTimeoutError(f"{self.name} queue is full ({self._waiting} waiting)")
+
+            self._waiting += 1
+            self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], self._waiting)
+            start = time.perf_counter()
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                self._stats["timed_out"] += 1
+                raise QueueTimeoutError(f"Timed out after {self.queue_timeout}s waiting for {self.name} model")
+            finally:
+                self._waiting -= 1
+                self._stats["total_wait_ms"] += (time.perf_counter() - start) * 1000
+
+        self._active += 1
+        lease = SlotLease()
+        try:
+            yield lease
+            self._stats["completed"] += 1
+        except BaseException:
+            self._stats["failed"] += 1
+            raise
+        finally:
+            if lease.future is not None and not lease.future.done():
+                # The caller was cancelled or timed out, but the executor thread is still
+                # calling the model: the slot stays taken until that call returns
+                lease.future.add_done_callback(self._release_after)
+            else:
+                self._release()
+
+    def _release(self):
+        self._active -= 1
+        self._semaphore.release()
+
+    def _release_after(self, future: asyncio.Future):
+        if not future.cancelled():
+            # Nobody is awaiting the result any more; retrieve it so errors aren't reported as unhandled
+            future.exception()
+        self._release()
+
+    async def execute(self, lease: SlotLease, func: Callable[..., T], *args) -> T:
+        """
+        Run a blocking call on this model's executor while holding the slot behind lease.
+        """
+        future = asyncio.get_event_loop().run_in_executor(self.executor, func, *args)
+        lease.hold_until(future)
+        # Shielded so cancelling the caller doesn't mark the call done while the thread runs
+        return await asyncio.shield(future)
+
+    async def run(self, func: Callable[..., T], *args) -> T:
+        """
+        Run a blocking call on this model's executor once a slot is free.
+        """
+        async with self.slot() as lease:
+            return await self.execute(lease, func, *args)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        calls = stats["completed"] + stats["failed"]
+        stats.update({
+            "max_concurrency": self.max_concurrency,
+            "active": self._active,
+            "queue_depth": self._waiting,
+            "avg_wait_ms": stats["total_wait_ms"] / calls if calls else 0.0
+        })
+        return stats
+
+def create_model_limiters(models=("text", "embedding", "image", "speech", "prompt_embedding")) -> Dict[str, ModelLimiter]:
+    """
+    Build one limiter per model from VERTEX_<MODEL>_CONCURRENCY / _QUEUE_TIMEOUT / _MAX_QUEUE.
+    """
+    defaults = {"text": 16, "embedding": 16, "image": 4, "speech": 8, "prompt_embedding": 8}
+    limiters = {}
+    for model in models:
+        prefix = f"VERTEX_{model.upper()}"
+        limiters[model] = ModelLimiter(
+            model,
+            max_concurrency=int(os.getenv(f"{prefix}_CONCURRENCY", str(defaults.get(model, 8)))),
+            queue_timeout=float(os.getenv(f"{prefix}_QUEUE_TIMEOUT", "10")),
+            max_queue=int(os.getenv(f"{prefix}_MAX_QUEUE", "100"))
+        )
+    return limiters
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a model whose circuit is open."""
+
+class CircuitBreaker:
+    """
+    Per-model circuit breaker. While closed, call outcomes within the last window_seconds are
+    tracked; once at least min_calls are recorded and the share that failed or took longer than
+    slow_call_seconds reaches failure_rate, the circuit opens and calls fail immediately with
+    CircuitOpenError. After open_seconds it half-opens and lets half_open_probes calls through:
+    if they all succeed the circuit closes, and any failure opens it again.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_rate: float = 0.5, min_calls: int = 5, window_seconds: float = 60.0,
+                 slow_call_seconds: float = 0.0, open_seconds: float = 30.0, half_open_probes: int = 1,
+                 ignore: Tuple[Type[BaseException], ...] = ()):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window_seconds = window_seconds
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        # Errors caused by the request itself (e.g. invalid arguments) say nothing about model health
+        self.ignore = ignore
+        self.state = self.CLOSED
+        self._outcomes: Deque[Tuple[float, bool]] = deque()
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self._stats = {"opened": 0, "rejected": 0, "failures": 0, "slow_calls": 0}
+
+    def is_open(self) -> bool:
+        """True while calls would be rejected without reaching the model."""
+        if self.state == self.OPEN:
+            return time.monotonic() - self._opened_at < self.open_seconds
+        if self.state == self.HALF_OPEN:
+            return self._probes_in_flight + self._probe_successes >= self.half_open_probes
+        return False
+
+    def acquire(self) -> bool:
+        """
+        Admit one call or raise CircuitOpenError. Returns True if the call is a half-open probe.
+        """
+        if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            logger.info(f"Circuit for {self.name} model half-open, probing")
+            self.state = self.HALF_OPEN
+            self._probes_in_flight = 0
+            self._probe_successes = 0
+        if self.is_open():
+            self._stats["rejected"] += 1
+            raise CircuitOpenError(f"{self.name} model is unavailable (circuit open)")
+        if self.state == self.HALF_OPEN:
+            self._probes_in_flight += 1
+            return True
+        return False
+
+    def release(self, probe: bool, succeeded: Optional[bool], elapsed: float):
+        """
+        Record the outcome of an admitted call. succeeded is None when the call never
+        produced a result (cancelled, or rejected by the concurrency limiter).
+        """
+        if probe:
+            self._probes_in_flight -= 1
+        if succeeded is None:
+            return
+
+        slow = bool(self.slow_call_seconds) and elapsed > self.slow_call_seconds
+        failed = not succeeded or slow
+        self._stats["failures"] += int(not succeeded)
+        self._stats["slow_calls"] += int(slow)
+
+        if probe and self.state == self.HALF_OPEN:
+            if failed:
+                self._open()
+                return
+            self._probe_successes += 1
+            if self._probe_successes >= self.half_open_probes:
+                logger.info(f"Circuit for {self.name} model closed")
+                self.state = self.CLOSED
+                self._outcomes.clear()
+            return
+
+        # Results of calls admitted before the circuit changed state are ignored
+        if self.state != self.CLOSED:
+            return
+        now = time.monotonic()
+        self._outcomes.append((now, failed))
+        while self._outcomes and now - self._outcomes[0][0] > self.window_seconds:
+            self._outcomes.popleft()
+        if len(self._outcomes) >= self.min_calls:
+            failures = sum(1 for _, f in self._outcomes if f)
+            if failures / len(self._outcomes) >= self.failure_rate:
+                self._open()
+
+    def _open(self):
+        logger.warning(f"Circuit for {self.name} model opened for {self.open_seconds}s")
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+        self._stats["opened"] += 1
+
+    @asynccontextmanager
+    async def guard(self, limiter: Optional["ModelLimiter"] = None, timed: bool = True) -> AsyncIterator[Optional[SlotLease]]:
+        """
+        Wrap one upstream call, failing fast while the circuit is open. If a limiter is given
+        its slot is held for the call and its lease is yielded; time spent queueing for it
+        isn't counted as latency. Pass timed=False for long-lived streams, whose duration
+        says nothing about health.
+        """
+        probe = self.acquire()
+        succeeded = None
+        start = time.perf_counter()
+        try:
+            async with AsyncExitStack() as stack:
+                lease = None
+                if limiter is not None:
+                    lease = await stack.enter_async_context(limiter.slot())
+                start = time.perf_counter()
+                try:
+                    yield lease
+                except self.ignore:
+                    succeeded = True
+                    raise
+                except Exception:
+                    succeeded = False
+                    raise
+                succeeded = True
+        finally:
+            self.release(probe, succeeded, time.perf_counter() - start if timed else 0.0)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        stats.update({"state": self.state, "window_calls": len(self._outcomes)})
+        return stats
+
+def create_circuit_breakers(models=("text", "embedding", "image", "speech", "prompt_embedding"),
+                            ignore: Tuple[Type[BaseException], ...] = ()) -> Dict[str, CircuitBreaker]:
+    """
+    Build one circuit breaker per model from VERTEX_<MODEL>_CIRCUIT_FAILURE_RATE / _CIRCUIT_MIN_CALLS /
+    _CIRCUIT_OPEN_SECONDS / _CIRCUIT_PROBES and VERTEX_<MODEL>_SLOW_CALL_SECONDS (0 disables).
+    """
+    # Long-running speech recognition legitimately takes minutes, so latency doesn't trip it
+    slow_defaults = {"text": 30, "embedding": 10, "image": 60, "speech": 0, "prompt_embedding": 5}
+    breakers = {}
+    for model in models:
+        prefix = f"VERTEX_{model.upper()}"
+        breakers[model] = CircuitBreaker(
+            model,
+            failure_rate=float(os.getenv(f"{prefix}_CIRCUIT_FAILURE_RATE", "0.5")),
+            min_calls=int(os.getenv(f"{prefix}_CIRCUIT_MIN_CALLS", "5")),
+            window_seconds=float(os.getenv(f"{prefix}_CIRCUIT_WINDOW_SECONDS", "60")),
+            slow_call_seconds=float(os.getenv(f"{prefix}_SLOW_CALL_SECONDS", str(slow_defaults.get(model, 0)))),
+            open_seconds=float(os.getenv(f"{prefix}_CIRCUIT_OPEN_SECONDS", "30")),
+            half_open_probes=int(os.getenv(f"{prefix}_CIRCUIT_PROBES", "1")),
+            ignore=ignore
+        )
+    return breakers
+
+
+class TokenBucket:
+    """
+    Async token-bucket rate limiter: refills at rate tokens per second up to capacity.
+    """
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+        self._stats = {"acquired": 0, "throttled": 0, "total_wait_ms": 0.0}
+
+    async def acquire(self, tokens: float = 1.0):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    self._stats["acquired"] += 1
+                    return
+                # Holding the lock while sleeping keeps waiters in FIFO order
+                wait = (tokens - self._tokens) / self.rate
+                self._stats["throttled"] += 1
+                self._stats["total_wait_ms"] += wait * 1000
+                await asyncio.sleep(wait)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        stats.update({"rate_per_second": self.rate, "capacity": self.capacity})
+        return stats
+
+async def retry_with_backoff(fn: Callable[[], Awaitable[T]], retry_on: Tuple[Type[BaseException], ...],
+                             max_attempts: int = 5, base_delay: float = 0.5, max_delay: float = 30.0) -> T:
+    """
+    Call fn, retrying on the given exceptions with exponential backoff and full jitter.
+    """
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            return await fn()
+        except retry_on as e:
+            if attempt >= max_attempts:
+                raise
+            delay = random.uniform(0, min(max_delay, base_delay * 2 ** (attempt - 1)))
+            logger.warning(f"Retrying after {type(e).__name__} (attempt {attempt}/{max_attempts}) in {delay:.2f}s")
+            await asyncio.sleep(delay)
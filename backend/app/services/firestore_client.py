@@ -1,7 +1,7 @@
 from google.cloud import firestore
 from google.cloud.firestore_v1 import FieldFilter
 import os
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Callable, List, Optional, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
@@ -29,6 +29,46 @@ class FirestoreClient:
         await doc_ref.set(data, merge=True)
         return document_id
 
+    async def upsert_document_exclusive(self, collection: str, document_id: str, data: Dict[str, Any],
+                                        exclusive_with: List[str]) -> str:
+        """
+        Upsert a document and delete the documents with the same ID in the other collections,
+        in one atomic batch, so the ID only ever exists in one of them.
+        """
+        if self.client is None:
+            return document_id  # Mock return for testing
+        batch = self.client.batch()
+        batch.set(self.client.collection(collection).document(document_id), data, merge=True)
+        for other in exclusive_with:
+            if other != collection:
+                batch.delete(self.client.collection(other).document(document_id))
+        await batch.commit()
+        return document_id
+
+    async def update_in_transaction(
+        self, collection: str, document_id: str,
+        update: Callable[[Optional[Dict[str, Any]]], Optional[Dict[str, Any]]]
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """
+        Read a document and merge in the fields update(current) returns (nothing if it returns None),
+        atomically. update may run more than once if the transaction is retried.
+        Returns the document as read and the fields written.
+        """
+        if self.client is None:
+            return None, update(None)  # Mock return for testing
+        doc_ref = self.client.collection(collection).document(document_id)
+
+        @firestore.async_transactional
+        async def run(transaction):
+            snapshot = await doc_ref.get(transaction=transaction)
+            current = snapshot.to_dict() if snapshot.exists else None
+            changes = update(current)
+            if changes is not None:
+                transaction.set(doc_ref, changes, merge=True)
+            return current, changes
+
+        return await run(self.client.transaction())
+
     async def create_document(self, collection: str, data: Dict[str, Any]) -> str:
         """
         Create a new document in the specified collection.
@@ -39,6 +79,16 @@ class FirestoreClient:
         await doc_ref.set(data)
         return doc_ref.id
 
+    async def update_document(self, collection: str, document_id: str, data: Dict[str, Any]) -> str:
+        """
+        Update fields of an existing document. Fails if the document does not exist.
+        """
+        if self.client is None:
+            return document_id  # Mock return for testing
+        doc_ref = self.client.collection(collection).document(document_id)
+        await doc_ref.update(data)
+        return document_id
+
     async def get_document(self, collection: str, document_id: str) -> Optional[Dict[str, Any]]:
         """
         Get a document by ID.
@@ -51,13 +101,13 @@ class FirestoreClient:
 
     async def query_documents(self, collection: str, field: str, op_string: str, value: Any) -> list:
         """
-        Query documents in a collection.
+        Query documents in a collection. Each result includes its document ID as "id".
         """
         if self.client is None:
             return []  # Mock return for testing
         query = self.client.collection(collection).where(filter=FieldFilter(field, op_string, value))
         docs = query.stream()
-        return [doc.to_dict() async for doc in docs]
+        return [{"id": doc.id, **doc.to_dict()} async for doc in docs]
 
     def get_timestamp(self):
         """
@@ -0,0 +1,219 @@
+import os
+import io
+import time
+import base64
+import asyncio
+import socket
+import hashlib
+import logging
+import ipaddress
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+from urllib.parse import urlsplit
+import httpx
+from PIL import Image as PILImage, ImageOps
+from .cache import ResponseCache
+
+logger = logging.getLogger(__name__)
+
+# Longest side sent to vision models; larger images add upload bytes and latency, not accuracy
+VISION_MAX_DIMENSION = int(os.getenv("VISION_MAX_DIMENSION", "1024"))
+VISION_JPEG_QUALITY = int(os.getenv("VISION_JPEG_QUALITY", "85"))
+MAX_SOURCE_IMAGE_BYTES = int(os.getenv("MAX_SOURCE_IMAGE_BYTES", str(25 * 1024 * 1024)))
+
+# Fetched images are revalidated with their ETag after this many seconds
+IMAGE_REVALIDATE_SECONDS = float(os.getenv("IMAGE_REVALIDATE_SECONDS", "300"))
+
+# Images are only fetched from the media bucket and these extra comma-separated hosts
+GCS_BUCKET_NAME = os.getenv("GCS_BUCKET_NAME", "kalaconnect-media")
+IMAGE_FETCH_ALLOWED_HOSTS = [
+    host.strip().lower() for host in os.getenv("IMAGE_FETCH_ALLOWED_HOSTS", "").split(",") if host.strip()
+]
+
+class ImageIngestionError(Exception):
+    """Raised when an image can't be fetched or decoded."""
+
+class ImageIngestor:
+    """
+    Shared image ingestion for vision calls: fetches http(s) URLs over a pooled client,
+    decodes data: URLs, reads local files, then downsizes and re-encodes to compact JPEG.
+    Prepared images are cached by URL (revalidated with ETag) or by path and mtime.
+    URLs must point at the media bucket or an allowed host that resolves to a public address;
+    local files are read only for trusted internal callers.
+    """
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+        self._executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv("IMAGE_WORKERS", "4")),
+            thread_name_prefix="image-ingest"
+        )
+        # key -> (etag, fetched_at, prepared bytes)
+        self._cache = ResponseCache(
+            max_entries=int(os.getenv("IMAGE_CACHE_MAX_ENTRIES", "512")),
+            max_bytes=int(os.getenv("IMAGE_CACHE_MAX_BYTES", str(128 * 1024 * 1024))),
+            ttl=float(os.getenv("IMAGE_CACHE_TTL_SECONDS", "86400"))
+        )
+        self._stats = {"fetched": 0, "revalidated": 0, "source_bytes": 0, "prepared_bytes": 0}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(10.0, connect=5.0),
+                limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+                # A redirect could point anywhere, including internal addresses
+                follow_redirects=False
+            )
+        return self._client
+
+    async def load(self, source: str, allow_local: bool = False) -> bytes:
+        """
+        Return JPEG bytes for an http(s) URL, data: URL or, when allow_local is set, a local path,
+        sized for vision models. Never pass allow_local for user-supplied sources.
+        """
+        if source.startswith("data:"):
+            # Base64 inflates by 4/3; reject before decoding anything oversized
+            if len(source) > MAX_SOURCE_IMAGE_BYTES * 4 // 3 + 1024:
+                raise ImageIngestionError(f"Image exceeds {MAX_SOURCE_IMAGE_BYTES} bytes")
+            key = "data:" + hashlib.sha256(source.encode("utf-8")).hexdigest()
+            cached = self._cache.get(key)
+            if cached is not None:
+                return cached[2]
+            try:
+                raw = base64.b64decode(source.split(",", 1)[1])
+            except (IndexError, ValueError) as e:
+                raise ImageIngestionError(f"Invalid data URL: {str(e)}")
+            if len(raw) > MAX_SOURCE_IMAGE_BYTES:
+                raise ImageIngestionError(f"Image exceeds {MAX_SOURCE_IMAGE_BYTES} bytes")
+            return await self._prepare_and_cache(key, None, raw)
+
+        if source.startswith(("http://", "https://")):
+            return await self._load_url(source)
+
+        if not allow_local:
+            raise ImageIngestionError("Image must be an http(s) or data: URL")
+        try:
+            key = f"file:{source}:{os.path.getmtime(source)}"
+        except OSError as e:
+            raise ImageIngestionError(f"Image not found: {source}") from e
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached[2]
+        raw = await asyncio.get_event_loop().run_in_executor(self._executor, _read_file, source)
+        return await self._prepare_and_cache(key, None, raw)
+
+    async def _load_url(self, url: str) -> bytes:
+        key = f"url:{url}"
+        cached = self._cache.get(key)
+        headers = {}
+        if cached is not None:
+            etag, fetched_at, data = cached
+            if time.time() - fetched_at < IMAGE_REVALIDATE_SECONDS:
+                return data
+            if etag:
+                headers["If-None-Match"] = etag
+
+        await _check_url_allowed(url)
+        async with self.client.stream("GET", url, headers=headers) as response:
+            if response.status_code == 304 and cached is not None:
+                self._stats["revalidated"] += 1
+                self._cache.set(key, (cached[0], time.time(), cached[2]))
+                return cached[2]
+            if response.status_code != 200:
+                raise ImageIngestionError(f"Failed to fetch image ({response.status_code}): {url}")
+
+            chunks = []
+            size = 0
+            async for chunk in response.aiter_bytes():
+                size += len(chunk)
+                if size > MAX_SOURCE_IMAGE_BYTES:
+                    raise ImageIngestionError(f"Image exceeds {MAX_SOURCE_IMAGE_BYTES} bytes: {url}")
+                chunks.append(chunk)
+            etag = response.headers.get("ETag")
+
+        self._stats["fetched"] += 1
+        return await self._prepare_and_cache(key, etag, b"".join(chunks))
+
+    async def _prepare_and_cache(self, key: str, etag: Optional[str], raw: bytes) -> bytes:
+        data = await asyncio.get_event_loop().run_in_executor(self._executor, prepare_image, raw)
+        self._stats["source_bytes"] += len(raw)
+        self._stats["prepared_bytes"] += len(data)
+        self._cache.set(key, (etag, time.time(), data))
+        return data
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self):
+        stats = dict(self._stats)
+        stats["cache"] = self._cache.stats()
+        return stats
+
+def _host_allowed(host: str, path: str) -> bool:
+    if host in IMAGE_FETCH_ALLOWED_HOSTS:
+        return True
+    if host == f"{GCS_BUCKET_NAME}.storage.googleapis.com":
+        return True
+    return host == "storage.googleapis.com" and path.startswith(f"/{GCS_BUCKET_NAME}/")
+
+async def _check_url_allowed(url: str):
+    """
+    Reject URLs outside the allowed hosts, or whose host resolves to a private, loopback,
+    link-local (e.g. the metadata server) or otherwise non-public address.
+    """
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    if not host or not _host_allowed(host, parts.path):
+        raise ImageIngestionError(f"Image host not allowed: {host or url}")
+    try:
+        infos = await asyncio.get_event_loop().getaddrinfo(
+            host, parts.port or (443 if parts.scheme == "https" else 80), type=socket.SOCK_STREAM
+        )
+    except (socket.gaierror, UnicodeError) as e:
+        raise ImageIngestionError(f"Unable to resolve image host: {host}") from e
+    addresses: List[str] = [info[4][0] for info in infos]
+    for address in addresses:
+        ip = ipaddress.ip_address(address.split("%", 1)[0])
+        if not ip.is_global:
+            raise ImageIngestionError(f"Image host resolves to a non-public address: {host}")
+
+def _read_file(path: str) -> bytes:
+    if os.path.getsize(path) > MAX_SOURCE_IMAGE_BYTES:
+        raise ImageIngestionError(f"Image exceeds {MAX_SOURCE_IMAGE_BYTES} bytes: {path}")
+    with open(path, "rb") as f:
+        # Devices and pipes report size 0; cap the read regardless
+        raw = f.read(MAX_SOURCE_IMAGE_BYTES + 1)
+    if len(raw) > MAX_SOURCE_IMAGE_BYTES:
+        raise ImageIngestionError(f"Image exceeds {MAX_SOURCE_IMAGE_BYTES} bytes: {path}")
+    return raw
+
+def prepare_image(raw: bytes, max_dimension: int = VISION_MAX_DIMENSION) -> bytes:
+    """
+    Downsize an encoded image to fit max_dimension and re-encode it as JPEG.
+    JPEGs are decoded in draft mode, letting libjpeg scale down by 1/2-1/8 while decoding.
+    Images that are already small JPEGs are returned unchanged.
+    """
+    try:
+        image = PILImage.open(io.BytesIO(raw))
+        if image.format == "JPEG":
+            if max(image.size) <= max_dimension:
+                return raw
+            image.draft("RGB", (max_dimension, max_dimension))
+        image = ImageOps.exif_transpose(image)
+        if image.mode in ("RGBA", "LA", "P"):
+            # Flatten transparency onto white; JPEG has no alpha channel
+            image = image.convert("RGBA")
+            background = PILImage.new("RGB", image.size, (255, 255, 255))
+            background.paste(image, mask=image.split()[-1])
+            image = background
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+        image.thumbnail((max_dimension, max_dimension), PILImage.LANCZOS)
+
+        output = io.BytesIO()
+        image.save(output, format="JPEG", quality=VISION_JPEG_QUALITY, optimize=True)
+        return output.getvalue()
+    except Exception as e:
+        raise ImageIngestionError(f"Unable to decode image: {str(e)}") from e
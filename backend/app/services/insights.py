@@ -0,0 +1,203 @@
+import os
+import time
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+from ..schemas.marketplace import ProductCategory
+from .firestore_client import FirestoreClient
+from .usage import current_endpoint
+
+logger = logging.getLogger(__name__)
+
+MARKET_INSIGHTS_PRECOMPUTE = os.getenv("MARKET_INSIGHTS_PRECOMPUTE", "false").lower() == "true"
+# Comma-separated regions precomputed for every product category
+MARKET_INSIGHTS_REGIONS = [
+    region.strip().lower() for region in os.getenv("MARKET_INSIGHTS_REGIONS", "india").split(",") if region.strip()
+]
+MARKET_INSIGHTS_REFRESH_SECONDS = float(os.getenv("MARKET_INSIGHTS_REFRESH_SECONDS", str(6 * 3600)))
+# Generations run concurrently per refresh cycle; kept low so live text requests aren't starved
+MARKET_INSIGHTS_CONCURRENCY = int(os.getenv("MARKET_INSIGHTS_CONCURRENCY", "2"))
+# A pair being regenerated is leased in Firestore for this long so other instances skip it
+MARKET_INSIGHTS_LEASE_SECONDS = float(os.getenv("MARKET_INSIGHTS_LEASE_SECONDS", "300"))
+MARKET_INSIGHTS_COLLECTION = "market_insights"
+
+def _insights_key(category: str, region: str) -> Tuple[str, str]:
+    return category.strip().lower(), region.strip().lower()
+
+class MarketInsightsStore:
+    """
+    Precomputed market insights per (category, region), held in memory for instant reads
+    and persisted to Firestore so new instances start warm.
+    """
+    def __init__(self, firestore: Optional[FirestoreClient] = None):
+        self.firestore = firestore or FirestoreClient()
+        # (category, region) -> {"insights": str, "generated_at": float}
+        self._entries: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._stats = {"hits": 0, "misses": 0, "stored": 0, "adopted": 0}
+
+    def get(self, category: str, region: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(_insights_key(category, region))
+        self._stats["hits" if entry else "misses"] += 1
+        return entry
+
+    async def put(self, category: str, region: str, insights: str):
+        category, region = _insights_key(category, region)
+        entry = {"category": category, "region": region, "insights": insights, "generated_at": time.time()}
+        self._entries[(category, region)] = entry
+        self._stats["stored"] += 1
+        try:
+            # Storing the result also releases the refresh lease
+            await self.firestore.upsert_document(MARKET_INSIGHTS_COLLECTION, f"{category}_{region}",
+                                                 {**entry, "refresh_lease_until": 0})
+        except Exception as e:
+            logger.warning(f"Failed to persist market insights for {category}/{region}: {str(e)}")
+
+    def age(self, category: str, region: str) -> Optional[float]:
+        entry = self._entries.get(_insights_key(category, region))
+        return time.time() - entry["generated_at"] if entry else None
+
+    async def claim_refresh(self, category: str, region: str, refresh_seconds: float,
+                            lease_seconds: float = MARKET_INSIGHTS_LEASE_SECONDS) -> bool:
+        """
+        Decide whether this instance should regenerate a stale pair. If another instance already
+        stored fresh insights they are taken into memory instead; if one is regenerating it now
+        (holds an unexpired lease) the pair is skipped. Otherwise the lease is taken in a
+        Firestore transaction. When Firestore is unreachable the pair is regenerated locally.
+        """
+        category, region = _insights_key(category, region)
+        now = time.time()
+
+        def claim(document: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+            if document and document.get("insights") and now - document.get("generated_at", 0) < refresh_seconds:
+                return None
+            if document and document.get("refresh_lease_until", 0) > now:
+                return None
+            return {"refresh_lease_until": now + lease_seconds}
+
+        try:
+            document, claimed = await self.firestore.update_in_transaction(
+                MARKET_INSIGHTS_COLLECTION, f"{category}_{region}", claim
+            )
+        except Exception as e:
+            logger.warning(f"Failed to lease market insights for {category}/{region}: {str(e)}")
+            return True
+        if claimed is not None:
+            return True
+        if document and document.get("insights") and now - document.get("generated_at", 0) < refresh_seconds:
+            self._entries[(category, region)] = document
+            self._stats["adopted"] += 1
+        return False
+
+    async def load(self, pairs: List[Tuple[str, str]]):
+        """
+        Load persisted insights for the given pairs, e.g. at startup.
+        """
+        async def load_one(category: str, region: str):
+            try:
+                document = await self.firestore.get_document(MARKET_INSIGHTS_COLLECTION, f"{category}_{region}")
+            except Exception as e:
+                logger.warning(f"Failed to load market insights for {category}/{region}: {str(e)}")
+                return
+            if document and document.get("insights"):
+                self._entries[(category, region)] = document
+
+        await asyncio.gather(*(load_one(category, region) for category, region in pairs))
+        logger.info(f"Loaded {len(self._entries)} precomputed market insights")
+
+    def stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        stats["entries"] = len(self._entries)
+        stats["oldest_age_seconds"] = (
+            time.time() - min(entry["generated_at"] for entry in self._entries.values()) if self._entries else None
+        )
+        return stats
+
+class MarketInsightsScheduler:
+    """
+    Background task that keeps insights for every ProductCategory x region pair fresher
+    than refresh_seconds, regenerating only pairs that are missing or stale. Instances
+    coordinate through the Firestore copy so each stale pair is regenerated once.
+    """
+    def __init__(self, store: MarketInsightsStore, vertex_client, regions: List[str] = MARKET_INSIGHTS_REGIONS,
+                 refresh_seconds: float = MARKET_INSIGHTS_REFRESH_SECONDS,
+                 concurrency: int = MARKET_INSIGHTS_CONCURRENCY):
+        self.store = store
+        self.vertex_client = vertex_client
+        self.pairs = [(category.value, region) for category in ProductCategory for region in regions]
+        self.refresh_seconds = refresh_seconds
+        self.concurrency = concurrency
+        self._task: Optional[asyncio.Task] = None
+        self._stats = {"refreshed": 0, "skipped": 0, "refresh_failures": 0, "last_refresh_at": None}
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        # Usage from refreshes is attributed to the scheduler rather than to an endpoint
+        current_endpoint.set("scheduler:market-insights")
+        await self.store.load(self.pairs)
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Market insights refresh failed: {str(e)}")
+            # Wake up often enough that a stale pair waits at most a tenth of the refresh period
+            await asyncio.sleep(max(60.0, self.refresh_seconds / 10))
+
+    async def refresh(self):
+        """
+        Regenerate missing or stale pairs, a few at a time.
+        """
+        if not self.vertex_client.initialized:
+            return
+        stale = []
+        for category, region in self.pairs:
+            age = self.store.age(category, region)
+            if age is None or age >= self.refresh_seconds:
+                stale.append((category, region))
+        if not stale:
+            return
+
+        start = time.perf_counter()
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def refresh_one(category: str, region: str):
+            async with semaphore:
+                try:
+                    if not await self.store.claim_refresh(category, region, self.refresh_seconds):
+                        self._stats["skipped"] += 1
+                        return
+                    insights = await self.vertex_client.generate_market_insights_fresh(category, region)
+                    await self.store.put(category, region, insights)
+                    self._stats["refreshed"] += 1
+                except Exception as e:
+                    logger.warning(f"Failed to precompute market insights for {category}/{region}: {str(e)}")
+                    self._stats["refresh_failures"] += 1
+
+        await asyncio.gather(*(refresh_one(category, region) for category, region in stale))
+        self._stats["last_refresh_at"] = time.time()
+        logger.info(f"Checked {len(stale)} stale market insights in {time.perf_counter() - start:.1f}s")
+
+    def stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        stats.update({"pairs": len(self.pairs), "refresh_seconds": self.refresh_seconds,
+                      "running": self._task is not None and not self._task.done()})
+        return stats
+
+_market_insights_store: Optional[MarketInsightsStore] = None
+
+def get_market_insights_store() -> MarketInsightsStore:
+    """
+    FastAPI dependency returning the process-wide MarketInsightsStore.
+    """
+    global _market_insights_store
+    if _market_insights_store is None:
+        _market_insights_store = MarketInsightsStore()
+    return _market_insights_store
@@ -0,0 +1,255 @@
+import os
+import time
+import uuid
+import asyncio
+import logging
+import itertools
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+from .firestore_client import FirestoreClient
+from .usage import current_endpoint
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_MAX_QUEUE = int(os.getenv("JOB_MAX_QUEUE", "500"))
+# Finished jobs stay in memory (and attach duplicate submissions) for this long
+JOB_RESULT_TTL_SECONDS = float(os.getenv("JOB_RESULT_TTL_SECONDS", "3600"))
+JOBS_COLLECTION = "jobs"
+
+# Lower runs first: interactive requests overtake queued bulk work
+JOB_PRIORITIES = {"interactive": 0, "bulk": 10}
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+TERMINAL_STATES = (SUCCEEDED, FAILED)
+
+class JobQueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at JOB_MAX_QUEUE."""
+
+class Job:
+    """
+    One unit of background work and its lifecycle.
+    """
+    def __init__(self, kind: str, payload: Dict[str, Any], key: str, priority: str, owner: Optional[str],
+                 endpoint: str):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.payload = payload
+        self.key = key
+        self.priority = priority
+        # Everyone who submitted this work; duplicates attach and may read it too
+        self.owners: List[str] = [owner] if owner else []
+        self.endpoint = endpoint
+        self.status = QUEUED
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._subscribers: List[asyncio.Queue] = []
+
+    @property
+    def done(self) -> bool:
+        return self.status in TERMINAL_STATES
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "priority": self.priority,
+            "owners": self.owners,
+            "payload": self.payload,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at
+        }
+
+def public_job_state(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    A job's state as shown to its owners: without the owner list (other users' uids)
+    or the submitted payload.
+    """
+    return {key: value for key, value in state.items() if key not in ("owners", "payload")}
+
+class JobManager:
+    """
+    In-process job queue with a bounded pool of worker tasks and two priorities.
+    Submissions with the same key as a queued, running or recently finished job attach
+    to that job instead of doing the work again. Job state is mirrored to Firestore so
+    results stay available after they leave memory.
+    """
+    def __init__(self, workers: int = JOB_WORKERS, max_queue: int = JOB_MAX_QUEUE,
+                 result_ttl: float = JOB_RESULT_TTL_SECONDS, firestore: Optional[FirestoreClient] = None):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.result_ttl = result_ttl
+        self.firestore = firestore or FirestoreClient()
+        self._handlers: Dict[str, Callable[[Dict[str, Any]], Awaitable[Any]]] = {}
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._sequence = itertools.count()
+        self._jobs: Dict[str, Job] = {}
+        self._by_key: Dict[str, str] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._stats = {"submitted": 0, "deduplicated": 0, "rejected": 0, "succeeded": 0, "failed": 0,
+                       "total_queue_ms": 0.0, "total_run_ms": 0.0}
+
+    def register(self, kind: str, handler: Callable[[Dict[str, Any]], Awaitable[Any]]):
+        self._handlers[kind] = handler
+
+    def start(self):
+        if self._tasks:
+            return
+        self._queue = asyncio.PriorityQueue()
+        self._tasks = [asyncio.ensure_future(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, kind: str, payload: Dict[str, Any], key: str, priority: str = "interactive",
+                     owner: Optional[str] = None, reuse_finished: bool = True) -> Tuple[Job, bool]:
+        """
+        Queue a job, or return the existing job for the same key. Returns (job, deduplicated).
+        With reuse_finished=False only queued or running jobs are attached to, for work whose
+        inputs can change between submissions under the same key.
+        """
+        if kind not in self._handlers:
+            raise ValueError(f"No handler registered for job kind: {kind}")
+        if self._queue is None:
+            raise RuntimeError("Job workers are not running")
+        self._evict_expired()
+
+        existing = self._jobs.get(self._by_key.get(key, ""))
+        if existing is not None and existing.status != FAILED and (reuse_finished or not existing.done):
+            self._stats["deduplicated"] += 1
+            if owner and owner not in existing.owners:
+                existing.owners.append(owner)
+            if JOB_PRIORITIES.get(priority, 0) < JOB_PRIORITIES.get(existing.priority, 0) and existing.status == QUEUED:
+                # An interactive caller now waits on this job: queue it again at the higher priority
+                existing.priority = priority
+                self._queue.put_nowait((JOB_PRIORITIES[priority], next(self._sequence), existing.id))
+            return existing, True
+
+        if self._queue.qsize() >= self.max_queue:
+            self._stats["rejected"] += 1
+            raise JobQueueFullError(f"Job queue is full ({self.max_queue} waiting)")
+
+        job = Job(kind, payload, key, priority if priority in JOB_PRIORITIES else "interactive", owner,
+                  current_endpoint.get())
+        self._jobs[job.id] = job
+        self._by_key[key] = job.id
+        self._stats["submitted"] += 1
+        self._queue.put_nowait((JOB_PRIORITIES[job.priority], next(self._sequence), job.id))
+        await self._persist(job)
+        return job, False
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Current state of a job, from memory or, once evicted, from Firestore.
+        """
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        try:
+            return await self.firestore.get_document(JOBS_COLLECTION, job_id)
+        except Exception as e:
+            logger.warning(f"Failed to load job {job_id}: {str(e)}")
+            return None
+
+    async def watch(self, job_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yield the job's state now and after every change until it finishes.
+        """
+        job = self._jobs.get(job_id)
+        if job is None:
+            state = await self.get(job_id)
+            if state is not None:
+                yield state
+            return
+
+        updates: asyncio.Queue = asyncio.Queue()
+        job._subscribers.append(updates)
+        try:
+            state = job.to_dict()
+            yield state
+            while state["status"] not in TERMINAL_STATES:
+                state = await updates.get()
+                yield state
+        finally:
+            job._subscribers.remove(updates)
+
+    async def _worker(self):
+        while True:
+            _, _, job_id = await self._queue.get()
+            job = self._jobs.get(job_id)
+            # Skip jobs already taken from an earlier queue entry (re-queued at higher priority)
+            if job is None or job.status != QUEUED:
+                continue
+
+            current_endpoint.set(job.endpoint)
+            job.status = RUNNING
+            job.started_at = time.time()
+            self._stats["total_queue_ms"] += (job.started_at - job.created_at) * 1000
+            await self._publish(job)
+            try:
+                job.result = await self._handlers[job.kind](job.payload)
+                job.status = SUCCEEDED
+            except Exception as e:
+                logger.error(f"Job {job.id} ({job.kind}) failed: {str(e)}")
+                job.error = str(e)
+                job.status = FAILED
+            job.finished_at = time.time()
+            self._stats[job.status] += 1
+            self._stats["total_run_ms"] += (job.finished_at - job.started_at) * 1000
+            await self._publish(job)
+
+    async def _publish(self, job: Job):
+        state = job.to_dict()
+        for updates in job._subscribers:
+            updates.put_nowait(state)
+        await self._persist(job)
+
+    async def _persist(self, job: Job):
+        try:
+            await self.firestore.upsert_document(JOBS_COLLECTION, job.id, job.to_dict())
+        except Exception as e:
+            logger.warning(f"Failed to persist job {job.id}: {str(e)}")
+
+    def _evict_expired(self):
+        now = time.time()
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.done and now - job.finished_at > self.result_ttl]
+        for job_id in expired:
+            job = self._jobs.pop(job_id)
+            if self._by_key.get(job.key) == job_id:
+                del self._by_key[job.key]
+
+    def stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        finished = stats["succeeded"] + stats["failed"]
+        stats.update({
+            "workers": len(self._tasks),
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "running": sum(1 for job in self._jobs.values() if job.status == RUNNING),
+            "avg_queue_ms": stats["total_queue_ms"] / finished if finished else 0.0,
+            "avg_run_ms": stats["total_run_ms"] / finished if finished else 0.0
+        })
+        return stats
+
+_job_manager: Optional[JobManager] = None
+
+def get_job_manager() -> JobManager:
+    """
+    FastAPI dependency returning the process-wide JobManager.
+    """
+    global _job_manager
+    if _job_manager is None:
+        _job_manager = JobManager()
+    return _job_manager
@@ -0,0 +1,173 @@
+import os
+import re
+import asyncio
+import math
+import time
+import logging
+import unicodedata
+from array import array
+from collections import OrderedDict
+from operator import mul
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() == "true"
+# Cosine similarity a stored prompt must reach to be served; prompts are mostly fixed templates,
+# so anything much lower starts matching requests about different products. Callers also scope
+# lookups by their structured fields (category, language...), which must match exactly
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.97"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "512"))
+SEMANTIC_CACHE_TTL_SECONDS = float(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", os.getenv("AI_CACHE_TTL_SECONDS", "3600")))
+
+# Misses whose best score falls this close under the threshold are counted as near misses
+NEAR_MISS_MARGIN = 0.03
+
+# Upper bounds of the best-score histogram buckets
+SIMILARITY_BUCKETS = (0.8, 0.9, 0.95, 0.98, 1.0)
+
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_prompt(prompt: str) -> str:
+    """
+    Canonical form of a prompt: Unicode-normalised, case-folded, with runs of whitespace collapsed.
+    """
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", prompt).casefold()).strip()
+
+class SemanticLookup:
+    """
+    Result of a semantic cache lookup. On a miss, vector holds the prompt embedding so
+    the caller can add the generated response without embedding the prompt again.
+    """
+    def __init__(self, normalized: str, value: Any = None, vector: Optional[array] = None, score: float = 0.0):
+        self.normalized = normalized
+        self.value = value
+        self.vector = vector
+        self.score = score
+
+    @property
+    def hit(self) -> bool:
+        return self.value is not None
+
+class SemanticCache:
+    """
+    Serves a cached response when a new prompt is a near duplicate of an earlier one in the
+    same scope (endpoint and generation parameters). Prompts are first matched on their
+    normalised text, then by cosine similarity of their embeddings against a small local
+    index per scope. Each scope keeps at most max_entries prompts, least recently used first out.
+    The similarity scan runs on the default executor so it doesn't hold up the event loop.
+    """
+    def __init__(self, embed: Callable[[str], Awaitable[List[float]]], threshold: float = SEMANTIC_CACHE_THRESHOLD,
+                 max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES, ttl: float = SEMANTIC_CACHE_TTL_SECONDS):
+        self._embed = embed
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # scope -> normalized prompt -> (unit vector, value, expires_at)
+        self._scopes: Dict[str, "OrderedDict[str, Tuple[array, Any, float]]"] = {}
+        self._stats = {"lookups": 0, "normalized_hits": 0, "semantic_hits": 0, "misses": 0,
+                       "near_misses": 0, "embed_failures": 0, "total_hit_similarity": 0.0,
+                       "min_hit_similarity": None}
+        self._histogram = {bound: 0 for bound in SIMILARITY_BUCKETS}
+
+    async def lookup(self, scope: str, prompt: str) -> SemanticLookup:
+        self._stats["lookups"] += 1
+        normalized = normalize_prompt(prompt)
+        entries = self._scopes.get(scope)
+        now = time.time()
+
+        if entries:
+            entry = entries.get(normalized)
+            if entry is not None and entry[2] > now:
+                entries.move_to_end(normalized)
+                self._stats["normalized_hits"] += 1
+                return SemanticLookup(normalized, entry[1], entry[0], 1.0)
+
+        try:
+            vector = _unit(await self._embed(normalized))
+        except Exception as e:
+            logger.warning(f"Semantic cache embedding failed: {str(e)}")
+            self._stats["embed_failures"] += 1
+            self._stats["misses"] += 1
+            return SemanticLookup(normalized)
+        if vector is None:
+            self._stats["embed_failures"] += 1
+            self._stats["misses"] += 1
+            return SemanticLookup(normalized)
+
+        best_key, best_score = None, 0.0
+        if entries:
+            expired = [key for key, (_, _, expires_at) in entries.items() if expires_at <= now]
+            for key in expired:
+                del entries[key]
+            # Scan a snapshot, since entries may change on the loop while the executor works
+            candidates = [(key, candidate) for key, (candidate, _, _) in entries.items()]
+            best_key, best_score = await asyncio.get_event_loop().run_in_executor(
+                None, _best_match, vector, candidates
+            )
+            self._record_score(best_score)
+
+        if best_key is not None and best_score >= self.threshold and best_key in entries:
+            entries.move_to_end(best_key)
+            self._stats["semantic_hits"] += 1
+            self._stats["total_hit_similarity"] += best_score
+            low = self._stats["min_hit_similarity"]
+            self._stats["min_hit_similarity"] = best_score if low is None else min(low, best_score)
+            logger.info(f"Semantic cache hit (similarity {best_score:.3f})")
+            return SemanticLookup(normalized, entries[best_key][1], vector, best_score)
+
+        self._stats["misses"] += 1
+        if best_score >= self.threshold - NEAR_MISS_MARGIN:
+            self._stats["near_misses"] += 1
+        return SemanticLookup(normalized, None, vector, best_score)
+
+    def add(self, scope: str, lookup: SemanticLookup, value: Any):
+        """
+        Store the response generated after a missed lookup.
+        """
+        if lookup.vector is None:
+            return
+        entries = self._scopes.setdefault(scope, OrderedDict())
+        entries[lookup.normalized] = (lookup.vector, value, time.time() + self.ttl)
+        entries.move_to_end(lookup.normalized)
+        while len(entries) > self.max_entries:
+            entries.popitem(last=False)
+
+    def _record_score(self, score: float):
+        for bound in SIMILARITY_BUCKETS:
+            if score <= bound:
+                self._histogram[bound] += 1
+                return
+
+    def clear(self):
+        self._scopes.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        hits = stats["normalized_hits"] + stats["semantic_hits"]
+        stats.update({
+            "threshold": self.threshold,
+            "hit_rate": hits / stats["lookups"] if stats["lookups"] else 0.0,
+            "avg_hit_similarity": (
+                stats["total_hit_similarity"] / stats["semantic_hits"] if stats["semantic_hits"] else None
+            ),
+            "best_similarity_histogram": {f"<={bound}": count for bound, count in self._histogram.items()},
+            "scopes": len(self._scopes),
+            "entries": sum(len(entries) for entries in self._scopes.values())
+        })
+        return stats
+
+def _best_match(vector: array, candidates: List[Tuple[str, array]]) -> Tuple[Optional[str], float]:
+    best_key, best_score = None, 0.0
+    for key, candidate in candidates:
+        score = sum(map(mul, vector, candidate))
+        if score > best_score:
+            best_key, best_score = key, score
+    return best_key, best_score
+
+def _unit(values: List[float]) -> Optional[array]:
+    """Scale a vector to unit length so cosine similarity is a dot product; None for a zero vector."""
+    norm = math.sqrt(sum(v * v for v in values))
+    if not norm:
+        return None
+    return array("f", (v / norm for v in values))
@@ -1,14 +1,98 @@
 from google.cloud import storage
+from google.api_core.exceptions import NotFound
 import os
-from typing import Optional
+from typing import Optional, Dict, Any, Iterator, AsyncIterator, Union, BinaryIO, List, Tuple
 import logging
+import asyncio
+import threading
+import time
+import base64
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+import google_crc32c
+import google.auth.transport.requests
 
 logger = logging.getLogger(__name__)
 
+# Dedicated pool for blocking GCS calls so uploads never compete with the default executor
+_storage_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("GCS_MAX_WORKERS", "8")),
+    thread_name_prefix="gcs"
+)
+
+# Separate pool for batch signing; signing can be a network call (IAM signBlob) and is
+# submitted from code already running on the storage pool
+_signing_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("GCS_SIGNING_WORKERS", "8")),
+    thread_name_prefix="gcs-sign"
+)
+
+# Cached signed URLs are re-signed once they are this close to expiry
+SIGNED_URL_REFRESH_MARGIN = int(os.getenv("SIGNED_URL_REFRESH_MARGIN_SECONDS", "300"))
+SIGNED_URL_CACHE_SIZE = int(os.getenv("SIGNED_URL_CACHE_SIZE", "10000"))
+
+# Metadata is cached briefly so repeated lookups of the same object skip the round trip
+METADATA_CACHE_TTL = float(os.getenv("GCS_METADATA_CACHE_TTL_SECONDS", "30"))
+METADATA_CACHE_SIZE = int(os.getenv("GCS_METADATA_CACHE_SIZE", "10000"))
+
+# Objects the backend writes for its own use rather than user uploads; the GCS trigger
+# (functions/processor.py) skips these prefixes
+TRANSCRIPTION_UPLOAD_PREFIX = "transcriptions/"
+GENERATED_IMAGE_PREFIX = "generated/"
+
+# Bulk transfers: worker count, and objects above the threshold are downloaded in ranged slices
+TRANSFER_MAX_WORKERS = int(os.getenv("GCS_TRANSFER_WORKERS", "16"))
+SLICED_DOWNLOAD_THRESHOLD = int(os.getenv("GCS_SLICED_DOWNLOAD_THRESHOLD", str(32 * 1024 * 1024)))
+SLICED_DOWNLOAD_SLICE_SIZE = int(os.getenv("GCS_SLICED_DOWNLOAD_SLICE_SIZE", str(16 * 1024 * 1024)))
+
+# Resumable upload chunks must be a multiple of 256 KiB
+UPLOAD_CHUNK_SIZE = int(os.getenv("GCS_UPLOAD_CHUNK_SIZE", str(8 * 256 * 1024)))
+
+
+class _StreamDigest:
+    """
+    Running size, MD5 and CRC32C of an upload, computed chunk by chunk.
+    """
+    def __init__(self):
+        self.size = 0
+        self._md5 = hashlib.md5()
+        self._crc32c = google_crc32c.Checksum()
+
+    def update(self, chunk: bytes):
+        self.size += len(chunk)
+        self._md5.update(chunk)
+        self._crc32c.update(chunk)
+
+    def result(self, gcs_uri: str) -> Dict[str, Any]:
+        # Base64 encoded to match the md5Hash/crc32c fields GCS reports on the object
+        return {
+            "gcs_uri": gcs_uri,
+            "size": self.size,
+            "md5_hash": base64.b64encode(self._md5.digest()).decode("ascii"),
+            "crc32c": base64.b64encode(self._crc32c.digest()).decode("ascii")
+        }
+
 class StorageClient:
     def __init__(self):
         self.client = storage.Client(project=os.getenv("PROJECT_ID", "turing-goods-475505-f0"))
         self.bucket_name = os.getenv("GCS_BUCKET_NAME", "kalaconnect-media")  # TODO: Set actual bucket name
+        self.bucket = self.client.bucket(self.bucket_name)
+
+        # (blob_name, expiration) -> (signed_url, expires_at)
+        self._signed_url_cache: Dict[Tuple[str, int], Tuple[str, float]] = {}
+        self._signed_url_lock = threading.Lock()
+        self._signing_stats = {
+            "cache_hits": 0,
+            "cache_misses": 0,
+            "signed": 0,
+            "total_signing_ms": 0.0,
+            "max_signing_ms": 0.0
+        }
+
+        # blob_name -> (metadata or None, fetched_at)
+        self._metadata_cache: Dict[str, Tuple[Optional[dict], float]] = {}
+        self._metadata_lock = threading.Lock()
 
     def upload_file(self, file_path: str, destination_blob_name: str) -> str:
         """
@@ -17,8 +101,47 @@ class StorageClient:
         bucket = self.client.bucket(self.bucket_name)
         blob = bucket.blob(destination_blob_name)
         blob.upload_from_filename(file_path)
+        self._invalidate_metadata(destination_blob_name)
         return f"gs://{self.bucket_name}/{destination_blob_name}"
 
+    def upload_bytes(self, data: bytes, destination_blob_name: str, content_type: Optional[str] = None) -> str:
+        """
+        Upload in-memory bytes to GCS bucket.
+        """
+        blob = self.bucket.blob(destination_blob_name)
+        blob.upload_from_string(data, content_type=content_type or "application/octet-stream")
+        self._invalidate_metadata(destination_blob_name)
+        return f"gs://{self.bucket_name}/{destination_blob_name}"
+
+    def open_blob_writer(self, destination_blob_name: str, content_type: Optional[str] = None,
+                         chunk_size: int = UPLOAD_CHUNK_SIZE) -> BinaryIO:
+        """
+        Open a resumable upload writer that sends data to GCS every chunk_size bytes.
+        """
+        bucket = self.client.bucket(self.bucket_name)
+        blob = bucket.blob(destination_blob_name, chunk_size=chunk_size)
+        return blob.open("wb", content_type=content_type or "application/octet-stream")
+
+    def upload_stream(self, source: Union[BinaryIO, Iterator[bytes]], destination_blob_name: str,
+                      content_type: Optional[str] = None, chunk_size: int = UPLOAD_CHUNK_SIZE) -> Dict[str, Any]:
+        """
+        Upload a file-like object or iterator of bytes to GCS in fixed-size chunks.
+        Returns the object URI with the size and checksums computed while streaming.
+        """
+        digest = _StreamDigest()
+        if hasattr(source, "read"):
+            chunks = iter(lambda: source.read(chunk_size), b"")
+        else:
+            chunks = source
+        # Closing the writer finalises the object, so only close once every chunk is written
+        writer = self.open_blob_writer(destination_blob_name, content_type, chunk_size)
+        for chunk in chunks:
+            digest.update(chunk)
+            writer.write(chunk)
+        writer.close()
+        self._invalidate_metadata(destination_blob_name)
+        return digest.result(f"gs://{self.bucket_name}/{destination_blob_name}")
+
     def download_file(self, blob_name: str, destination_file_path: str):
         """
         Download a file from GCS bucket.
@@ -34,27 +157,356 @@ class StorageClient:
         bucket = self.client.bucket(self.bucket_name)
         blob = bucket.blob(blob_name)
         blob.delete()
+        self._invalidate_metadata(blob_name)
 
     def get_signed_url(self, blob_name: str, expiration: int = 3600) -> str:
         """
         Generate a signed URL for a blob.
+        URLs are cached and reused until they are within SIGNED_URL_REFRESH_MARGIN of expiry.
+        """
+        cache_key = (blob_name, expiration)
+        with self._signed_url_lock:
+            cached = self._signed_url_cache.get(cache_key)
+            if cached and cached[1] - time.time() > min(SIGNED_URL_REFRESH_MARGIN, expiration / 2):
+                self._signing_stats["cache_hits"] += 1
+                return cached[0]
+            self._signing_stats["cache_misses"] += 1
+
+        start = time.perf_counter()
+        blob = self.bucket.blob(blob_name)
+        url = blob.generate_signed_url(
+            expiration=timedelta(seconds=expiration),
+            **self._signing_credentials()
+        )
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        with self._signed_url_lock:
+            self._signing_stats["signed"] += 1
+            self._signing_stats["total_signing_ms"] += elapsed_ms
+            self._signing_stats["max_signing_ms"] = max(self._signing_stats["max_signing_ms"], elapsed_ms)
+            if len(self._signed_url_cache) >= SIGNED_URL_CACHE_SIZE:
+                # Drop the oldest entry (dicts keep insertion order)
+                self._signed_url_cache.pop(next(iter(self._signed_url_cache)))
+            self._signed_url_cache[cache_key] = (url, time.time() + expiration)
+        return url
+
+    def get_signed_urls(self, blob_names: List[str], expiration: int = 3600) -> Dict[str, str]:
+        """
+        Generate signed URLs for many blobs, signing cache misses in parallel.
+        """
+        unique_names = list(dict.fromkeys(blob_names))
+        if len(unique_names) <= 1:
+            return {name: self.get_signed_url(name, expiration) for name in unique_names}
+        urls = _signing_executor.map(lambda name: self.get_signed_url(name, expiration), unique_names)
+        return dict(zip(unique_names, urls))
+
+    def get_signing_stats(self) -> Dict[str, Any]:
+        """
+        Get signed URL cache and signing latency statistics.
+        """
+        with self._signed_url_lock:
+            stats = dict(self._signing_stats)
+            stats["cached_urls"] = len(self._signed_url_cache)
+        stats["avg_signing_ms"] = stats["total_signing_ms"] / stats["signed"] if stats["signed"] else 0.0
+        return stats
+
+    def get_signed_upload_url(self, blob_name: str, content_type: str, max_size: int,
+                              expiration: int = 900, resumable: bool = False) -> Dict[str, Any]:
+        """
+        Generate a V4 signed URL for uploading a blob directly to the bucket.
+        The returned headers must be sent with the upload; GCS rejects requests whose
+        content type differs or whose body exceeds max_size.
         """
         bucket = self.client.bucket(self.bucket_name)
         blob = bucket.blob(blob_name)
-        return blob.generate_signed_url(expiration=expiration)
+        headers = {
+            "Content-Type": content_type,
+            "x-goog-content-length-range": f"0,{max_size}"
+        }
+        if resumable:
+            # Starts a resumable session; the client PUTs chunks to the Location it returns
+            method = "POST"
+            headers["x-goog-resumable"] = "start"
+        else:
+            method = "PUT"
+
+        url = blob.generate_signed_url(
+            version="v4",
+            expiration=timedelta(seconds=expiration),
+            method="RESUMABLE" if resumable else "PUT",
+            content_type=content_type,
+            headers={"x-goog-content-length-range": headers["x-goog-content-length-range"]},
+            **self._signing_credentials()
+        )
+        return {"url": url, "method": method, "headers": headers}
+
+    def _signing_credentials(self) -> Dict[str, Any]:
+        """
+        Token-based credentials (e.g. Cloud Run's metadata server) have no private key,
+        so signing goes through IAM signBlob using the service account email and token.
+        """
+        credentials = self.client._credentials
+        if getattr(credentials, "signer", None) is not None or not hasattr(credentials, "service_account_email"):
+            return {}
+        if not credentials.valid:
+            credentials.refresh(google.auth.transport.requests.Request())
+        return {
+            "service_account_email": credentials.service_account_email,
+            "access_token": credentials.token
+        }
 
     def get_file_metadata(self, blob_name: str) -> Optional[dict]:
         """
         Get metadata of a file in GCS.
+        Fetched with a single reload() request and cached for METADATA_CACHE_TTL seconds.
         """
-        bucket = self.client.bucket(self.bucket_name)
-        blob = bucket.blob(blob_name)
-        if blob.exists():
-            return {
+        with self._metadata_lock:
+            cached = self._metadata_cache.get(blob_name)
+            if cached and time.time() - cached[1] < METADATA_CACHE_TTL:
+                return cached[0]
+
+        blob = self.bucket.blob(blob_name)
+        try:
+            blob.reload()
+            metadata = {
                 "name": blob.name,
                 "size": blob.size,
                 "content_type": blob.content_type,
                 "created": blob.time_created,
-                "updated": blob.updated
+                "updated": blob.updated,
+                "generation": blob.generation
             }
-        return None
+        except NotFound:
+            metadata = None
+
+        now = time.time()
+        with self._metadata_lock:
+            # Re-insert so the dict stays ordered by fetch time, then drop expired and excess
+            # entries from the oldest end
+            self._metadata_cache.pop(blob_name, None)
+            self._metadata_cache[blob_name] = (metadata, now)
+            while self._metadata_cache:
+                oldest = next(iter(self._metadata_cache))
+                if (len(self._metadata_cache) <= METADATA_CACHE_SIZE
+                        and now - self._metadata_cache[oldest][1] < METADATA_CACHE_TTL):
+                    break
+                del self._metadata_cache[oldest]
+        return metadata
+
+    def _invalidate_metadata(self, blob_name: str):
+        with self._metadata_lock:
+            self._metadata_cache.pop(blob_name, None)
+
+    def upload_many(self, files: List[Tuple[str, str]], max_workers: int = TRANSFER_MAX_WORKERS) -> Dict[str, Any]:
+        """
+        Upload many (file_path, destination_blob_name) pairs in parallel.
+        Returns per-file results along with total bytes, elapsed time and throughput.
+        """
+        def upload(item: Tuple[str, str]) -> Dict[str, Any]:
+            file_path, destination_blob_name = item
+            try:
+                gcs_uri = self.upload_file(file_path, destination_blob_name)
+                return {"file_path": file_path, "gcs_uri": gcs_uri, "size": os.path.getsize(file_path)}
+            except Exception as e:
+                logger.error(f"Error uploading {file_path}: {str(e)}")
+                return {"file_path": file_path, "error": str(e), "size": 0}
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gcs-upload") as executor:
+            results = list(executor.map(upload, files))
+        return self._transfer_report(results, time.perf_counter() - start)
+
+    def download_many(self, blobs: List[Tuple[str, str]], max_workers: int = TRANSFER_MAX_WORKERS) -> Dict[str, Any]:
+        """
+        Download many (blob_name, destination_file_path) pairs in parallel.
+        Objects larger than SLICED_DOWNLOAD_THRESHOLD are fetched as concurrent byte-range
+        slices written into place. Returns per-file results and throughput.
+        """
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gcs-download") as executor:
+            metadata = list(executor.map(self._safe_metadata, [blob_name for blob_name, _ in blobs]))
+
+            # Plan every whole-object download and slice up front so no task waits on another
+            tasks = []
+            results = []
+            for (blob_name, destination_file_path), meta in zip(blobs, metadata):
+                if meta is None:
+                    results.append({"blob_name": blob_name, "error": "Not found", "size": 0})
+                    continue
+                size = meta["size"]
+                results.append({"blob_name": blob_name, "file_path": destination_file_path, "size": size})
+                if size > SLICED_DOWNLOAD_THRESHOLD:
+                    with open(destination_file_path, "wb") as f:
+                        f.truncate(size)
+                    for offset in range(0, size, SLICED_DOWNLOAD_SLICE_SIZE):
+                        end = min(offset + SLICED_DOWNLOAD_SLICE_SIZE, size) - 1
+                        tasks.append((len(results) - 1, executor.submit(
+                            self._download_slice, blob_name, destination_file_path, offset, end, meta["generation"]
+                        )))
+                else:
+                    tasks.append((len(results) - 1, executor.submit(self.download_file, blob_name, destination_file_path)))
+
+            for index, future in tasks:
+                try:
+                    future.result()
+                except Exception as e:
+                    logger.error(f"Error downloading {results[index]['blob_name']}: {str(e)}")
+                    results[index]["error"] = str(e)
+
+        for result in results:
+            if "error" in result:
+                result["size"] = 0
+        return self._transfer_report(results, time.perf_counter() - start)
+
+    def _safe_metadata(self, blob_name: str) -> Optional[dict]:
+        try:
+            return self.get_file_metadata(blob_name)
+        except Exception as e:
+            logger.error(f"Error fetching metadata for {blob_name}: {str(e)}")
+            return None
+
+    def _download_slice(self, blob_name: str, destination_file_path: str, start: int, end: int, generation: int):
+        """
+        Download bytes start..end (inclusive) of a blob into the same range of a local file.
+        Pinned to one generation so slices never mix two versions of the object.
+        """
+        data = self.bucket.blob(blob_name, generation=generation).download_as_bytes(start=start, end=end)
+        with open(destination_file_path, "r+b") as f:
+            f.seek(start)
+            f.write(data)
+
+    def _transfer_report(self, results: List[Dict[str, Any]], elapsed: float) -> Dict[str, Any]:
+        total_bytes = sum(result["size"] for result in results)
+        failed = sum(1 for result in results if "error" in result)
+        throughput = total_bytes / elapsed / (1024 * 1024) if elapsed > 0 else 0.0
+        logger.info(f"Transferred {len(results) - failed}/{len(results)} objects, "
+                    f"{total_bytes} bytes in {elapsed:.2f}s ({throughput:.2f} MiB/s)")
+        return {
+            "results": results,
+            "succeeded": len(results) - failed,
+            "failed": failed,
+            "total_bytes": total_bytes,
+            "elapsed_seconds": elapsed,
+            "throughput_mib_per_second": throughput
+        }
+
+
+class AsyncStorageClient:
+    """
+    Async wrapper around StorageClient that runs blocking GCS calls on a bounded thread pool,
+    keeping the event loop free while uploads and downloads are in flight.
+    """
+    def __init__(self, storage_client: Optional[StorageClient] = None, executor: Optional[ThreadPoolExecutor] = None):
+        self.storage_client = storage_client or StorageClient()
+        self.bucket_name = self.storage_client.bucket_name
+        self._executor = executor or _storage_executor
+
+    async def _run(self, func, *args):
+        return await asyncio.get_event_loop().run_in_executor(self._executor, func, *args)
+
+    async def upload_file(self, file_path: str, destination_blob_name: str) -> str:
+        """
+        Upload a file to GCS bucket without blocking the event loop.
+        """
+        return await self._run(self.storage_client.upload_file, file_path, destination_blob_name)
+
+    async def upload_bytes(self, data: bytes, destination_blob_name: str, content_type: Optional[str] = None) -> str:
+        """
+        Upload in-memory bytes to GCS bucket without blocking the event loop.
+        """
+        return await self._run(self.storage_client.upload_bytes, data, destination_blob_name, content_type)
+
+    async def upload_stream(self, source: Union[Any, AsyncIterator[bytes]], destination_blob_name: str,
+                            content_type: Optional[str] = None, chunk_size: int = UPLOAD_CHUNK_SIZE) -> Dict[str, Any]:
+        """
+        Stream an UploadFile (or any object with an async read) or async iterator of bytes to GCS.
+        Only one chunk is held in memory at a time; nothing is written to local disk.
+        """
+        digest = _StreamDigest()
+        writer = await self._run(self.storage_client.open_blob_writer, destination_blob_name, content_type, chunk_size)
+        # An unfinished resumable session is left to expire on failure
+        async for chunk in iter_async_chunks(source, chunk_size):
+            digest.update(chunk)
+            await self._run(writer.write, chunk)
+        await self._run(writer.close)
+        self.storage_client._invalidate_metadata(destination_blob_name)
+        return digest.result(f"gs://{self.bucket_name}/{destination_blob_name}")
+
+    async def download_file(self, blob_name: str, destination_file_path: str):
+        """
+        Download a file from GCS bucket without blocking the event loop.
+        """
+        await self._run(self.storage_client.download_file, blob_name, destination_file_path)
+
+    async def delete_file(self, blob_name: str):
+        """
+        Delete a file from GCS bucket without blocking the event loop.
+        """
+        await self._run(self.storage_client.delete_file, blob_name)
+
+    async def get_signed_url(self, blob_name: str, expiration: int = 3600) -> str:
+        """
+        Generate a signed URL for a blob without blocking the event loop.
+        """
+        return await self._run(self.storage_client.get_signed_url, blob_name, expiration)
+
+    async def get_signed_urls(self, blob_names: List[str], expiration: int = 3600) -> Dict[str, str]:
+        """
+        Generate signed URLs for many blobs without blocking the event loop.
+        """
+        return await self._run(self.storage_client.get_signed_urls, blob_names, expiration)
+
+    async def get_signed_upload_url(self, blob_name: str, content_type: str, max_size: int,
+                                    expiration: int = 900, resumable: bool = False) -> Dict[str, Any]:
+        """
+        Generate a V4 signed upload URL without blocking the event loop.
+        """
+        return await self._run(
+            self.storage_client.get_signed_upload_url, blob_name, content_type, max_size, expiration, resumable
+        )
+
+    async def get_file_metadata(self, blob_name: str) -> Optional[dict]:
+        """
+        Get metadata of a file in GCS without blocking the event loop.
+        """
+        return await self._run(self.storage_client.get_file_metadata, blob_name)
+
+    async def upload_many(self, files: List[Tuple[str, str]], max_workers: int = TRANSFER_MAX_WORKERS) -> Dict[str, Any]:
+        """
+        Upload many files in parallel without blocking the event loop.
+        """
+        return await self._run(self.storage_client.upload_many, files, max_workers)
+
+    async def download_many(self, blobs: List[Tuple[str, str]], max_workers: int = TRANSFER_MAX_WORKERS) -> Dict[str, Any]:
+        """
+        Download many files in parallel without blocking the event loop.
+        """
+        return await self._run(self.storage_client.download_many, blobs, max_workers)
+
+
+async def iter_async_chunks(source: Union[Any, AsyncIterator[bytes]], chunk_size: int) -> AsyncIterator[bytes]:
+    """
+    Yield chunks from an object with an async read() (e.g. UploadFile) or an async iterator.
+    """
+    if hasattr(source, "read"):
+        while True:
+            chunk = await source.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    else:
+        async for chunk in source:
+            if chunk:
+                yield chunk
+
+
+_async_storage_client: Optional[AsyncStorageClient] = None
+
+def get_async_storage_client() -> AsyncStorageClient:
+    """
+    FastAPI dependency returning a process-wide AsyncStorageClient.
+    """
+    global _async_storage_client
+    if _async_storage_client is None:
+        _async_storage_client = AsyncStorageClient()
+    return _async_storage_client
@@ -0,0 +1,168 @@
+import os
+import json
+import logging
+import threading
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Request path of the API endpoint currently being served, used to attribute AI usage
+current_endpoint: ContextVar[str] = ContextVar("current_endpoint", default="internal")
+
+# Estimated list prices in USD. Text models are priced per million tokens, embeddings and
+# Imagen per call/image, Speech per minute of audio. Override with AI_PRICING_JSON.
+DEFAULT_PRICING = {
+    "gemini-2.0-flash": {"input_per_million_tokens": 0.15, "output_per_million_tokens": 0.60},
+    "multimodalembedding@001": {"per_call": 0.0002},
+    "text-embedding-004": {"per_call": 0.00002},
+    "imagegeneration@006": {"per_image": 0.02},
+    "speech-to-text": {"per_audio_minute": 0.024}
+}
+
+class BudgetExceededError(Exception):
+    """Raised when an endpoint has spent its daily AI budget and AI_BUDGET_MODE is reject."""
+
+class EndpointContextMiddleware:
+    """
+    ASGI middleware that tags each request with its path so AI usage can be attributed per endpoint.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = current_endpoint.set(scope["path"])
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_endpoint.reset(token)
+
+class UsageRegistry:
+    """
+    In-process registry of AI calls aggregated by (endpoint, model, operation), with
+    estimated cost and optional per-endpoint daily budgets.
+    """
+    def __init__(self):
+        self.pricing = dict(DEFAULT_PRICING)
+        self.pricing.update(_load_json_env("AI_PRICING_JSON"))
+        # endpoint path -> USD per UTC day
+        self.budgets: Dict[str, float] = {k: float(v) for k, v in _load_json_env("AI_ENDPOINT_BUDGETS").items()}
+        # "degrade" serves cached/mock output once a budget is spent; "reject" raises BudgetExceededError
+        self.budget_mode = os.getenv("AI_BUDGET_MODE", "degrade").lower()
+        self._lock = threading.Lock()
+        self._aggregates: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+        self._spend_day = _utc_day()
+        self._daily_spend: Dict[str, float] = {}
+        self._budget_blocks: Dict[str, int] = {}
+
+    def estimate_cost(self, model: str, input_tokens: int = 0, output_tokens: int = 0,
+                      images: int = 0, audio_seconds: float = 0.0, calls: int = 0) -> float:
+        price = self.pricing.get(model, {})
+        return (
+            input_tokens / 1_000_000 * price.get("input_per_million_tokens", 0.0)
+            + output_tokens / 1_000_000 * price.get("output_per_million_tokens", 0.0)
+            + images * price.get("per_image", 0.0)
+            + audio_seconds / 60 * price.get("per_audio_minute", 0.0)
+            + calls * price.get("per_call", 0.0)
+        )
+
+    def record(self, model: str, operation: str, latency: float, cache_hit: bool = False, error: bool = False,
+               input_tokens: int = 0, output_tokens: int = 0, images: int = 0, audio_seconds: float = 0.0,
+               calls: int = 0, endpoint: Optional[str] = None):
+        """
+        Record one AI call. Cache hits are counted but cost nothing.
+        """
+        endpoint = endpoint or current_endpoint.get()
+        cost = 0.0 if cache_hit else self.estimate_cost(model, input_tokens, output_tokens, images, audio_seconds, calls)
+        with self._lock:
+            entry = self._aggregates.setdefault((endpoint, model, operation), {
+                "calls": 0, "cache_hits": 0, "errors": 0, "input_tokens": 0, "output_tokens": 0,
+                "images": 0, "audio_seconds": 0.0, "total_latency_ms": 0.0, "max_latency_ms": 0.0,
+                "estimated_cost_usd": 0.0
+            })
+            latency_ms = latency * 1000
+            entry["calls"] += 1
+            entry["cache_hits"] += int(cache_hit)
+            entry["errors"] += int(error)
+            entry["input_tokens"] += input_tokens
+            entry["output_tokens"] += output_tokens
+            entry["images"] += images
+            entry["audio_seconds"] += audio_seconds
+            entry["total_latency_ms"] += latency_ms
+            entry["max_latency_ms"] = max(entry["max_latency_ms"], latency_ms)
+            entry["estimated_cost_usd"] += cost
+
+            self._roll_day()
+            self._daily_spend[endpoint] = self._daily_spend.get(endpoint, 0.0) + cost
+
+    def check_budget(self, endpoint: Optional[str] = None) -> bool:
+        """
+        Return True if the endpoint may make another upstream call. Once its daily budget is
+        spent this returns False in degrade mode and raises BudgetExceededError in reject mode.
+        """
+        endpoint = endpoint or current_endpoint.get()
+        budget = self.budgets.get(endpoint)
+        if budget is None:
+            return True
+        with self._lock:
+            self._roll_day()
+            spent = self._daily_spend.get(endpoint, 0.0)
+            if spent < budget:
+                return True
+            self._budget_blocks[endpoint] = self._budget_blocks.get(endpoint, 0) + 1
+        logger.warning(f"AI budget exhausted for {endpoint}: ${spent:.4f} of ${budget:.2f}")
+        if self.budget_mode == "reject":
+            raise BudgetExceededError(f"Daily AI budget exceeded for {endpoint}")
+        return False
+
+    def _roll_day(self):
+        today = _utc_day()
+        if today != self._spend_day:
+            self._spend_day = today
+            self._daily_spend.clear()
+            self._budget_blocks.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Aggregated usage per endpoint/model/operation plus today's spend against budgets.
+        """
+        with self._lock:
+            self._roll_day()
+            calls = []
+            for (endpoint, model, operation), entry in sorted(self._aggregates.items()):
+                row = dict(entry)
+                row.update({"endpoint": endpoint, "model": model, "operation": operation})
+                row["avg_latency_ms"] = entry["total_latency_ms"] / entry["calls"] if entry["calls"] else 0.0
+                calls.append(row)
+            budgets = {
+                endpoint: {
+                    "budget_usd": budget,
+                    "spent_usd": self._daily_spend.get(endpoint, 0.0),
+                    "blocked_calls": self._budget_blocks.get(endpoint, 0)
+                }
+                for endpoint, budget in self.budgets.items()
+            }
+            return {
+                "day": self._spend_day,
+                "budget_mode": self.budget_mode,
+                "total_estimated_cost_usd": sum(row["estimated_cost_usd"] for row in calls),
+                "usage": calls,
+                "budgets": budgets
+            }
+
+def _utc_day() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+def _load_json_env(name: str) -> Dict[str, Any]:
+    value = os.getenv(name)
+    if not value:
+        return {}
+    try:
+        return json.loads(value)
+    except json.JSONDecodeError:
+        logger.warning(f"Ignoring invalid JSON in {name}")
+        return {}
@@ -1,106 +1,463 @@
 import os
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, AsyncIterator, Tuple, Union
 import logging
 from google.cloud import aiplatform
-from vertexai.generative_models import GenerativeModel, GenerationConfig
+from google.api_core.exceptions import (
+    DeadlineExceeded, InvalidArgument, ResourceExhausted, ServiceUnavailable, TooManyRequests
+)
+from vertexai.generative_models import GenerativeModel, GenerationConfig, Part
 from vertexai.vision_models import Image, MultiModalEmbeddingModel, ImageGenerationModel
+from vertexai.language_models import TextEmbeddingInput, TextEmbeddingModel
 import vertexai
 import asyncio
 from functools import lru_cache
+import hashlib
+import json
+import queue
+import tempfile
+import threading
 import time
+import wave
+from .cache import ResponseCache, TieredCache, create_cache_backend, make_cache_key
+from .storage_client import GENERATED_IMAGE_PREFIX, AsyncStorageClient, get_async_storage_client
+from .image_ingest import ImageIngestor
+from .concurrency import (
+    CircuitOpenError, QueueTimeoutError, SingleFlight, TokenBucket,
+    create_circuit_breakers, create_model_limiters, retry_with_backoff
+)
+from .usage import BudgetExceededError, UsageRegistry, current_endpoint
+from .semantic_cache import SEMANTIC_CACHE_ENABLED, SemanticCache
 
 logger = logging.getLogger(__name__)
 
+TEXT_MODEL_NAME = "gemini-2.0-flash"
+EMBEDDING_MODEL_NAME = "multimodalembedding@001"
+# Editing-capable Imagen model; background and product-image edits take the source photo as input
+IMAGE_MODEL_NAME = "imagegeneration@006"
+# Text-only embeddings for the semantic cache; the multimodal model truncates text to 32 tokens
+PROMPT_EMBEDDING_MODEL_NAME = os.getenv("SEMANTIC_CACHE_EMBEDDING_MODEL", "text-embedding-004")
+
+# Embedding quota in requests per minute, used to pace batch embedding
+EMBEDDING_REQUESTS_PER_MINUTE = float(os.getenv("VERTEX_EMBEDDING_REQUESTS_PER_MINUTE", "600"))
+
+# Synchronous recognize() only accepts about a minute of audio
+SYNC_RECOGNIZE_MAX_SECONDS = float(os.getenv("SPEECH_SYNC_MAX_SECONDS", "55"))
+LONG_RUNNING_RECOGNIZE_TIMEOUT = float(os.getenv("SPEECH_LONG_RUNNING_TIMEOUT_SECONDS", "900"))
+STREAMING_AUDIO_QUEUE_SIZE = 32
+# Speech rejects streaming requests carrying more than about 25KB of audio
+STREAMING_REQUEST_MAX_BYTES = 25 * 1024
+
+# 16 kHz, 16-bit mono PCM
+LINEAR16_BYTES_PER_SECOND = 16000 * 2
+
+# Imagen edit settings per digital studio operation, applied to the uploaded photo
+IMAGE_EDIT_OPERATIONS = {
+    "remove_bg": {
+        "prompt": "A plain, pure white seamless studio background.",
+        "edit_mode": "inpainting-insert",
+        "mask_mode": "background"
+    },
+    "generate_mockup": {
+        "prompt": "A professional e-commerce product photograph on a clean white surface with soft studio lighting.",
+        "edit_mode": "product-image",
+        "mask_mode": None
+    }
+}
+
+LANGUAGE_CODES = {
+    "en": "en-US",
+    "hi": "hi-IN",
+    "te": "te-IN",
+    "ta": "ta-IN",
+    "bn": "bn-IN",
+    "mr": "mr-IN",
+    "gu": "gu-IN",
+    "kn": "kn-IN",
+    "ml": "ml-IN",
+    "pa": "pa-IN",
+    "or": "or-IN",
+    "as": "as-IN",
+    "mai": "mai-IN",
+    "bho": "bho-IN",
+    "doi": "doi-IN",
+    "gon": "gon-IN",
+    "mni": "mni-IN",
+    "ne": "ne-IN",
+    "sa": "sa-IN",
+    "sd": "sd-IN",
+    "si": "si-IN",
+    "ur": "ur-IN"
+}
+
+# Signed URLs for generated images outlive the response cache TTL
+GENERATED_IMAGE_URL_EXPIRATION = int(os.getenv("GENERATED_IMAGE_URL_EXPIRATION_SECONDS", str(24 * 3600)))
+
+# Response schema for analyze_image, enforced by the model's JSON mode
+IMAGE_ANALYSIS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "objects": {"type": "array", "items": {"type": "string"}},
+        "craft_category": {"type": "string"},
+        "materials": {"type": "array", "items": {"type": "string"}},
+        "cultural_significance": {"type": "string"},
+        "quality": {"type": "string"},
+        "suggestions": {"type": "array", "items": {"type": "string"}}
+    },
+    "required": ["objects", "craft_category", "materials", "cultural_significance", "quality", "suggestions"]
+}
+
+# Usage registry model name for Speech-to-Text, priced per audio minute
+SPEECH_MODEL_NAME = "speech-to-text"
+
+EMPTY_TEXT_RESPONSE = "Unable to generate content"
+TEXT_FALLBACK = "I apologize, but I'm unable to generate content at the moment. Please try again later."
+
+# Errors meaning the AI service is down or overloaded rather than the request being bad
+UPSTREAM_UNAVAILABLE_ERRORS = (
+    CircuitOpenError, QueueTimeoutError, ServiceUnavailable, DeadlineExceeded,
+    ConnectionError, TimeoutError, asyncio.TimeoutError
+)
+
+# Seconds to wait before retrying a model that failed to load
+MODEL_RETRY_SECONDS = float(os.getenv("VERTEX_MODEL_RETRY_SECONDS", "60"))
+
 class VertexClient:
     def __init__(self):
+        # Models are created lazily on first use (or by warm_up) so startup stays fast
+        # and a model that is never called is never loaded
+        self._generative_model = None
+        self._embedding_model = None
+        self._image_generation_model = None
+        self._prompt_embedding_model = None
+        self._speech_client = None
+        self._storage: Optional[AsyncStorageClient] = None
+        self._image_ingestor = ImageIngestor()
+        self._model_lock = threading.Lock()
+        # Latency is also summed separately for calls whose audio length is known, for the per-minute rate
+        self._speech_stats = {"transcriptions": 0, "total_audio_seconds": 0.0, "total_latency_seconds": 0.0,
+                              "known_duration_latency_seconds": 0.0}
+        self._model_failures: Dict[str, float] = {}
+
         # Initialize Vertex AI only if credentials are available
         try:
             project_id = os.getenv("PROJECT_ID", "turing-goods-475505-f0")
             region = os.getenv("GCP_REGION", "us-central1")
             vertexai.init(project=project_id, location=region)
-
-            # Initialize models
-            self.generative_model = GenerativeModel("gemini-2.0-flash")
-            self.embedding_model = MultiModalEmbeddingModel.from_pretrained("multimodalembedding@001")
-            self.image_generation_model = ImageGenerationModel.from_pretrained("imagen-3.0-generate-001")
             self.initialized = True
         except Exception as e:
             logger.warning(f"Vertex AI initialization failed: {str(e)}. Using mock responses.")
-            self.generative_model = None
-            self.embedding_model = None
-            self.image_generation_model = None
             self.initialized = False
 
-        # Cache for responses to reduce API calls and costs
-        self._cache = {}
-        self._cache_timeout = 3600  # 1 hour
+        # Cache for responses to reduce API calls and costs: bounded in-process LRU,
+        # optionally backed by a cache shared across instances
+        self._cache = TieredCache(ResponseCache(), create_cache_backend())
+
+        # Identical concurrent requests share one upstream call
+        self._single_flight = SingleFlight()
+
+        # Per-model executors and concurrency limits for blocking SDK calls
+        self._limiters = create_model_limiters()
+
+        # Per-model circuit breakers: while a model is failing or slow, calls fail fast
+        # and callers serve their fallback instead of waiting out SDK timeouts
+        self._breakers = create_circuit_breakers(ignore=(InvalidArgument,))
+
+        # Paces batch embedding to the per-minute quota
+        self._embedding_rate_limiter = TokenBucket(
+            rate=EMBEDDING_REQUESTS_PER_MINUTE / 60,
+            capacity=max(1.0, EMBEDDING_REQUESTS_PER_MINUTE / 60)
+        )
+
+        # Per-call latency, tokens and estimated cost, with per-endpoint daily budgets
+        self._usage = UsageRegistry()
+
+        # Optional: serve cached text for near-duplicate prompts to the same endpoint
+        self._semantic_cache = SemanticCache(self._embed_prompt) if SEMANTIC_CACHE_ENABLED else None
+
+    @property
+    def generative_model(self) -> Optional[GenerativeModel]:
+        return self._get_model("_generative_model", lambda: GenerativeModel(TEXT_MODEL_NAME))
+
+    @property
+    def embedding_model(self) -> Optional[MultiModalEmbeddingModel]:
+        return self._get_model(
+            "_embedding_model",
+            lambda: MultiModalEmbeddingModel.from_pretrained(EMBEDDING_MODEL_NAME)
+        )
+
+    @property
+    def image_generation_model(self) -> Optional[ImageGenerationModel]:
+        return self._get_model(
+            "_image_generation_model",
+            lambda: ImageGenerationModel.from_pretrained(IMAGE_MODEL_NAME)
+        )
+
+    @property
+    def prompt_embedding_model(self) -> Optional[TextEmbeddingModel]:
+        return self._get_model(
+            "_prompt_embedding_model",
+            lambda: TextEmbeddingModel.from_pretrained(PROMPT_EMBEDDING_MODEL_NAME)
+        )
+
+    def _get_model(self, attribute: str, factory):
+        """
+        Load a model once, on first use. Callers reach this from executor threads,
+        so the lock keeps concurrent first requests from loading the same model twice.
+        A failed load is retried after MODEL_RETRY_SECONDS rather than on every call.
+        """
+        model = getattr(self, attribute)
+        if model is not None or not self.initialized:
+            return model
+
+        with self._model_lock:
+            model = getattr(self, attribute)
+            if model is not None:
+                return model
+            if time.time() - self._model_failures.get(attribute, 0) < MODEL_RETRY_SECONDS:
+                return None
+            try:
+                start = time.perf_counter()
+                model = factory()
+                setattr(self, attribute, model)
+                logger.info(f"Loaded {attribute.strip('_')} in {(time.perf_counter() - start) * 1000:.0f}ms")
+            except Exception as e:
+                logger.warning(f"Failed to load {attribute.strip('_')}: {str(e)}")
+                self._model_failures[attribute] = time.time()
+            return model
+
+    async def warm_up(self):
+        """
+        Load all models ahead of the first request.
+        """
+        if not self.initialized:
+            return
+        loop = asyncio.get_event_loop()
+        await asyncio.gather(
+            loop.run_in_executor(self._limiters["text"].executor, lambda: self.generative_model),
+            loop.run_in_executor(self._limiters["embedding"].executor, lambda: self.embedding_model),
+            loop.run_in_executor(self._limiters["image"].executor, lambda: self.image_generation_model)
+        )
 
     async def generate_text(self, prompt: str, context: Optional[str] = None, max_tokens: int = 1000) -> str:
         """
         Generate text using Vertex AI Generative Model with enhanced error handling and caching.
         """
+        try:
+            return await self._generate_text(prompt, context, max_tokens)
+
+        except BudgetExceededError:
+            raise
+        except Exception as e:
+            logger.error(f"Error generating text: {str(e)}")
+            return TEXT_FALLBACK
+
+    async def _generate_text(self, prompt: str, context: Optional[str] = None, max_tokens: int = 1000,
+                             match_fields: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Cached, coalesced text generation that raises on upstream failure, for callers
+        with a fallback of their own. Prompts built from structured inputs pass them as
+        match_fields to use the semantic cache: a near duplicate is only served when every
+        field matches exactly, since templated prompts for different products embed alike.
+        """
         if not self.initialized:
             # Return mock response when Vertex AI is not available
             logger.info("Using mock response for generate_text")
             return "This is a mock response. Please configure Google Cloud credentials to enable AI features."
 
-        try:
-            # Create cache key
-            cache_key = f"{hash(prompt)}_{hash(context or '')}_{max_tokens}"
-            if cache_key in self._cache:
-                cached_result, timestamp = self._cache[cache_key]
-                if time.time() - timestamp < self._cache_timeout:
-                    logger.info("Returning cached response")
-                    return cached_result
-
-            full_prompt = f"{context}\n\n{prompt}" if context else prompt
-
-            # Configure generation parameters for better results
-            generation_config = GenerationConfig(
-                temperature=0.7,
-                top_p=0.8,
-                top_k=40,
-                max_output_tokens=max_tokens,
-                candidate_count=1
-            )
-
-            response = await asyncio.get_event_loop().run_in_executor(
-                None,
-                lambda: self.generative_model.generate_content(
+        start = time.perf_counter()
+        full_prompt, config, cache_key = self._build_text_request(prompt, context, max_tokens)
+        cached_result = await self._cache.get(cache_key)
+        if cached_result is not None:
+            logger.info("Returning cached response")
+            self._usage.record(TEXT_MODEL_NAME, "generate_text", time.perf_counter() - start, cache_hit=True)
+            return cached_result
+
+        if not self._usage.check_budget():
+            return TEXT_FALLBACK
+
+        # The semantic lookup runs inside the flight, so identical concurrent prompts embed once
+        return await self._single_flight.do(
+            cache_key, lambda: self._generate_text_semantic(full_prompt, config, cache_key, match_fields)
+        )
+
+    async def _generate_text_semantic(self, full_prompt: str, config: Dict[str, Any], cache_key: str,
+                                      match_fields: Optional[Dict[str, Any]]) -> str:
+        if self._semantic_cache is None or match_fields is None:
+            return await self._generate_text_uncached(full_prompt, config, cache_key)
+
+        start = time.perf_counter()
+        # Near duplicates only match prompts sent to the same endpoint with the same parameters
+        # and the same structured fields
+        scope = make_cache_key("semantic", TEXT_MODEL_NAME, current_endpoint.get(),
+                               {"config": config, "match_fields": match_fields})
+        semantic = await self._semantic_cache.lookup(scope, full_prompt)
+        if semantic.hit:
+            self._usage.record(TEXT_MODEL_NAME, "generate_text_semantic", time.perf_counter() - start,
+                               cache_hit=True)
+            return semantic.value
+
+        result = await self._generate_text_uncached(full_prompt, config, cache_key)
+        self._semantic_cache.add(scope, semantic, result)
+        return result
+
+    async def _embed_prompt(self, text: str) -> List[float]:
+        start = time.perf_counter()
+        # Own limiter and breaker, so lookups neither queue behind nor trip the multimodal embedding model
+        embeddings = await self._run_model(
+            "prompt_embedding",
+            lambda: self.prompt_embedding_model.get_embeddings([TextEmbeddingInput(text, "SEMANTIC_SIMILARITY")])
+        )
+        self._usage.record(PROMPT_EMBEDDING_MODEL_NAME, "semantic_cache_lookup", time.perf_counter() - start, calls=1)
+        return embeddings[0].values
+
+    def _build_text_request(self, prompt: str, context: Optional[str], max_tokens: int) -> Tuple[str, Dict[str, Any], str]:
+        full_prompt = f"{context}\n\n{prompt}" if context else prompt
+
+        # Configure generation parameters for better results
+        config = {
+            "temperature": 0.7,
+            "top_p": 0.8,
+            "top_k": 40,
+            "max_output_tokens": max_tokens,
+            "candidate_count": 1
+        }
+
+        cache_key = make_cache_key("text", TEXT_MODEL_NAME, full_prompt, config)
+        return full_prompt, config, cache_key
+
+    async def _generate_text_uncached(self, full_prompt: str, config: Dict[str, Any], cache_key: str) -> str:
+        # Native async call: holds a text slot but no executor thread while waiting
+        async with self._breakers["text"].guard(self._limiters["text"]):
+            start = time.perf_counter()
+            try:
+                response = await self.generative_model.generate_content_async(
                     full_prompt,
-                    generation_config=generation_config
+                    generation_config=GenerationConfig(**config)
                 )
-            )
+            except Exception:
+                self._usage.record(TEXT_MODEL_NAME, "generate_text", time.perf_counter() - start, error=True)
+                raise
+            self._record_text_usage("generate_text", start, response)
 
-            result = response.text.strip() if response.text else "Unable to generate content"
+        result = response.text.strip() if response.text else EMPTY_TEXT_RESPONSE
 
-            # Cache the result
-            self._cache[cache_key] = (result, time.time())
+        # Cache the result
+        await self._cache.set(cache_key, result)
 
-            return result
+        return result
 
+    async def generate_json(self, prompt: str, schema: Dict[str, Any], max_tokens: int = 1024,
+                            cache_key: Optional[str] = None, operation: str = "generate_json") -> Any:
+        """
+        Generate output constrained to a JSON schema (OpenAPI subset) and return it parsed.
+        Results are cached under cache_key, or a key over the prompt and schema when not given.
+        Raises on failure so callers can apply their own fallback.
+        """
+        if not self.initialized:
+            raise RuntimeError("Vertex AI is not initialized")
+
+        start = time.perf_counter()
+        config = {
+            "temperature": 0.2,
+            "max_output_tokens": max_tokens,
+            "candidate_count": 1,
+            "response_mime_type": "application/json",
+            "response_schema": schema
+        }
+        cache_key = cache_key or make_cache_key("json", TEXT_MODEL_NAME, prompt, config)
+        cached_result = await self._cache.get(cache_key)
+        if cached_result is not None:
+            self._usage.record(TEXT_MODEL_NAME, operation, time.perf_counter() - start, cache_hit=True)
+            return cached_result
+
+        if not self._usage.check_budget():
+            raise RuntimeError("AI budget exhausted")
+
+        return await self._single_flight.do(
+            cache_key, lambda: self._generate_json_uncached(prompt, config, cache_key, operation)
+        )
+
+    async def _generate_json_uncached(self, prompt: str, config: Dict[str, Any], cache_key: str, operation: str) -> Any:
+        async with self._breakers["text"].guard(self._limiters["text"]):
+            start = time.perf_counter()
+            try:
+                response = await self.generative_model.generate_content_async(
+                    prompt,
+                    generation_config=GenerationConfig(**config)
+                )
+            except Exception:
+                self._usage.record(TEXT_MODEL_NAME, operation, time.perf_counter() - start, error=True)
+                raise
+            self._record_text_usage(operation, start, response)
+
+        # Only well-formed output is cached
+        result = json.loads(response.text)
+        await self._cache.set(cache_key, result)
+        return result
+
+    async def generate_text_stream(self, prompt: str, context: Optional[str] = None, max_tokens: int = 1000) -> AsyncIterator[str]:
+        """
+        Stream generated text chunk by chunk as the model produces it.
+        A cached response is yielded as a single chunk; a completed stream populates the cache.
+        """
+        if not self.initialized:
+            logger.info("Using mock response for generate_text_stream")
+            yield "This is a mock response. Please configure Google Cloud credentials to enable AI features."
+            return
+
+        start = time.perf_counter()
+        full_prompt, config, cache_key = self._build_text_request(prompt, context, max_tokens)
+        cached_result = await self._cache.get(cache_key)
+        if cached_result is not None:
+            logger.info("Returning cached response")
+            self._usage.record(TEXT_MODEL_NAME, "generate_text_stream", time.perf_counter() - start, cache_hit=True)
+            yield cached_result
+            return
+
+        if not self._usage.check_budget():
+            yield TEXT_FALLBACK
+            return
+
+        chunks = []
+        last_response = None
+        try:
+            async with self._breakers["text"].guard(self._limiters["text"], timed=False):
+                start = time.perf_counter()
+                responses = await self.generative_model.generate_content_async(
+                    full_prompt,
+                    generation_config=GenerationConfig(**config),
+                    stream=True
+                )
+                async for response in responses:
+                    # Token counts arrive on the final chunk
+                    last_response = response
+                    text = _chunk_text(response)
+                    if text:
+                        chunks.append(text)
+                        yield text
+            self._record_text_usage("generate_text_stream", start, last_response)
         except Exception as e:
-            logger.error(f"Error generating text: {str(e)}")
-            return "I apologize, but I'm unable to generate content at the moment. Please try again later."
+            logger.error(f"Error streaming text: {str(e)}")
+            self._usage.record(TEXT_MODEL_NAME, "generate_text_stream", time.perf_counter() - start, error=True)
+            if chunks:
+                # Part of the answer is already out; let the caller report the stream as failed
+                raise
+            yield TEXT_FALLBACK
+            return
+
+        result = "".join(chunks).strip()
+        if result:
+            await self._cache.set(cache_key, result)
 
     async def analyze_image(self, image_path: str) -> Dict[str, Any]:
         """
         Analyze image using Vertex AI Vision with enhanced analysis.
         """
         try:
-            # Handle both local files and URLs
-            if image_path.startswith('http'):
-                # For URLs, we'd need to download first - placeholder for now
-                logger.warning("URL image analysis not fully implemented")
-                return {
-                    "objects": ["artisan_craft"],
-                    "description": "Artisan craft product",
-                    "confidence": 0.85,
-                    "colors": ["earth_tones", "natural_dyes"],
-                    "materials": ["cotton", "natural_fibers"]
-                }
-
-            image = Image.load_from_file(image_path)
+            # Local files, http(s) URLs and data: URLs are all fetched and downsized the same way;
+            # image_path comes from internal callers, so local paths are allowed here
+            image = Part.from_data(await self._image_ingestor.load(image_path, allow_local=True),
+                                   mime_type="image/jpeg")
 
             # Use generative model for image analysis
             prompt = """
@@ -111,19 +468,26 @@ class VertexClient:
             4. Cultural significance
             5. Quality assessment
             6. Suggested improvements
-
-            Format as JSON.
             """
 
-            response = await asyncio.get_event_loop().run_in_executor(
-                None,
-                lambda: self.generative_model.generate_content([prompt, image])
+            if not self._usage.check_budget():
+                raise RuntimeError("AI budget exhausted")
+            start = time.perf_counter()
+            response = await self._run_model("text",
+                lambda: self.generative_model.generate_content(
+                    [prompt, image],
+                    generation_config=GenerationConfig(
+                        response_mime_type="application/json",
+                        response_schema=IMAGE_ANALYSIS_SCHEMA
+                    )
+                )
             )
+            self._record_text_usage("analyze_image", start, response)
 
-            # Parse response (in production, ensure proper JSON parsing)
+            # JSON mode constrains the output to the schema; never evaluate model output as code
             try:
-                analysis = eval(response.text) if response.text else {}
-            except:
+                analysis = json.loads(response.text) if response.text else {}
+            except (ValueError, TypeError):
                 analysis = {
                     "objects": ["artisan_product"],
                     "craft_category": "unknown",
@@ -135,6 +499,8 @@ class VertexClient:
 
             return analysis
 
+        except BudgetExceededError:
+            raise
         except Exception as e:
             logger.error(f"Error analyzing image: {str(e)}")
             return {
@@ -146,68 +512,84 @@ class VertexClient:
                 }
             }
 
-    async def transcribe_audio(self, audio_path: str, language: str = "en") -> str:
+    @property
+    def storage(self) -> Optional[AsyncStorageClient]:
+        """
+        Shared storage client for persisting generated images, or None if GCS is unavailable.
+        """
+        if self._storage is None and time.time() - self._model_failures.get("_storage", 0) >= MODEL_RETRY_SECONDS:
+            try:
+                self._storage = get_async_storage_client()
+            except Exception as e:
+                logger.warning(f"Storage client initialization failed: {str(e)}")
+                self._model_failures["_storage"] = time.time()
+        return self._storage
+
+    @property
+    def speech_client(self):
+        """
+        Shared Speech-to-Text client, created on first use. Unlike the Vertex models
+        it does not depend on vertexai.init succeeding.
+        """
+        if self._speech_client is None:
+            with self._model_lock:
+                if self._speech_client is None:
+                    from google.cloud import speech
+                    self._speech_client = speech.SpeechClient()
+        return self._speech_client
+
+    async def transcribe_audio(self, audio_path: str, language: str = "en",
+                               duration_seconds: Optional[float] = None, encoding: str = "LINEAR16",
+                               sample_rate_hertz: Optional[int] = 16000, channels: int = 1) -> str:
         """
         Transcribe audio using Google Cloud Speech-to-Text with language support.
+        Audio longer than the synchronous limit (about a minute), or GCS audio of unknown
+        length, uses long-running recognition.
         """
         try:
             from google.cloud import speech
 
-            # Initialize Speech client
-            client = speech.SpeechClient()
-
-            # Read audio file
-            with open(audio_path, 'rb') as audio_file:
-                content = audio_file.read()
-
-            # Configure recognition
-            language_codes = {
-                "en": "en-US",
-                "hi": "hi-IN",
-                "te": "te-IN",
-                "ta": "ta-IN",
-                "bn": "bn-IN",
-                "mr": "mr-IN",
-                "gu": "gu-IN",
-                "kn": "kn-IN",
-                "ml": "ml-IN",
-                "pa": "pa-IN",
-                "or": "or-IN",
-                "as": "as-IN",
-                "mai": "mai-IN",
-                "bho": "bho-IN",
-                "doi": "doi-IN",
-                "gon": "gon-IN",
-                "mni": "mni-IN",
-                "ne": "ne-IN",
-                "sa": "sa-IN",
-                "sd": "sd-IN",
-                "si": "si-IN",
-                "ur": "ur-IN"
-            }
+            start = time.perf_counter()
+            client = self.speech_client
 
-            language_code = language_codes.get(language, "en-US")
+            if duration_seconds is None and encoding == "LINEAR16":
+                duration_seconds = self._estimate_audio_duration(audio_path)
 
-            audio = speech.RecognitionAudio(content=content)
-            config = speech.RecognitionConfig(
-                encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
-                sample_rate_hertz=16000,
-                language_code=language_code,
-                enable_automatic_punctuation=True,
-                enable_word_time_offsets=False,
-            )
+            # Audio already in GCS is read by Speech directly; local files are sent inline
+            if audio_path.startswith("gs://"):
+                audio = speech.RecognitionAudio(uri=audio_path)
+            else:
+                with open(audio_path, 'rb') as audio_file:
+                    audio = speech.RecognitionAudio(content=audio_file.read())
+            config = self._recognition_config(language, encoding, sample_rate_hertz, channels)
+
+            if not self._usage.check_budget():
+                return "Error transcribing audio. Please try again."
 
             # Perform transcription
-            response = await asyncio.get_event_loop().run_in_executor(
-                None,
-                lambda: client.recognize(config=config, audio=audio)
-            )
+            if duration_seconds is None:
+                long_running = audio_path.startswith("gs://")
+            else:
+                long_running = duration_seconds > SYNC_RECOGNIZE_MAX_SECONDS
+            if long_running:
+                logger.info(f"Using long-running recognition for {audio_path}")
+                response = await self._run_model("speech",
+                    lambda: client.long_running_recognize(config=config, audio=audio).result(
+                        timeout=LONG_RUNNING_RECOGNIZE_TIMEOUT
+                    )
+                )
+            else:
+                response = await self._run_model("speech",
+                    lambda: client.recognize(config=config, audio=audio)
+                )
 
             # Extract transcription
             transcription = ""
             for result in response.results:
                 transcription += result.alternatives[0].transcript
 
+            self._record_transcription(duration_seconds, time.perf_counter() - start, "transcribe_audio")
+
             if not transcription:
                 logger.warning("No transcription results returned")
                 return "Unable to transcribe audio. Please try again with clearer audio."
@@ -215,48 +597,262 @@ class VertexClient:
             logger.info(f"Successfully transcribed audio in {language}")
             return transcription.strip()
 
+        except (BudgetExceededError, CircuitOpenError):
+            raise
         except Exception as e:
             logger.error(f"Error transcribing audio: {str(e)}")
             return "Error transcribing audio. Please try again."
 
+    async def transcribe_audio_stream(self, chunks: AsyncIterator[bytes], language: str = "en",
+                                      encoding: str = "LINEAR16", sample_rate_hertz: Optional[int] = 16000,
+                                      channels: int = 1) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Transcribe audio while it is still arriving, yielding interim and final results
+        as {"transcript", "is_final"} dicts. Streams are limited by Speech to about five minutes.
+        """
+        from google.cloud import speech
+
+        if not self._usage.check_budget():
+            raise RuntimeError("AI budget exhausted")
+
+        loop = asyncio.get_event_loop()
+        audio_queue: "queue.Queue[Optional[bytes]]" = queue.Queue(maxsize=STREAMING_AUDIO_QUEUE_SIZE)
+        stop = threading.Event()
+        results: asyncio.Queue = asyncio.Queue()
+        done = object()
+        start = time.perf_counter()
+        streaming_config = speech.StreamingRecognitionConfig(
+            config=self._recognition_config(language, encoding, sample_rate_hertz, channels),
+            interim_results=True
+        )
+
+        def put(chunk: Optional[bytes]):
+            # Bounded queue: blocks off-loop while recognition falls behind the upload
+            while not stop.is_set():
+                try:
+                    audio_queue.put(chunk, timeout=0.5)
+                    return
+                except queue.Full:
+                    continue
+
+        def requests():
+            while not stop.is_set():
+                try:
+                    chunk = audio_queue.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                if chunk is None:
+                    return
+                yield speech.StreamingRecognizeRequest(audio_content=chunk)
+
+        def recognize():
+            # Runs on a speech executor thread; the gRPC call pulls audio from audio_queue
+            try:
+                for response in self.speech_client.streaming_recognize(streaming_config, requests()):
+                    for result in response.results:
+                        if result.alternatives:
+                            loop.call_soon_threadsafe(results.put_nowait, {
+                                "transcript": result.alternatives[0].transcript,
+                                "is_final": result.is_final
+                            })
+            except Exception as e:
+                loop.call_soon_threadsafe(results.put_nowait, e)
+            finally:
+                stop.set()
+                loop.call_soon_threadsafe(results.put_nowait, done)
+
+        async def feed() -> int:
+            audio_bytes = 0
+            try:
+                async for chunk in chunks:
+                    audio_bytes += len(chunk)
+                    for offset in range(0, len(chunk), STREAMING_REQUEST_MAX_BYTES):
+                        await loop.run_in_executor(None, put, chunk[offset:offset + STREAMING_REQUEST_MAX_BYTES])
+            finally:
+                await loop.run_in_executor(None, put, None)
+            return audio_bytes
+
+        async with self._breakers["speech"].guard(self._limiters["speech"], timed=False) as lease:
+            recognizer = loop.run_in_executor(self._limiters["speech"].executor, recognize)
+            lease.hold_until(recognizer)
+            feeder = asyncio.ensure_future(feed())
+            try:
+                while True:
+                    item = await results.get()
+                    if item is done:
+                        break
+                    if isinstance(item, Exception):
+                        raise item
+                    yield item
+            finally:
+                # Also reached when the client disconnects mid-stream
+                stop.set()
+                feeder.cancel()
+                await asyncio.gather(asyncio.shield(recognizer), feeder, return_exceptions=True)
+
+        if not feeder.cancelled() and feeder.exception() is None:
+            # Audio length is only known from byte count for 16 kHz mono PCM
+            audio_seconds = feeder.result() / LINEAR16_BYTES_PER_SECOND if encoding == "LINEAR16" else None
+            self._record_transcription(audio_seconds, time.perf_counter() - start, "transcribe_audio_stream")
+
+    def _recognition_config(self, language: str, encoding: str = "LINEAR16",
+                            sample_rate_hertz: Optional[int] = 16000, channels: int = 1):
+        from google.cloud import speech
+
+        config = {
+            "encoding": speech.RecognitionConfig.AudioEncoding[encoding],
+            "language_code": LANGUAGE_CODES.get(language, "en-US"),
+            "enable_automatic_punctuation": True,
+            "enable_word_time_offsets": False,
+        }
+        # FLAC carries its own sample rate in the header
+        if sample_rate_hertz:
+            config["sample_rate_hertz"] = sample_rate_hertz
+        if channels > 1:
+            config["audio_channel_count"] = channels
+        return speech.RecognitionConfig(**config)
+
+    def _estimate_audio_duration(self, audio_path: str) -> Optional[float]:
+        """
+        Read the duration from a local WAV header, or None when it can't be determined.
+        """
+        if audio_path.startswith("gs://"):
+            return None
+        try:
+            with wave.open(audio_path, "rb") as wav_file:
+                return wav_file.getnframes() / float(wav_file.getframerate())
+        except (wave.Error, EOFError, OSError):
+            return os.path.getsize(audio_path) / LINEAR16_BYTES_PER_SECOND
+
+    def _record_transcription(self, audio_seconds: Optional[float], elapsed: float, operation: str):
+        self._usage.record(SPEECH_MODEL_NAME, operation, elapsed, audio_seconds=audio_seconds or 0.0)
+        self._speech_stats["transcriptions"] += 1
+        self._speech_stats["total_latency_seconds"] += elapsed
+        if audio_seconds:
+            self._speech_stats["total_audio_seconds"] += audio_seconds
+            self._speech_stats["known_duration_latency_seconds"] += elapsed
+            logger.info(f"Transcribed {audio_seconds:.1f}s of audio in {elapsed:.2f}s "
+                        f"({elapsed / (audio_seconds / 60):.2f}s per audio minute)")
+
+    def get_speech_stats(self) -> Dict[str, Any]:
+        """
+        Get transcription counts and end-to-end latency per minute of audio, taken over
+        calls whose audio length is known.
+        """
+        stats = dict(self._speech_stats)
+        audio_minutes = stats["total_audio_seconds"] / 60
+        stats["latency_seconds_per_audio_minute"] = (
+            stats["known_duration_latency_seconds"] / audio_minutes if audio_minutes else 0.0
+        )
+        return stats
+
     async def generate_embeddings(self, text: str, image_path: Optional[str] = None) -> list:
         """
         Generate embeddings for text and/or image with caching.
         """
         try:
-            cache_key = f"embed_{hash(text)}_{hash(image_path or '')}"
-            if cache_key in self._cache:
-                cached_result, timestamp = self._cache[cache_key]
-                if time.time() - timestamp < self._cache_timeout:
-                    return cached_result
+            start = time.perf_counter()
+            cache_key = make_cache_key("embedding", EMBEDDING_MODEL_NAME, text, {"image": image_path})
+            cached_result = await self._cache.get(cache_key)
+            if cached_result is not None:
+                self._usage.record(EMBEDDING_MODEL_NAME, "embedding", time.perf_counter() - start, cache_hit=True)
+                return cached_result
+
+            if not self._usage.check_budget():
+                return [0.0] * 512
+
+            return await self._single_flight.do(
+                cache_key, lambda: self._embed_uncached(text, image_path, cache_key)
+            )
+
+        except BudgetExceededError:
+            raise
+        except Exception as e:
+            logger.error(f"Error generating embeddings: {str(e)}")
+            return [0.0] * 512  # Return zero vector as fallback
+
+    async def generate_embeddings_batch(self, items: List[Union[str, Dict[str, Any]]]) -> List[Optional[list]]:
+        """
+        Generate embeddings for many items, returned in input order.
+        Each item is a text string or {"text": ..., "image_path": ...}. Identical items are
+        embedded once, cached items are served from cache, and the rest run at most the embedding
+        model's concurrency limit at a time under the quota rate limiter, retrying 429s and full
+        queues with jittered backoff. Items that still fail come back as None.
+        """
+        requests = []
+        for item in items:
+            if isinstance(item, str):
+                requests.append((item, None))
+            else:
+                requests.append((item.get("text", ""), item.get("image_path")))
+
+        keys = [
+            make_cache_key("embedding", EMBEDDING_MODEL_NAME, text, {"image": image_path})
+            for text, image_path in requests
+        ]
+        unique = dict(zip(keys, requests))
+        results: Dict[str, Optional[list]] = {}
+        # Fan out no wider than the limiter admits, so a large batch doesn't overflow its queue
+        semaphore = asyncio.Semaphore(self._limiters["embedding"].max_concurrency)
+
+        async def embed(cache_key: str, text: str, image_path: Optional[str]):
+            start = time.perf_counter()
+            cached_result = await self._cache.get(cache_key)
+            if cached_result is not None:
+                self._usage.record(EMBEDDING_MODEL_NAME, "embedding_batch", time.perf_counter() - start, cache_hit=True)
+                results[cache_key] = cached_result
+                return
+            if not self._usage.check_budget():
+                results[cache_key] = None
+                return
+
+            async def call():
+                await self._embedding_rate_limiter.acquire()
+                return await self._embed_uncached(text, image_path, cache_key)
+
+            async with semaphore:
+                try:
+                    results[cache_key] = await self._single_flight.do(
+                        cache_key,
+                        lambda: retry_with_backoff(
+                            call, retry_on=(ResourceExhausted, TooManyRequests, ServiceUnavailable, QueueTimeoutError)
+                        )
+                    )
+                except BudgetExceededError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Error generating batch embedding: {str(e)}")
+                    results[cache_key] = None
 
+        await asyncio.gather(*(embed(key, text, image_path) for key, (text, image_path) in unique.items()))
+        failed = sum(1 for key in unique if results[key] is None)
+        logger.info(f"Embedded batch of {len(items)} items ({len(unique)} unique, {failed} failed)")
+        return [results[key] for key in keys]
+
+    async def _embed_uncached(self, text: str, image_path: Optional[str], cache_key: str) -> list:
+        start = time.perf_counter()
+        try:
             if image_path:
-                if image_path.startswith('http'):
-                    # Handle URL images
-                    logger.warning("URL image embeddings not implemented")
-                    return [0.1] * 512  # Mock embedding
-
-                image = Image.load_from_file(image_path)
-                embeddings = await asyncio.get_event_loop().run_in_executor(
-                    None,
+                image = Image(image_bytes=await self._image_ingestor.load(image_path, allow_local=True))
+                embeddings = await self._run_model("embedding",
                     lambda: self.embedding_model.get_embeddings(image=image, contextual_text=text)
                 )
                 result = embeddings.image_embedding
             else:
-                embeddings = await asyncio.get_event_loop().run_in_executor(
-                    None,
+                embeddings = await self._run_model("embedding",
                     lambda: self.embedding_model.get_embeddings(contextual_text=text)
                 )
                 result = embeddings.text_embedding
+        except Exception:
+            self._usage.record(EMBEDDING_MODEL_NAME, "embedding", time.perf_counter() - start, error=True)
+            raise
+        self._usage.record(EMBEDDING_MODEL_NAME, "embedding", time.perf_counter() - start, calls=1)
 
-            # Cache the result
-            self._cache[cache_key] = (result, time.time())
+        # Cache the result
+        result = list(result)
+        await self._cache.set(cache_key, result)
 
-            return result
-
-        except Exception as e:
-            logger.error(f"Error generating embeddings: {str(e)}")
-            return [0.0] * 512  # Return zero vector as fallback
+        return result
 
     async def generate_story_from_transcription(self, transcription: str, language: str, cultural_context: Dict[str, Any]) -> str:
         """
@@ -268,7 +864,28 @@ class VertexClient:
             return "This is a mock response. Please configure Google Cloud credentials to enable AI features."
 
         try:
-            prompt = f"""
+            prompt = self._story_prompt(transcription, language, cultural_context)
+            story = await self._generate_text(prompt, max_tokens=1500, match_fields={
+                "language": language, "cultural_context": cultural_context
+            })
+            return story
+
+        except (BudgetExceededError, CircuitOpenError):
+            # Let the endpoint serve its sample story right away
+            raise
+        except Exception as e:
+            logger.error(f"Error generating story: {str(e)}")
+            return "Unable to generate story at this time. Please try again."
+
+    def stream_story_from_transcription(self, transcription: str, language: str, cultural_context: Dict[str, Any]) -> AsyncIterator[str]:
+        """
+        Stream a culturally-aware story from audio transcription.
+        """
+        prompt = self._story_prompt(transcription, language, cultural_context)
+        return self.generate_text_stream(prompt, max_tokens=1500)
+
+    def _story_prompt(self, transcription: str, language: str, cultural_context: Dict[str, Any]) -> str:
+        return f"""
             Create a compelling story based on this transcription: "{transcription}"
 
             Language: {language}
@@ -284,19 +901,47 @@ class VertexClient:
             Write a beautiful, culturally-rich story that celebrates the artisan's craft.
             """
 
-            story = await self.generate_text(prompt, max_tokens=1500)
-            return story
-
-        except Exception as e:
-            logger.error(f"Error generating story: {str(e)}")
-            return "Unable to generate story at this time. Please try again."
-
     async def generate_market_insights(self, category: str, region: str, artisan_context: Dict[str, Any]) -> str:
         """
         Generate market insights for artisan crafts with cultural context.
         """
         try:
-            prompt = f"""
+            prompt = self._market_insights_prompt(category, region, artisan_context)
+
+            insights = await self._generate_text(prompt, max_tokens=2000, match_fields={
+                "category": category, "region": region, "artisan_context": artisan_context
+            })
+            return insights
+
+        except (BudgetExceededError, CircuitOpenError):
+            raise
+        except Exception as e:
+            logger.error(f"Error generating market insights: {str(e)}")
+            return "Unable to generate market insights at this time. Please try again."
+
+    def stream_market_insights(self, category: str, region: str, artisan_context: Dict[str, Any]) -> AsyncIterator[str]:
+        """
+        Stream market insights for artisan crafts with cultural context.
+        """
+        prompt = self._market_insights_prompt(category, region, artisan_context)
+        return self.generate_text_stream(prompt, max_tokens=2000)
+
+    async def generate_market_insights_fresh(self, category: str, region: str) -> str:
+        """
+        Generate insights for a category and region without artisan context, skipping the
+        response cache. Raises on failure so precomputation never stores a fallback message.
+        """
+        prompt = self._market_insights_prompt(category, region, {})
+        full_prompt, config, cache_key = self._build_text_request(prompt, None, 2000)
+        insights = await self._single_flight.do(
+            cache_key, lambda: self._generate_text_uncached(full_prompt, config, cache_key)
+        )
+        if insights == EMPTY_TEXT_RESPONSE:
+            raise ValueError(f"Empty market insights for {category}/{region}")
+        return insights
+
+    def _market_insights_prompt(self, category: str, region: str, artisan_context: Dict[str, Any]) -> str:
+        return f"""
             Generate comprehensive market insights for {category} crafts in {region}, India.
 
             Artisan Context: {artisan_context}
@@ -331,13 +976,6 @@ class VertexClient:
             Focus on actionable insights that help artisans succeed in the modern marketplace while preserving cultural heritage.
             """
 
-            insights = await self.generate_text(prompt, max_tokens=2000)
-            return insights
-
-        except Exception as e:
-            logger.error(f"Error generating market insights: {str(e)}")
-            return "Unable to generate market insights at this time. Please try again."
-
     async def enhance_product_description(self, base_description: str, cultural_context: Dict[str, Any]) -> str:
         """
         Enhance product descriptions with cultural context and marketing appeal.
@@ -363,6 +1001,8 @@ class VertexClient:
             enhanced = await self.generate_text(prompt, max_tokens=500)
             return enhanced
 
+        except BudgetExceededError:
+            raise
         except Exception as e:
             logger.error(f"Error enhancing description: {str(e)}")
             return base_description  # Return original if enhancement fails
@@ -377,150 +1017,164 @@ class VertexClient:
             return self._get_mock_image_response(image_url, operation)
 
         try:
-            if operation == 'remove_bg':
-                # Use Imagen for background removal by generating a new image without background
-                result = await self._generate_image_with_imagen(image_url, operation)
-
-            elif operation == 'enhance':
-                # Use Imagen to enhance the image quality
-                result = await self._generate_image_with_imagen(image_url, operation)
+            if operation == 'enhance':
+                # Imagen has no enhancement edit for arbitrary photos; return the original unchanged
+                result = {
+                    "enhanced_image": image_url,
+                    "operation": "enhance",
+                    "enhancements_applied": [],
+                    "status": "unchanged",
+                    "processing_method": "passthrough",
+                    "note": "Image enhancement is not available yet, showing original image"
+                }
 
-            elif operation == 'generate_mockup':
-                # Use Imagen to create professional mockup
+            elif operation in IMAGE_EDIT_OPERATIONS:
                 result = await self._generate_image_with_imagen(image_url, operation)
 
             else:
                 raise ValueError(f"Unsupported operation: {operation}")
 
+            # Edits are not cached by URL: the stored output is keyed by the source image's content,
+            # so an object overwritten at the same URL is edited again
             return result
 
+        except (BudgetExceededError, CircuitOpenError):
+            raise
         except Exception as e:
             logger.error(f"Error processing image: {str(e)}")
             return self._get_mock_image_response(image_url, operation)
 
     async def _generate_image_with_imagen(self, image_url: str, operation: str) -> Dict[str, Any]:
         """
-        Generate images using Vertex AI Imagen model for various operations.
+        Edit the source photo with Vertex AI Imagen for the given operation.
+        Outputs are stored in GCS under a content-addressed key (source image bytes + operation + prompt),
+        so repeating an operation on the same photo returns the stored image without regenerating,
+        whichever URL it is read from.
         """
+        start = time.perf_counter()
         try:
-            # Create operation-specific prompts
-            if operation == 'remove_bg':
-                prompt = "Remove the background from this artisan craft product, keeping only the main subject with a transparent background. Maintain the original quality and details."
-            elif operation == 'enhance':
-                prompt = "Enhance this artisan craft product image with better lighting, improved colors, higher resolution, and professional quality. Make it look studio-quality."
-            elif operation == 'generate_mockup':
-                prompt = "Create a professional e-commerce product mockup of this artisan craft item. Place it on a clean white background with studio lighting, multiple angles if possible, and make it look ready for online sales."
-            else:
-                raise ValueError(f"Unsupported operation: {operation}")
+            settings = IMAGE_EDIT_OPERATIONS[operation]
+            # User-supplied source: fetched only from allowed hosts, never from local paths
+            source = await self._image_ingestor.load(image_url)
+            blob_name = generated_image_blob_name(source, operation, settings)
+
+            storage = self.storage
+            if storage is not None:
+                try:
+                    if await storage.get_file_metadata(blob_name):
+                        logger.info(f"Returning stored {operation} result {blob_name}")
+                        generated_url = await storage.get_signed_url(blob_name, GENERATED_IMAGE_URL_EXPIRATION)
+                        self._usage.record(IMAGE_MODEL_NAME, operation, time.perf_counter() - start, cache_hit=True)
+                        return self._format_imagen_response(generated_url, operation)
+                except Exception as e:
+                    logger.warning(f"Generated image lookup failed: {str(e)}")
+
+            if not self._usage.check_budget():
+                return self._get_mock_image_response(image_url, operation)
+
+            return await self._single_flight.do(
+                f"imagen:{blob_name}",
+                lambda: self._generate_and_store_image(image_url, source, operation, settings, blob_name)
+            )
+
+        except (BudgetExceededError, CircuitOpenError):
+            raise
+        except Exception as e:
+            logger.error(f"Error generating image with Imagen: {str(e)}")
+            return self._get_mock_image_response(image_url, operation)
 
-            # For Imagen, we need to handle the image input properly
-            # Note: Imagen 3.0 supports image-to-image generation
-            # In production, this would upload the image and use it as reference
+    async def _generate_and_store_image(self, image_url: str, source: bytes, operation: str,
+                                        settings: Dict[str, Any], blob_name: str) -> Dict[str, Any]:
+        storage = self.storage
+        if storage is None:
+            logger.warning("Storage unavailable, edited image can't be persisted")
+            return self._get_mock_image_response(image_url, operation)
 
-            # For now, using text-to-image with descriptive prompt based on the operation
-            # In a full implementation, you'd use the actual image as input
+        base_image = Image(image_bytes=source)
 
-            response = await asyncio.get_event_loop().run_in_executor(
-                None,
-                lambda: self.image_generation_model.generate_images(
-                    prompt=prompt,
+        start = time.perf_counter()
+        try:
+            response = await self._run_model("image",
+                lambda: self.image_generation_model.edit_image(
+                    prompt=settings["prompt"],
+                    base_image=base_image,
+                    edit_mode=settings["edit_mode"],
+                    mask_mode=settings["mask_mode"],
                     number_of_images=1,
-                    aspect_ratio="1:1",
                     safety_filter_level="block_some",
                     person_generation="allow_adult"
                 )
             )
-
-            # Get the generated image URL (in production, this would be stored and returned)
-            if response and len(response.images) > 0:
-                generated_image = response.images[0]
-                # In production, save the image and return the URL
-                # For now, return a placeholder response
-
-                return self._format_imagen_response(generated_image, image_url, operation)
-            else:
-                logger.warning("No images generated by Imagen")
-                return self._get_mock_image_response(image_url, operation)
-
-        except Exception as e:
-            logger.error(f"Error generating image with Imagen: {str(e)}")
+        except Exception:
+            self._usage.record(IMAGE_MODEL_NAME, operation, time.perf_counter() - start, error=True)
+            raise
+        self._usage.record(IMAGE_MODEL_NAME, operation, time.perf_counter() - start,
+                           images=len(response.images) if response else 0)
+
+        if not response or len(response.images) == 0:
+            logger.warning("No images returned by Imagen")
             return self._get_mock_image_response(image_url, operation)
 
-    def _format_imagen_response(self, generated_image, original_image_url: str, operation: str) -> Dict[str, Any]:
+        edited = await asyncio.get_event_loop().run_in_executor(
+            self._limiters["image"].executor, _encoded_image_bytes, response.images[0]
+        )
+        await storage.upload_bytes(edited, blob_name, content_type="image/png")
+        generated_url = await storage.get_signed_url(blob_name, GENERATED_IMAGE_URL_EXPIRATION)
+        return self._format_imagen_response(generated_url, operation)
+
+    def _format_imagen_response(self, generated_image_url: str, operation: str) -> Dict[str, Any]:
         """
         Format the Imagen response into the expected API response format.
         """
-        # In production, generated_image would have a URL or data to save
-        # For now, returning mock structure
-
         if operation == 'remove_bg':
             return {
-                "processed_image": original_image_url,  # Would be the generated image URL
+                "processed_image": generated_image_url,
                 "operation": "remove_bg",
                 "status": "success",
-                "confidence": 0.95,
-                "processing_method": "ai_imagen_generation",
-                "note": "Background removed using AI image generation"
-            }
-
-        elif operation == 'enhance':
-            return {
-                "enhanced_image": original_image_url,  # Would be the generated image URL
-                "operation": "enhance",
-                "enhancements_applied": ["ai_enhancement", "professional_quality", "studio_lighting"],
-                "status": "success",
-                "quality_score": 9.2,
-                "processing_method": "ai_imagen_enhancement"
+                "processing_method": "ai_imagen_edit",
+                "note": "Background replaced with plain white using AI image editing"
             }
 
         elif operation == 'generate_mockup':
             return {
-                "mockup_image": original_image_url,  # Would be the generated image URL
+                "mockup_image": generated_image_url,
                 "operation": "generate_mockup",
                 "mockup_type": "professional_ecommerce",
                 "status": "success",
-                "processing_method": "ai_imagen_mockup",
-                "recommendations": ["ready_for_ecommerce", "multiple_angles_available", "studio_quality"]
+                "processing_method": "ai_imagen_product_image",
+                "recommendations": ["ready_for_ecommerce", "studio_quality"]
             }
 
-        return self._get_mock_image_response(original_image_url, operation)
+        return self._get_mock_image_response(generated_image_url, operation)
 
     async def _process_with_vision_model(self, image_url: str, prompt: str, operation: str) -> Dict[str, Any]:
         """
         Helper method to process images using Vertex AI vision models.
         """
         try:
-            # Handle base64 data URLs (common in web apps)
-            if image_url.startswith('data:image'):
-                # For data URLs, we'd need to extract and save temporarily
-                # This is a simplified version - in production, handle properly
-                logger.warning("Data URL image processing - using mock for now")
+            # Local files, http(s) URLs and data: URLs (common in web apps) are all
+            # fetched and downsized the same way
+            try:
+                image = Part.from_data(await self._image_ingestor.load(image_url), mime_type="image/jpeg")
+            except Exception as e:
+                logger.error(f"Error loading image: {str(e)}")
                 return self._get_mock_image_response(image_url, operation)
 
-            # For HTTP URLs, download and process
-            elif image_url.startswith('http'):
-                # In production, download image and process
-                logger.warning("HTTP URL image processing - using mock for now")
+            if not self._usage.check_budget():
                 return self._get_mock_image_response(image_url, operation)
+            start = time.perf_counter()
+            response = await self._run_model("text",
+                lambda: self.generative_model.generate_content([prompt, image])
+            )
+            self._record_text_usage(f"vision_{operation}", start, response)
 
-            else:
-                # Assume local file path
-                try:
-                    image = Image.load_from_file(image_url)
-                    response = await asyncio.get_event_loop().run_in_executor(
-                        None,
-                        lambda: self.generative_model.generate_content([prompt, image])
-                    )
-
-                    analysis = response.text.strip() if response.text else "Analysis failed"
-
-                    # Return structured response based on operation
-                    return self._format_vision_response(analysis, image_url, operation)
+            analysis = response.text.strip() if response.text else "Analysis failed"
 
-                except Exception as e:
-                    logger.error(f"Error loading image file: {str(e)}")
-                    return self._get_mock_image_response(image_url, operation)
+            # Return structured response based on operation
+            return self._format_vision_response(analysis, image_url, operation)
 
+        except BudgetExceededError:
+            raise
         except Exception as e:
             logger.error(f"Error in vision processing: {str(e)}")
             return self._get_mock_image_response(image_url, operation)
@@ -595,7 +1249,110 @@ class VertexClient:
 
         return {"error": f"Unsupported operation: {operation}"}
 
+    async def _run_model(self, model: str, func):
+        """
+        Run a blocking SDK call on the model's executor, holding one of its concurrency
+        slots and failing fast with CircuitOpenError while its circuit is open.
+        """
+        limiter = self._limiters[model]
+        async with self._breakers[model].guard(limiter) as lease:
+            return await limiter.execute(lease, func)
+
+    def check_budget(self) -> bool:
+        """
+        Whether the current endpoint may make another upstream call; raises BudgetExceededError
+        in reject mode once its daily budget is spent.
+        """
+        return self._usage.check_budget()
+
+    def is_available(self, model: str) -> bool:
+        """False while the model's circuit is open, so callers can skip work that would be wasted."""
+        return not self._breakers[model].is_open()
+
+    def _record_text_usage(self, operation: str, start: float, response):
+        """Record a Gemini call with token counts from the response's usage metadata."""
+        usage = getattr(response, "usage_metadata", None)
+        self._usage.record(
+            TEXT_MODEL_NAME, operation, time.perf_counter() - start,
+            input_tokens=getattr(usage, "prompt_token_count", 0) or 0,
+            output_tokens=getattr(usage, "candidates_token_count", 0) or 0
+        )
+
+    async def close(self):
+        """Release pooled HTTP connections."""
+        await self._image_ingestor.close()
+
     def clear_cache(self):
         """Clear the response cache."""
         self._cache.clear()
+        if self._semantic_cache is not None:
+            self._semantic_cache.clear()
         logger.info("Vertex AI response cache cleared")
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Get response cache hit/miss/eviction counters and memory usage."""
+        return self._cache.stats()
+
+    def get_limiter_stats(self) -> Dict[str, Any]:
+        """Get per-model concurrency, queue depth and timeout counters."""
+        return {name: limiter.stats() for name, limiter in self._limiters.items()}
+
+    def get_single_flight_stats(self) -> Dict[str, Any]:
+        """Get counts of upstream executions vs. requests coalesced onto an in-flight call."""
+        return self._single_flight.stats()
+
+    def get_semantic_cache_stats(self) -> Optional[Dict[str, Any]]:
+        """Get semantic cache hit rates and similarity scores, or None when it is disabled."""
+        return self._semantic_cache.stats() if self._semantic_cache is not None else None
+
+    def get_circuit_stats(self) -> Dict[str, Any]:
+        """Get per-model circuit state, trips and fast-failed calls."""
+        return {name: breaker.stats() for name, breaker in self._breakers.items()}
+
+    def get_image_ingest_stats(self) -> Dict[str, Any]:
+        """Get image fetch, revalidation and prepared-size counters."""
+        return self._image_ingestor.stats()
+
+    def get_usage_stats(self) -> Dict[str, Any]:
+        """Get per-endpoint/model call counts, tokens, latency, estimated cost and budget spend."""
+        return self._usage.snapshot()
+
+def _chunk_text(response) -> str:
+    """
+    Text of one streamed response chunk. Chunks without parts (the final usage chunk,
+    or one stopped by safety filters) raise on .text, so they read as empty.
+    """
+    try:
+        return response.text
+    except ValueError:
+        return ""
+
+def generated_image_blob_name(source: bytes, operation: str, settings: Dict[str, Any]) -> str:
+    """
+    GCS object name for an edit of the given source image bytes. The same photo read from
+    different URLs maps to one object; a changed photo maps to a new one.
+    """
+    digest = hashlib.sha256(source).hexdigest()
+    content_key = hashlib.sha256(
+        f"{digest}:{operation}:{IMAGE_MODEL_NAME}:{settings['prompt']}".encode("utf-8")
+    ).hexdigest()
+    return f"{GENERATED_IMAGE_PREFIX}{operation}/{content_key}.png"
+
+def _encoded_image_bytes(image) -> bytes:
+    """
+    Encoded bytes of a vision_models image, written out through its public save().
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "image.png")
+        image.save(path, include_generation_parameters=False)
+        with open(path, "rb") as f:
+            return f.read()
+
+
+@lru_cache(maxsize=None)
+def get_vertex_client() -> VertexClient:
+    """
+    FastAPI dependency returning the process-wide VertexClient, so models and the
+    response cache are shared by every request instead of rebuilt per request.
+    """
+    return VertexClient()
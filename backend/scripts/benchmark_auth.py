@@ -0,0 +1,57 @@
+"""
+Measure Firebase auth overhead per request for verify_firebase_token: full local
+verification (a new token each request) against token cache hits (the same token).
+Tokens are signed with a throwaway key and certs are served locally, so no network
+or Firebase project is needed.
+
+    cd backend && python -m scripts.benchmark_auth --requests 2000
+"""
+import os
+
+os.environ.setdefault("TESTING", "1")  # skip Firebase Admin initialisation on import
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+from app.auth import firebase
+from tests.auth_helpers import KEY_ID, auth_request, make_key, make_token
+
+async def _time(tokens) -> list:
+    timings = []
+    for token in tokens:
+        start = time.perf_counter()
+        await firebase.verify_firebase_token(auth_request(token))
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+def _report(label: str, timings: list):
+    timings = sorted(timings)
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    print(f"{label:<22} mean {statistics.mean(timings):7.3f}ms  p50 {statistics.median(timings):7.3f}ms  "
+          f"p95 {p95:7.3f}ms  ({len(timings)} requests)")
+
+async def main(requests: int):
+    os.environ.pop("TESTING", None)
+    firebase.FIREBASE_LOCAL_VERIFY = True
+    private_pem, cert_pem = make_key()
+    firebase._public_keys._client = httpx.AsyncClient(transport=httpx.MockTransport(
+        lambda request: httpx.Response(200, json={KEY_ID: cert_pem}, headers={"Cache-Control": "max-age=3600"})
+    ))
+
+    # Sign everything up front so signing isn't part of the measurement
+    unique = [make_token(private_pem, sub=f"user-{i}") for i in range(requests)]
+    repeated = [make_token(private_pem, sub="repeat-user")] * requests
+
+    await _time(unique[:1])  # fetch certs once
+    _report("full verification", await _time(unique[1:]))
+    _report("token cache hit", await _time(repeated))
+    print(firebase.get_auth_stats())
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark Firebase auth overhead per request")
+    parser.add_argument("--requests", type=int, default=1000)
+    asyncio.run(main(parser.parse_args().requests))
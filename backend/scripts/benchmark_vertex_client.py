@@ -0,0 +1,81 @@
+"""
+Measure AI endpoint latency with a new VertexClient per request (as before, via Depends())
+against the shared process-wide client from get_vertex_client. Requests go through the
+FastAPI app in-process to /api/v1/ai/generate-story with a repeating set of transcriptions,
+so the shared client's response cache can hit while a per-request client never can.
+Gemini is replaced by a stub with a fixed latency unless --live is given. The per-request
+run no longer loads the embedding and Imagen models eagerly, so it understates the old cost.
+
+    cd backend && python -m scripts.benchmark_vertex_client --requests 200 --distinct 20
+"""
+import os
+
+os.environ.setdefault("TESTING", "1")  # skip Firebase Admin and Firestore initialisation on import
+
+import argparse
+import asyncio
+import statistics
+import time
+from types import SimpleNamespace
+
+import httpx
+from vertexai.generative_models import GenerativeModel
+
+from app.main import app
+from app.services.vertex_client import VertexClient, get_vertex_client
+
+def _stub_gemini(latency_ms: float):
+    async def generate_content_async(self, contents, generation_config=None, **kwargs):
+        await asyncio.sleep(latency_ms / 1000)
+        return SimpleNamespace(
+            text="Once, in a village of weavers, a story began.",
+            usage_metadata=SimpleNamespace(prompt_token_count=200, candidates_token_count=400)
+        )
+    GenerativeModel.generate_content_async = generate_content_async
+
+async def _time(requests: int, distinct: int) -> list:
+    timings = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark") as client:
+        for i in range(requests):
+            start = time.perf_counter()
+            response = await client.post("/api/v1/ai/generate-story", data={
+                "audio_transcription": f"I learned block printing from my grandmother, story {i % distinct}.",
+                "language": "en"
+            })
+            response.raise_for_status()
+            timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+def _report(label: str, timings: list):
+    timings = sorted(timings)
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    print(f"{label:<26} mean {statistics.mean(timings):8.2f}ms  p50 {statistics.median(timings):8.2f}ms  "
+          f"p95 {p95:8.2f}ms  ({len(timings)} requests)")
+
+async def main(requests: int, distinct: int, model_latency_ms: float, live: bool):
+    if not live:
+        _stub_gemini(model_latency_ms)
+
+    # Before: every request builds its own client, models and (always empty) cache
+    app.dependency_overrides[get_vertex_client] = VertexClient
+    before = await _time(requests, distinct)
+    del app.dependency_overrides[get_vertex_client]
+
+    # After: one client per process; models load once and the cache is shared
+    get_vertex_client.cache_clear()
+    if not get_vertex_client().initialized:
+        print("Vertex AI is not initialised, so both runs serve mock responses")
+    after = await _time(requests, distinct)
+
+    _report("new client per request", before)
+    _report("shared client", after)
+    print(get_vertex_client().get_cache_stats())
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark AI endpoint latency with a per-request vs shared VertexClient")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--distinct", type=int, default=20, help="distinct transcriptions cycled through")
+    parser.add_argument("--model-latency-ms", type=float, default=500, help="stubbed Gemini latency")
+    parser.add_argument("--live", action="store_true", help="call Gemini instead of the stub")
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.distinct, args.model_latency_ms, args.live))
@@ -0,0 +1,58 @@
+"""
+Throwaway signing keys and Firebase-style ID tokens for the auth tests and benchmark.
+"""
+import time
+import datetime
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from google.auth import crypt, jwt
+from starlette.requests import Request
+
+from app.auth import firebase
+
+KEY_ID = "test-key"
+
+def make_key():
+    """
+    A new RSA key: (private key PEM, self-signed certificate PEM) as served by Google's cert endpoint.
+    """
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "securetoken.test")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    private_pem = key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    )
+    return private_pem, cert.public_bytes(serialization.Encoding.PEM).decode("ascii")
+
+def make_token(private_pem: bytes, **overrides) -> str:
+    """
+    An ID token for the configured project, valid for an hour unless claims are overridden.
+    """
+    now = int(time.time())
+    claims = {
+        "iss": firebase.EXPECTED_ISSUER,
+        "aud": firebase.FIREBASE_PROJECT_ID,
+        "sub": "user-123",
+        "iat": now - 10,
+        "exp": now + 3600,
+        "email": "artisan@example.com",
+    }
+    claims.update(overrides)
+    signer = crypt.RSASigner.from_string(private_pem, key_id=KEY_ID)
+    return jwt.encode(signer, claims).decode("ascii")
+
+def auth_request(token: str) -> Request:
+    return Request({"type": "http", "headers": [(b"authorization", f"Bearer {token}".encode("ascii"))]})
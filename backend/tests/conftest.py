@@ -0,0 +1,4 @@
+import os
+
+# Skip Firebase Admin and Firestore client initialisation on import
+os.environ.setdefault("TESTING", "1")
@@ -0,0 +1,54 @@
+import asyncio
+
+import fakeredis
+import pytest
+import redis
+
+from app.services.cache import RedisCacheBackend, ResponseCache, SQLiteCacheBackend, TieredCache
+
+@pytest.fixture
+def redis_backend(monkeypatch):
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(redis.Redis, "from_url", lambda url, **kwargs: fakeredis.FakeStrictRedis(server=server))
+    return RedisCacheBackend()
+
+@pytest.fixture
+def sqlite_backend(tmp_path):
+    return SQLiteCacheBackend(str(tmp_path / "cache.db"))
+
+@pytest.fixture(params=["redis_backend", "sqlite_backend"])
+def backend(request):
+    return request.getfixturevalue(request.param)
+
+@pytest.mark.asyncio
+async def test_value_set_on_one_instance_is_read_by_another(backend):
+    writer = TieredCache(ResponseCache(), backend)
+    reader = TieredCache(ResponseCache(), backend)
+    story = "A long story about block printing. " * 200  # large enough to be compressed
+
+    await writer.set("story", {"text": story}, ttl=60)
+
+    assert await reader.get("story") == {"text": story}
+    assert reader.stats()["backend_hits"] == 1
+
+@pytest.mark.asyncio
+async def test_local_copy_expires_with_the_shared_entry(backend):
+    backend.set("insights", "cached", ttl=2)
+    await asyncio.sleep(1.1)
+
+    # Another instance reads it with under a second left in the shared tier
+    cache = TieredCache(ResponseCache(ttl=3600), backend)
+    assert await cache.get("insights") == "cached"
+    await asyncio.sleep(1.0)
+
+    assert cache.memory.get("insights") is None
+    assert backend.get("insights") is None
+    assert await cache.get("insights") is None
+
+def test_redis_backend_reports_remaining_ttl(redis_backend):
+    redis_backend.set("key", [1, 2, 3], ttl=30)
+
+    value, remaining = redis_backend.get("key")
+
+    assert value == [1, 2, 3]
+    assert 29 < remaining <= 30
@@ -0,0 +1,148 @@
+import time
+
+import httpx
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from app.auth import firebase
+from app.services.cache import ResponseCache
+from tests.auth_helpers import KEY_ID, auth_request, make_key, make_token
+
+PRIVATE_PEM, CERT_PEM = make_key()
+OTHER_PRIVATE_PEM, _ = make_key()
+
+def _token(private_pem: bytes = PRIVATE_PEM, **overrides) -> str:
+    return make_token(private_pem, **overrides)
+
+class CertServer:
+    """
+    Stands in for Google's cert endpoint: counts fetches and can be made to fail.
+    """
+    def __init__(self, max_age: int = 3600):
+        self.max_age = max_age
+        self.fetches = 0
+        self.failing = False
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        self.fetches += 1
+        if self.failing:
+            return httpx.Response(503)
+        return httpx.Response(200, json={KEY_ID: CERT_PEM},
+                              headers={"Cache-Control": f"public, max-age={self.max_age}, must-revalidate"})
+
+@pytest.fixture
+def certs(monkeypatch):
+    monkeypatch.delenv("TESTING", raising=False)
+    monkeypatch.setattr(firebase, "FIREBASE_LOCAL_VERIFY", True)
+    server = CertServer()
+    keys = firebase._PublicKeyCache(firebase.FIREBASE_CERTS_URL)
+    keys._client = httpx.AsyncClient(transport=httpx.MockTransport(server.handler))
+    monkeypatch.setattr(firebase, "_public_keys", keys)
+    monkeypatch.setattr(firebase, "_token_cache", ResponseCache(max_entries=100, max_bytes=1024 * 1024, ttl=3600))
+    monkeypatch.setattr(firebase, "_auth_stats", {key: 0 for key in firebase._auth_stats})
+    return server
+
+async def _reject(token: str) -> HTTPException:
+    with pytest.raises(HTTPException) as raised:
+        await firebase.verify_firebase_token(auth_request(token))
+    assert raised.value.status_code == 401
+    return raised.value
+
+@pytest.mark.asyncio
+async def test_valid_token_is_verified_against_fetched_certs(certs):
+    decoded = await firebase.verify_firebase_token(auth_request(_token()))
+
+    assert decoded["uid"] == "user-123"
+    assert decoded["email"] == "artisan@example.com"
+    assert certs.fetches == 1
+
+@pytest.mark.asyncio
+async def test_repeated_token_is_served_from_cache(certs, monkeypatch):
+    token = _token()
+    await firebase.verify_firebase_token(auth_request(token))
+
+    async def fail(token):
+        raise AssertionError("cached token was verified again")
+    monkeypatch.setattr(firebase, "_verify_id_token", fail)
+    decoded = await firebase.verify_firebase_token(auth_request(token))
+
+    assert decoded["uid"] == "user-123"
+    assert firebase.get_auth_stats()["cache_hits"] == 1
+
+@pytest.mark.asyncio
+async def test_cached_claims_are_not_shared_between_requests(certs):
+    token = _token()
+    first = await firebase.verify_firebase_token(auth_request(token))
+    first["admin"] = True
+
+    second = await firebase.verify_firebase_token(auth_request(token))
+    assert "admin" not in second
+
+@pytest.mark.asyncio
+async def test_bad_signature_is_rejected(certs):
+    error = await _reject(_token(OTHER_PRIVATE_PEM))
+    assert error.detail == "Invalid token"
+
+@pytest.mark.asyncio
+async def test_wrong_audience_is_rejected(certs):
+    error = await _reject(_token(aud="another-project"))
+    assert error.detail == "Invalid token"
+
+@pytest.mark.asyncio
+async def test_wrong_issuer_is_rejected(certs):
+    error = await _reject(_token(iss="https://securetoken.google.com/another-project"))
+    assert error.detail == "Invalid token issuer"
+
+@pytest.mark.asyncio
+async def test_expired_token_is_rejected(certs):
+    now = int(time.time())
+    error = await _reject(_token(iat=now - 7200, exp=now - 3600))
+    assert error.detail == "Token expired"
+
+@pytest.mark.asyncio
+async def test_empty_subject_is_rejected(certs):
+    error = await _reject(_token(sub=""))
+    assert error.detail == "Invalid token"
+
+@pytest.mark.asyncio
+async def test_rejected_token_is_not_cached(certs):
+    token = _token(aud="another-project")
+    await _reject(token)
+    await _reject(token)
+    assert firebase.get_auth_stats()["cache_hits"] == 0
+
+@pytest.mark.asyncio
+async def test_missing_header_is_rejected(certs):
+    with pytest.raises(HTTPException) as raised:
+        await firebase.verify_firebase_token(Request({"type": "http", "headers": []}))
+    assert raised.value.status_code == 401
+
+@pytest.mark.asyncio
+async def test_certs_are_reused_until_max_age(certs):
+    await firebase.verify_firebase_token(auth_request(_token(sub="first")))
+    await firebase.verify_firebase_token(auth_request(_token(sub="second")))
+    assert certs.fetches == 1
+
+@pytest.mark.asyncio
+async def test_expired_certs_are_refetched(certs):
+    certs.max_age = 0
+    await firebase.verify_firebase_token(auth_request(_token(sub="first")))
+    await firebase.verify_firebase_token(auth_request(_token(sub="second")))
+    assert certs.fetches == 2
+
+@pytest.mark.asyncio
+async def test_failed_cert_refresh_keeps_previous_certs(certs):
+    certs.max_age = 0
+    await firebase.verify_firebase_token(auth_request(_token(sub="first")))
+
+    certs.failing = True
+    decoded = await firebase.verify_firebase_token(auth_request(_token(sub="second")))
+    assert decoded["uid"] == "second"
+    assert certs.fetches == 2
+
+@pytest.mark.asyncio
+async def test_unavailable_certs_fail_verification(certs):
+    certs.failing = True
+    error = await _reject(_token())
+    assert error.detail == "Token verification failed"
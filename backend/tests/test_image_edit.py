@@ -0,0 +1,55 @@
+import pytest
+
+from app.services.vertex_client import VertexClient, generated_image_blob_name, IMAGE_EDIT_OPERATIONS
+
+PHOTO = b"\xff\xd8\xff\xe0 same photo"
+OTHER_PHOTO = b"\xff\xd8\xff\xe0 another photo"
+
+class StoredEdits:
+    """
+    Stands in for the media bucket with every edit already stored; records lookups.
+    """
+    def __init__(self):
+        self.lookups = []
+
+    async def get_file_metadata(self, blob_name):
+        self.lookups.append(blob_name)
+        return {"name": blob_name}
+
+    async def get_signed_url(self, blob_name, expiration):
+        return f"https://signed.example/{blob_name}"
+
+@pytest.fixture
+def client(monkeypatch):
+    sources = {
+        "https://storage.googleapis.com/kalaconnect-media/a.jpg?X-Goog-Signature=1": PHOTO,
+        "https://storage.googleapis.com/kalaconnect-media/a.jpg?X-Goog-Signature=2": PHOTO,
+        "https://storage.googleapis.com/kalaconnect-media/b.jpg": OTHER_PHOTO,
+    }
+    client = VertexClient()
+    client._storage = StoredEdits()
+
+    async def load(source, allow_local=False):
+        assert not allow_local
+        return sources[source]
+    monkeypatch.setattr(client._image_ingestor, "load", load)
+    return client
+
+@pytest.mark.asyncio
+async def test_same_photo_under_different_urls_maps_to_one_blob(client):
+    first = await client._generate_image_with_imagen(
+        "https://storage.googleapis.com/kalaconnect-media/a.jpg?X-Goog-Signature=1", "remove_bg")
+    second = await client._generate_image_with_imagen(
+        "https://storage.googleapis.com/kalaconnect-media/a.jpg?X-Goog-Signature=2", "remove_bg")
+
+    lookups = client._storage.lookups
+    assert lookups[0] == lookups[1] == generated_image_blob_name(PHOTO, "remove_bg", IMAGE_EDIT_OPERATIONS["remove_bg"])
+    assert first["processed_image"] == second["processed_image"]
+
+@pytest.mark.asyncio
+async def test_different_photo_or_operation_maps_to_another_blob(client):
+    await client._generate_image_with_imagen("https://storage.googleapis.com/kalaconnect-media/a.jpg?X-Goog-Signature=1", "remove_bg")
+    await client._generate_image_with_imagen("https://storage.googleapis.com/kalaconnect-media/b.jpg", "remove_bg")
+    await client._generate_image_with_imagen("https://storage.googleapis.com/kalaconnect-media/a.jpg?X-Goog-Signature=1", "generate_mockup")
+
+    assert len(set(client._storage.lookups)) == 3
@@ -0,0 +1,68 @@
+import asyncio
+import pytest
+
+from app.schemas.marketplace import ProductCategory
+from app.services.insights import MarketInsightsScheduler, MarketInsightsStore
+
+class SharedFirestore:
+    """
+    One Firestore database shared by several instances; transactions are serialised.
+    """
+    def __init__(self):
+        self.documents = {}
+        self._lock = asyncio.Lock()
+
+    async def get_document(self, collection, document_id):
+        document = self.documents.get((collection, document_id))
+        return dict(document) if document else None
+
+    async def upsert_document(self, collection, document_id, data):
+        self.documents.setdefault((collection, document_id), {}).update(data)
+        return document_id
+
+    async def update_in_transaction(self, collection, document_id, update):
+        async with self._lock:
+            current = await self.get_document(collection, document_id)
+            changes = update(current)
+            if changes is not None:
+                await self.upsert_document(collection, document_id, changes)
+            return current, changes
+
+class CountingVertex:
+    initialized = True
+
+    def __init__(self):
+        self.generated = []
+
+    async def generate_market_insights_fresh(self, category, region):
+        self.generated.append((category, region))
+        await asyncio.sleep(0.01)
+        return f"Insights for {category} in {region}"
+
+@pytest.mark.asyncio
+async def test_each_stale_pair_is_regenerated_once_across_instances():
+    firestore = SharedFirestore()
+    vertex = CountingVertex()
+    instances = [MarketInsightsScheduler(MarketInsightsStore(firestore), vertex, regions=["india"], concurrency=2)
+                 for _ in range(3)]
+
+    await asyncio.gather(*(instance.refresh() for instance in instances))
+    # Pairs skipped while another instance held the lease are adopted on the next cycle
+    await asyncio.gather(*(instance.refresh() for instance in instances))
+
+    assert sorted(vertex.generated) == sorted((category.value, "india") for category in ProductCategory)
+    for instance in instances:
+        assert all(instance.store.get(category.value, "india") for category in ProductCategory)
+
+@pytest.mark.asyncio
+async def test_unreachable_firestore_still_refreshes_locally():
+    class Unreachable(SharedFirestore):
+        async def update_in_transaction(self, collection, document_id, update):
+            raise ConnectionError("firestore unavailable")
+
+    vertex = CountingVertex()
+    scheduler = MarketInsightsScheduler(MarketInsightsStore(Unreachable()), vertex, regions=["india"])
+
+    await scheduler.refresh()
+
+    assert len(vertex.generated) == len(ProductCategory)
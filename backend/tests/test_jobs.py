@@ -0,0 +1,30 @@
+import asyncio
+
+import pytest
+
+from app.api.ai import get_job
+from app.services.jobs import JobManager
+
+@pytest.mark.asyncio
+async def test_shared_job_hides_other_owners_and_payload():
+    jobs = JobManager(workers=1)
+    finished = asyncio.Event()
+
+    async def handler(payload):
+        finished.set()
+        return {"processed_image": "https://signed.example/out.png"}
+    jobs.register("process_image", handler)
+    jobs.start()
+    try:
+        job, _ = await jobs.submit("process_image", {"image_url": "https://example.com/a.jpg"}, key="k", owner="alice")
+        _, deduplicated = await jobs.submit("process_image", {"image_url": "https://example.com/a.jpg"}, key="k", owner="bob")
+        await finished.wait()
+        await asyncio.sleep(0)
+
+        state = await get_job(job.id, {"uid": "bob"}, jobs)
+    finally:
+        await jobs.stop()
+
+    assert deduplicated
+    assert state["result"] == {"processed_image": "https://signed.example/out.png"}
+    assert "owners" not in state and "payload" not in state
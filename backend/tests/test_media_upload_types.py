@@ -0,0 +1,27 @@
+import os
+import sys
+
+import pytest
+
+from app.api.media import ALLOWED_UPLOAD_TYPES
+
+# The GCS-triggered function lives outside the backend package
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "functions"))
+from processor import MediaProcessor  # noqa: E402
+
+@pytest.mark.parametrize("content_type,extension", sorted(ALLOWED_UPLOAD_TYPES.items()))
+def test_uploaded_extension_is_processed_as_its_media_type(content_type, extension):
+    # _detect_media_type uses no clients, so skip the constructor that creates them
+    processor = MediaProcessor.__new__(MediaProcessor)
+
+    media_type = processor._detect_media_type(f"uploads/user-123/abc{extension}")
+
+    assert media_type == content_type.split("/")[0]
+
+@pytest.mark.parametrize("file_name", ["transcriptions/user-123/abc.wav", "generated/remove_bg/abc.png"])
+def test_backend_internal_objects_are_skipped(file_name):
+    processor = MediaProcessor.__new__(MediaProcessor)
+
+    result = processor.process_media_event("kalaconnect-media", file_name, "event-1")
+
+    assert result == {"success": True, "message": "Internal object, skipped"}
@@ -0,0 +1,40 @@
+import pytest
+
+from app.services.semantic_cache import SemanticCache
+from app.services.vertex_client import VertexClient
+
+@pytest.fixture
+def client(monkeypatch):
+    client = VertexClient()
+    client.initialized = True
+
+    # Templated prompts that differ only in a field or two embed almost identically; make it exact
+    async def embed(text):
+        return [1.0, 0.0, 0.0]
+    client._semantic_cache = SemanticCache(embed, threshold=0.97)
+
+    client.generated = []
+    async def generate(full_prompt, config, cache_key):
+        client.generated.append(full_prompt)
+        return f"response {len(client.generated)}"
+    monkeypatch.setattr(client, "_generate_text_uncached", generate)
+    return client
+
+@pytest.mark.asyncio
+async def test_near_identical_prompts_for_another_category_are_not_served(client):
+    pottery = await client.generate_market_insights("pottery", "india", {})
+    textiles = await client.generate_market_insights("textiles", "india", {})
+
+    assert pottery != textiles
+    assert len(client.generated) == 2
+    assert client.get_semantic_cache_stats()["semantic_hits"] == 0
+
+@pytest.mark.asyncio
+async def test_near_duplicate_with_the_same_fields_is_served(client):
+    context = {"craft": "block printing"}
+    first = await client.generate_story_from_transcription("I print cotton with wooden blocks.", "en", context)
+    second = await client.generate_story_from_transcription("I print cotton using wooden blocks.", "en", context)
+
+    assert first == second
+    assert len(client.generated) == 1
+    assert client.get_semantic_cache_stats()["semantic_hits"] == 1
@@ -0,0 +1,24 @@
+import pytest
+
+from app.api.marketplace import _optimize_seo
+
+class CachedJson:
+    """
+    Returns the same cached object on every call, like VertexClient.generate_json on a cache hit.
+    """
+    def __init__(self, result):
+        self.result = result
+
+    async def generate_json(self, prompt, schema, max_tokens=1024, cache_key=None, operation="generate_json"):
+        return self.result
+
+@pytest.mark.asyncio
+async def test_score_is_clamped_without_changing_the_cached_result():
+    cached = {"score": 140.7, "keywords": ["handloom saree"], "metaTitle": "Handloom Saree",
+              "metaDescription": "Handwoven cotton saree", "improvedDescription": "A handwoven cotton saree."}
+
+    first = await _optimize_seo(CachedJson(cached), "Cotton saree", "google")
+    second = await _optimize_seo(CachedJson(cached), "Cotton saree", "google")
+
+    assert first.score == second.score == 100
+    assert cached["score"] == 140.7
@@ -0,0 +1,34 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.vertex_client import STREAMING_REQUEST_MAX_BYTES, VertexClient
+
+class RecordingSpeech:
+    """
+    Stands in for the Speech client: records request sizes and answers with one final result.
+    """
+    def __init__(self):
+        self.request_sizes = []
+
+    def streaming_recognize(self, config, requests):
+        for request in requests:
+            self.request_sizes.append(len(request.audio_content))
+        alternative = SimpleNamespace(transcript="namaste")
+        yield SimpleNamespace(results=[SimpleNamespace(alternatives=[alternative], is_final=True)])
+
+async def _upload(*sizes):
+    for size in sizes:
+        yield b"\0" * size
+
+@pytest.mark.asyncio
+async def test_audio_is_sent_in_requests_under_the_streaming_limit():
+    client = VertexClient()
+    client._speech_client = RecordingSpeech()
+
+    results = [result async for result in client.transcribe_audio_stream(_upload(64 * 1024, 100 * 1024, 10))]
+
+    sizes = client._speech_client.request_sizes
+    assert results == [{"transcript": "namaste", "is_final": True}]
+    assert max(sizes) <= STREAMING_REQUEST_MAX_BYTES
+    assert sum(sizes) == 164 * 1024 + 10
@@ -0,0 +1,18 @@
+from fastapi.testclient import TestClient
+
+from app.api import ai
+from app.main import app
+
+def test_unavailable_storage_returns_the_sample_transcription(monkeypatch):
+    def unavailable():
+        raise RuntimeError("no credentials")
+    monkeypatch.setattr(ai, "get_async_storage_client", unavailable)
+
+    response = TestClient(app).post(
+        "/api/v1/ai/transcribe-audio",
+        files={"file": ("story.wav", b"RIFF", "audio/wav")},
+        data={"language": "en"}
+    )
+
+    assert response.status_code == 200
+    assert "temporarily unavailable" in response.json()["note"]
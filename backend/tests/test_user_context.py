@@ -0,0 +1,81 @@
+import pytest
+
+from app.api.marketplace import get_profile
+from app.auth import user_context
+from app.auth.user_context import ARTISANS_COLLECTION, BUYERS_COLLECTION, UserContext
+from app.services.firestore_client import FirestoreClient
+
+class FakeBatch:
+    def __init__(self, documents):
+        self.documents = documents
+        self.writes = []
+
+    def set(self, ref, data, merge=False):
+        self.writes.append(("set", ref.path, data))
+
+    def delete(self, ref):
+        self.writes.append(("delete", ref.path, None))
+
+    async def commit(self):
+        for op, (collection, document_id), data in self.writes:
+            if op == "set":
+                self.documents.setdefault(collection, {}).setdefault(document_id, {}).update(data)
+            else:
+                self.documents.get(collection, {}).pop(document_id, None)
+
+class FakeRef:
+    def __init__(self, collection, document_id):
+        self.path = (collection, document_id)
+
+class FakeCollection:
+    def __init__(self, name):
+        self.name = name
+
+    def document(self, document_id):
+        return FakeRef(self.name, document_id)
+
+class FakeFirestore:
+    """
+    Just enough of the Firestore async client for batched profile writes.
+    """
+    def __init__(self):
+        self.documents = {}
+
+    def collection(self, name):
+        return FakeCollection(name)
+
+    def batch(self):
+        return FakeBatch(self.documents)
+
+@pytest.fixture
+def firestore(monkeypatch):
+    monkeypatch.setattr(user_context, "_profile_cache", user_context.ResponseCache(ttl=60))
+    client = FirestoreClient()
+    client.client = FakeFirestore()
+
+    async def get_document(collection, document_id):
+        return client.client.documents.get(collection, {}).get(document_id)
+    monkeypatch.setattr(client, "get_document", get_document)
+    return client
+
+@pytest.mark.asyncio
+async def test_switching_role_removes_the_other_profile(firestore):
+    uid = "user-123"
+    await firestore.upsert_document_exclusive(ARTISANS_COLLECTION, uid, {"display_name": "Asha"},
+                                              exclusive_with=[ARTISANS_COLLECTION, BUYERS_COLLECTION])
+    await firestore.upsert_document_exclusive(BUYERS_COLLECTION, uid, {"display_name": "Asha"},
+                                              exclusive_with=[ARTISANS_COLLECTION, BUYERS_COLLECTION])
+
+    profile = await UserContext({"uid": uid}, firestore).profile()
+
+    assert profile["role"] == "buyer"
+    assert uid not in firestore.client.documents[ARTISANS_COLLECTION]
+
+@pytest.mark.asyncio
+async def test_unknown_role_claim_falls_back_to_buyer(firestore):
+    user = UserContext({"uid": "admin-1", "role": "admin", "email": "ops@example.com"}, firestore)
+
+    profile = await get_profile(user)
+
+    assert profile.role == "buyer"
+    assert profile.display_name == "ops"
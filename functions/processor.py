@@ -8,6 +8,16 @@ from typing import Dict, Any, Optional
 
 logger = logging.getLogger(__name__)
 
+# Extensions the backend issues for signed uploads that are missing from some
+# platforms' mime tables (.weba in particular is in none of them)
+for _mime_type, _extension in (("audio/webm", ".weba"), ("audio/ogg", ".ogg"), ("audio/flac", ".flac"),
+                               ("image/webp", ".webp")):
+    mimetypes.add_type(_mime_type, _extension)
+
+# Objects the backend writes to the bucket for its own use (audio staged for Speech,
+# edited images); keep in sync with backend/app/services/storage_client.py
+INTERNAL_PREFIXES = ("transcriptions/", "generated/")
+
 class MediaProcessor:
     def __init__(self):
         self.firestore_client = firestore.Client()
@@ -19,6 +29,10 @@ class MediaProcessor:
         """
         Main orchestrator for processing uploaded media files.
         """
+        if file_name.startswith(INTERNAL_PREFIXES):
+            logger.info(f"Skipping backend-internal object {file_name}")
+            return {"success": True, "message": "Internal object, skipped"}
+
         try:
             # Check for idempotency
             if self._is_event_already_processed(event_id):